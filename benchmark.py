@@ -0,0 +1,237 @@
+# Benchmark suite for collection building, model building and query latency on synthetic collections.
+#
+# Usage:
+#   python benchmark.py --sizes 10000 100000 1000000 --output benchmark_results.json
+#   python benchmark.py --sizes 10000 --thresholds benchmark_thresholds.json
+#
+# Synthetic documents are generated from the term statistics of aesopa10.txt (term frequencies and document lengths),
+# so the vocabulary and the posting list lengths follow the same distribution as the real collection.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import cleanup
+import docstore
+import extraction
+import ir_system
+import memory_report
+import models
+import porter
+from document import Document
+
+RAW_DATA_PATH = 'raw_data'
+BENCHMARK_DATA_PATH = 'benchmark_data'
+DEFAULT_SIZES = [10000]
+DEFAULT_QUERY_COUNT = 200
+PERCENTILES = (50, 95, 99)
+# Search modes as (stemming, stop word filtering, name of the mode in the results).
+MODES = [(False, False, 'standard'), (True, True, 'sw_stem')]
+
+# Models and the search method that is benchmarked for each of them.
+BENCHMARKED_MODELS = {
+    'LinearBooleanModel': 'basic_query_search',
+    'InvertedListBooleanModel': 'inverted_list_search',
+    'SignatureBasedBooleanModel': 'signature_search',
+    'VectorSpaceModel': 'buckley_lewit_search'
+}
+
+
+class CorpusGenerator(object):
+    """
+    Generates synthetic documents whose terms are drawn from the term distribution of a source collection and whose
+    lengths are drawn from the document lengths of the source collection.
+    """
+
+    def __init__(self, source_collection: list[Document], stop_words: list[str], seed: int = 0):
+        # Terms are stripped of their symbols (e. g. 'fox:' becomes 'fox'), so every generated term is a valid query term.
+        term_counts = {}
+        for document in source_collection:
+            for term in document.terms:
+                term = cleanup.remove_symbols(term)
+                if term.isascii() and term.isalpha():
+                    term_counts[term] = term_counts.get(term, 0) + 1
+        self.vocabulary = sorted(term_counts.keys(), key=lambda term: term_counts[term], reverse=True)
+        counts = np.array([term_counts[term] for term in self.vocabulary], dtype=np.float64)
+        self.probabilities = counts / counts.sum()
+        self.document_lengths = np.array([len(document.terms) for document in source_collection])
+        self.stop_word_set = set(stop_words)
+        self.stems = {term: porter.stem_term(term) for term in self.vocabulary}
+        self.random_generator = np.random.default_rng(seed)
+
+    def generate(self, document_count: int) -> list[Document]:
+        """
+        Generates a collection, including filtered and stemmed term lists.
+        :param document_count: Number of documents
+        :return: List of Document objects
+        """
+        collection = []
+        lengths = self.random_generator.choice(self.document_lengths, size=document_count)
+        term_ids = self.random_generator.choice(len(self.vocabulary), size=int(lengths.sum()), p=self.probabilities)
+        position = 0
+        for document_id, length in enumerate(lengths):
+            document = Document()
+            document.document_id = document_id
+            document.title = f'Synthetic document {document_id + 1}'
+            document.terms = [self.vocabulary[term_id] for term_id in term_ids[position:position + length]]
+            document.raw_text = ' '.join(document.terms)
+            document.stem_positions = extraction.compute_stem_positions(document.terms)
+            document.filtered_terms = [term for term in document.terms if term not in self.stop_word_set]
+            document.stemmed_terms = [self.stems[term] for term in document.terms]
+            collection.append(document)
+            position += length
+        return collection
+
+    def generate_queries(self, query_count: int) -> dict:
+        """
+        Generates query mixes from frequent, medium and rare terms.
+        :param query_count: Number of queries per mix
+        :return: Dictionary with a list of Boolean queries ('boolean') and of free text queries ('vector')
+        """
+        bands = [self.vocabulary[:50], self.vocabulary[50:500], self.vocabulary[500:]]
+        bands = [band for band in bands if band]
+
+        def sample_term():
+            band = bands[self.random_generator.integers(len(bands))]
+            return band[self.random_generator.integers(len(band))]
+
+        templates = ['{0}', '{0} & {1}', '{0} | {1}', '{0} & -{1}', '({0} | {1}) & -{2}', '-{0}']
+        boolean_queries, vector_queries = [], []
+        for i in range(query_count):
+            terms = [sample_term() for _ in range(3)]
+            boolean_queries.append(templates[i % len(templates)].format(*terms))
+            vector_queries.append(' '.join(terms[:1 + i % 3]))
+        return {'boolean': boolean_queries, 'vector': vector_queries}
+
+
+def measure(function, *arguments):
+    start_time = time.perf_counter()
+    result = function(*arguments)
+    return result, time.perf_counter() - start_time
+
+
+def get_latency_statistics(latencies: list[float]) -> dict:
+    """
+    :param latencies: Latencies in seconds
+    :return: Dictionary with the percentiles and the mean in milliseconds
+    """
+    latencies_ms = np.array(latencies) * 1000
+    statistics = {f'p{p}_ms': float(np.percentile(latencies_ms, p)) for p in PERCENTILES}
+    statistics['mean_ms'] = float(latencies_ms.mean())
+    return statistics
+
+
+def run_benchmark(size: int, generator: CorpusGenerator, stop_words: list[str], query_count: int,
+                  model_names: list[str]) -> dict:
+    """
+    Runs all benchmarks for one collection size. The synthetic collection is written to its own data directory, which
+    becomes the working directory while the models are built (models load data/my_collection.json).
+    :return: Dictionary of metrics
+    """
+    results = {}
+    working_directory = os.getcwd()
+    size_directory = os.path.abspath(os.path.join(BENCHMARK_DATA_PATH, str(size)))
+    os.makedirs(os.path.join(size_directory, 'data'), exist_ok=True)
+    try:
+        os.chdir(size_directory)
+        collection, results['collection.generate_seconds'] = measure(generator.generate, size)
+        with open(os.path.join('data', 'stopwords.json'), 'w') as f:
+            json.dump(stop_words, f)
+        _, results['collection.save_json_seconds'] = measure(extraction.save_collection_as_json, collection,
+                                                             ir_system.COLLECTION_PATH)
+        _, results['collection.save_store_seconds'] = measure(docstore.save_collection_as_store, collection,
+                                                              ir_system.DOCUMENT_STORE_PATH)
+        _, results['collection.load_json_seconds'] = measure(extraction.load_collection_from_json,
+                                                             ir_system.COLLECTION_PATH)
+        _, results['collection.load_store_seconds'] = measure(docstore.load_collection_from_store,
+                                                              ir_system.DOCUMENT_STORE_PATH)
+        del collection
+
+        queries = generator.generate_queries(query_count)
+        irs = ir_system.InformationRetrievalSystem()
+        for model_name in model_names:
+            search_name = BENCHMARKED_MODELS[model_name]
+            print(f'[{size}] Building {model_name}...', file=sys.stderr)
+            irs.model, build_seconds = measure(getattr(models, model_name))
+            # Index variants are built on first use. They are built here, so their build time is not charged to the
+            # first timed query of a mode and the memory figure includes them.
+            for stemming, stop_word_filtering, _ in MODES:
+                _, variant_seconds = measure(irs.model.prepare_variants, stemming, stop_word_filtering)
+                build_seconds += variant_seconds
+            for variant_name, variant_seconds in getattr(irs.model, 'variant_build_times', {}).items():
+                results[f'{model_name}.{variant_name}.build_seconds'] = variant_seconds
+            results[f'{model_name}.build_seconds'] = build_seconds
+            results[f'{model_name}.memory_bytes'] = memory_report.get_deep_size(irs.model)
+
+            search = getattr(irs, search_name)
+            query_mix = queries['vector'] if model_name == 'VectorSpaceModel' else queries['boolean']
+            for stemming, stop_word_filtering, mode in MODES:
+                latencies = []
+                for query in query_mix:
+                    query = porter.stem_query_terms(query) if stemming else query
+                    _, latency = measure(search, query, stemming, stop_word_filtering)
+                    latencies.append(latency)
+                for key, value in get_latency_statistics(latencies).items():
+                    results[f'{search_name}.{mode}.{key}'] = value
+            irs.model = None
+    finally:
+        os.chdir(working_directory)
+    return results
+
+
+def check_thresholds(results: dict, thresholds: dict) -> list[str]:
+    """
+    Compares results with thresholds.
+    :param results: Dictionary of metrics per size, as produced by main()
+    :param thresholds: Dictionary that maps '<size>.<metric>' to the maximum allowed value
+    :return: List of violations as readable messages
+    """
+    violations = []
+    for key, maximum in thresholds.items():
+        size, metric = key.split('.', 1)
+        value = results.get(size, {}).get(metric)
+        if value is not None and value > maximum:
+            violations.append(f'{key}: {value:.4f} > {maximum}')
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the information retrieval system on synthetic data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Collection sizes (number of documents), e. g. 10000 100000 1000000')
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERY_COUNT, help='Number of queries per model')
+    parser.add_argument('--models', nargs='+', default=list(BENCHMARKED_MODELS.keys()),
+                        choices=list(BENCHMARKED_MODELS.keys()), help='Models to benchmark')
+    parser.add_argument('--output', help='Path of the JSON file the results are written to')
+    parser.add_argument('--thresholds', help='Path of a JSON file with maximum values per metric')
+    arguments = parser.parse_args()
+
+    source_collection = extraction.extract_collection(os.path.join(RAW_DATA_PATH, 'aesopa10.txt'))
+    stop_words = cleanup.load_stop_word_list(os.path.join(RAW_DATA_PATH, 'englishST.txt'))
+    generator = CorpusGenerator(source_collection, stop_words)
+
+    results = {}
+    for size in arguments.sizes:
+        results[str(size)] = run_benchmark(size, generator, stop_words, arguments.queries, arguments.models)
+
+    output = json.dumps(results, indent=2)
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+    if arguments.thresholds:
+        with open(arguments.thresholds, 'r') as f:
+            violations = check_thresholds(results, json.load(f))
+        for violation in violations:
+            print(f'Threshold exceeded: {violation}', file=sys.stderr)
+        if violations:
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Contains a packed bitmap of document IDs used for Boolean query evaluation.
+
+import numpy as np
+
+WORD_SIZE = 64
+
+
+def count_bits(words: np.ndarray) -> int:
+    """
+    Counts the set bits (population count) of an array of 64 bit words.
+    :param words: Array of dtype uint64
+    :return: Number of set bits
+    """
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def count_word_bits(words: np.ndarray) -> np.ndarray:
+    """
+    Counts the set bits of every 64 bit word.
+    :param words: Array of dtype uint64
+    :return: Array with the number of set bits per word
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return np.unpackbits(words.view(np.uint8)).reshape(-1, WORD_SIZE).sum(axis=1)
+
+
+class Bitmap(object):
+    """
+    Set of document IDs stored as packed bits in 64 bit words. Bit i is set if document i is contained. AND, OR and
+    NOT are computed word by word, i. e. in O(n/64) for n documents, and popcount gives the number of matches.
+    The operators &, |, - and the method difference() mirror the ones of set, so Bitmaps can be used wherever a
+    query is evaluated on sets (see query_parser.evaluate_query()).
+    """
+
+    def __init__(self, size: int, words: np.ndarray = None):
+        self.size = size  # Number of addressable document IDs (= highest document ID + 1).
+        if words is None:
+            words = np.zeros((size + WORD_SIZE - 1) // WORD_SIZE, dtype=np.uint64)
+        self.words = words
+
+    @classmethod
+    def from_ids(cls, document_ids, size: int) -> 'Bitmap':
+        """
+        Creates a bitmap from document IDs.
+        :param document_ids: Iterable of document IDs in range [0, size)
+        :param size: Number of addressable document IDs
+        :return: Bitmap that contains the given IDs
+        """
+        bits = np.zeros(((size + WORD_SIZE - 1) // WORD_SIZE) * WORD_SIZE, dtype=np.uint8)
+        ids = np.fromiter(document_ids, dtype=np.int64)
+        bits[ids] = 1
+        words = np.packbits(bits, bitorder='little').view(np.uint64)
+        return cls(size, words)
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(self.size, self.words & other.words)
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(self.size, self.words | other.words)
+
+    def __sub__(self, other: 'Bitmap') -> 'Bitmap':
+        # Negation is computed as universe - bitmap, so the universe bitmap masks out unused bits and missing IDs.
+        return Bitmap(self.size, self.words & ~other.words)
+
+    def intersection(self, other: 'Bitmap') -> 'Bitmap':
+        return self & other
+
+    def union(self, other: 'Bitmap') -> 'Bitmap':
+        return self | other
+
+    def difference(self, other: 'Bitmap') -> 'Bitmap':
+        return self - other
+
+    def __contains__(self, document_id: int) -> bool:
+        if document_id < 0 or document_id >= self.size:
+            return False
+        return bool((int(self.words[document_id // WORD_SIZE]) >> (document_id % WORD_SIZE)) & 1)
+
+    def __len__(self) -> int:
+        return count_bits(self.words)
+
+    def __iter__(self):
+        return iter(self.to_ids())
+
+    def to_ids(self) -> list[int]:
+        """
+        Returns the contained document IDs.
+        :return: Sorted list of document IDs
+        """
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder='little')
+        return np.flatnonzero(bits).tolist()
+
+    def select(self, start: int, count: int) -> list[int]:
+        """
+        Returns a range of the contained document IDs in ascending order, e. g. one page of results. Only the words
+        that hold the range are decoded.
+        :param start: Number of contained IDs to skip
+        :param count: Maximum number of IDs to return
+        :return: Sorted list of document IDs
+        """
+        if count <= 0:
+            return []
+        cumulative_counts = np.cumsum(count_word_bits(self.words))
+        first_word = int(np.searchsorted(cumulative_counts, start, side='right'))
+        last_word = int(np.searchsorted(cumulative_counts, start + count, side='left'))
+        words = self.words[first_word:last_word + 1]
+        skipped = int(cumulative_counts[first_word - 1]) if first_word > 0 else 0
+        bits = np.unpackbits(words.view(np.uint8), bitorder='little')
+        ids = np.flatnonzero(bits)[start - skipped:start - skipped + count] + first_word * WORD_SIZE
+        return ids.tolist()
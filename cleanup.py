@@ -1,6 +1,8 @@
 # Contains all functions that deal with stop word removal.
 
+from corpus_statistics import CorpusStatistics, collect_corpus_statistics, get_partitions
 from document import Document
+import docstore
 import re
 import os
 import json
@@ -90,27 +92,49 @@ def create_stop_word_list_by_frequency(collection: list[Document]) -> list[str]:
     """
     Uses the method of J. C. Crouch (1990) to generate a stop word list by finding high and low frequency terms in the
     provided collection.
-    :param collection: Collection to process
+    :param collection: Collection to process. Documents are processed one at a time, so any iterable of documents
+    (e. g. a generator that streams a large corpus) can be used.
     :return: List of stop words
     """
-    
+    statistics=CorpusStatistics().add_collection(doc.terms for doc in collection)
+    return create_stop_word_list_from_statistics(statistics)
+
+
+def create_stop_word_list_from_store(file_path: str, processes: int = None) -> list[str]:
+    """
+    Uses the method of J. C. Crouch (1990) on the collection of a document store. The documents are streamed from the
+    store in partitions, whose statistics are collected in worker processes, so the collection is never held in
+    memory as a whole.
+    :param file_path: Path of the document store
+    :param processes: Number of worker processes (default: number of CPUs)
+    :return: List of stop words
+    """
+    store=docstore.DocumentStore(file_path)
+    term_lists=(doc.terms for doc in store.iter_documents())
+    statistics=collect_corpus_statistics(get_partitions(term_lists),processes=processes)
+    return create_stop_word_list_from_statistics(statistics)
+
+
+def create_stop_word_list_from_statistics(statistics: CorpusStatistics, vocabulary: list[str] = None,
+                                          high_frequency_threshold: float = 0.6,
+                                          low_frequency_threshold: float = 0.01) -> list[str]:
+    """
+    Applies the method of J. C. Crouch (1990) to collected corpus statistics: Terms that occur in at most
+    low_frequency_threshold or at least high_frequency_threshold of all documents are stop words.
+    :param statistics: Statistics of the corpus (see corpus_statistics.CorpusStatistics)
+    :param vocabulary: Terms to classify. Required for sketched statistics, which do not store their terms; defaults
+    to all terms of the corpus otherwise.
+    :param high_frequency_threshold: Minimum share of documents that makes a term a high frequency term
+    :param low_frequency_threshold: Maximum share of documents that makes a term a low frequency term
+    :return: List of stop words
+    """
+    if vocabulary is None:
+        vocabulary=statistics.get_vocabulary()
+
     stop_words=[]
-    high_frequency_threshold=0.6
-    low_frequency_threshold=0.01
-
-    words_frequency={}
-
-    for doc in collection:
-        for term in doc.terms:
-            if term not in words_frequency.keys():
-                words_frequency[term]=1
-                continue
-            else:
-                words_frequency[term]+=1
-                continue
-    
-    for term in words_frequency.keys():
-        if words_frequency[term]<=low_frequency_threshold*len(collection) or words_frequency[term]>=high_frequency_threshold*len(collection):
+    for term in vocabulary:
+        document_frequency=statistics.get_document_frequency(term)
+        if document_frequency<=low_frequency_threshold*statistics.document_count or document_frequency>=high_frequency_threshold*statistics.document_count:
             stop_words.append(term)
 
-    return stop_words   
+    return stop_words
@@ -0,0 +1,164 @@
+# Contains the collector for corpus statistics (document and collection frequencies of terms).
+
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import numpy as np
+import os
+
+ROWS_PER_DIGEST = 8  # A BLAKE2b digest has at most 64 bytes, i. e. 8 columns of 8 bytes.
+DEFAULT_PARTITION_SIZE = 1000  # Documents per partition, i. e. per task of a worker process.
+
+
+class CorpusStatistics(object):
+    """
+    Collects the document frequency (number of documents that contain a term) and the collection frequency (number of
+    occurrences of a term) of all terms in a single pass over the documents. Statistics of several partitions, e. g.
+    collected by different worker processes, can be combined with merge().
+
+    By default, frequencies are counted exactly in dictionaries. If sketch_width is given, they are estimated with two
+    count-min sketches instead, which need constant memory regardless of the vocabulary size. Estimates are never
+    lower than the exact values and exceed them by at most e/sketch_width * N with probability 1 - e^(-sketch_depth),
+    where N is the total count of the sketch (the number of terms for collection frequencies, the sum of the numbers
+    of distinct terms per document for document frequencies).
+    """
+
+    def __init__(self, sketch_width: int = None, sketch_depth: int = 4):
+        if sketch_width is not None and (sketch_width < 1 or sketch_depth < 1):
+            raise ValueError('The sketch width and depth must be at least 1.')
+        self.document_count = 0
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        if sketch_width is None:
+            self.document_frequency = Counter()
+            self.collection_frequency = Counter()
+        else:
+            self.document_frequency_sketch = np.zeros((sketch_depth, sketch_width), dtype=np.int64)
+            self.collection_frequency_sketch = np.zeros((sketch_depth, sketch_width), dtype=np.int64)
+
+    def is_sketch(self) -> bool:
+        return self.sketch_width is not None
+
+    def get_sketch_columns(self, term: str) -> np.ndarray:
+        """
+        Hashes a term to one column per sketch row. The hash is stable across processes, so sketches of different
+        workers can be merged. Every digest yields the columns of up to ROWS_PER_DIGEST rows; deeper sketches chain
+        digests that are salted with the number of their first row.
+        :param term: Term to hash
+        :return: Array of sketch_depth column indices
+        """
+        digests = b''
+        for row in range(0, self.sketch_depth, ROWS_PER_DIGEST):
+            rows = min(ROWS_PER_DIGEST, self.sketch_depth - row)
+            digests += hashlib.blake2b(term.encode(), digest_size=8 * rows, salt=row.to_bytes(16, 'little')).digest()
+        return np.frombuffer(digests, dtype='<u8') % self.sketch_width
+
+    def add_document(self, terms: list[str]) -> None:
+        """
+        Adds the terms of one document to the statistics.
+        :param terms: Term list of the document
+        """
+        self.document_count += 1
+        term_counts = Counter(terms)
+        if not self.is_sketch():
+            self.document_frequency.update(term_counts.keys())
+            self.collection_frequency.update(term_counts)
+            return
+        rows = np.arange(self.sketch_depth)
+        for term, count in term_counts.items():
+            columns = self.get_sketch_columns(term)
+            self.document_frequency_sketch[rows, columns] += 1
+            self.collection_frequency_sketch[rows, columns] += count
+
+    def add_collection(self, term_lists) -> 'CorpusStatistics':
+        """
+        Adds documents to the statistics. Documents are processed one at a time, so term_lists may be a generator that
+        streams a corpus too large for memory.
+        :param term_lists: Iterable of term lists, one per document
+        :return: The statistics object itself
+        """
+        for terms in term_lists:
+            self.add_document(terms)
+        return self
+
+    def merge(self, other: 'CorpusStatistics') -> 'CorpusStatistics':
+        """
+        Adds the statistics of another partition. Both objects must use the same mode and sketch size.
+        :param other: Statistics of another partition
+        :return: The statistics object itself
+        """
+        if self.sketch_width != other.sketch_width or self.sketch_depth != other.sketch_depth:
+            raise ValueError('Only statistics with the same sketch size can be merged.')
+        self.document_count += other.document_count
+        if not self.is_sketch():
+            self.document_frequency.update(other.document_frequency)
+            self.collection_frequency.update(other.collection_frequency)
+        else:
+            self.document_frequency_sketch += other.document_frequency_sketch
+            self.collection_frequency_sketch += other.collection_frequency_sketch
+        return self
+
+    def get_document_frequency(self, term: str) -> int:
+        if not self.is_sketch():
+            return self.document_frequency[term]
+        return int(self.document_frequency_sketch[np.arange(self.sketch_depth), self.get_sketch_columns(term)].min())
+
+    def get_collection_frequency(self, term: str) -> int:
+        if not self.is_sketch():
+            return self.collection_frequency[term]
+        return int(self.collection_frequency_sketch[np.arange(self.sketch_depth), self.get_sketch_columns(term)].min())
+
+    def get_vocabulary(self) -> list[str]:
+        """
+        Returns all terms seen so far. Only available in exact mode, since sketches do not store the terms.
+        :return: List of terms
+        """
+        if self.is_sketch():
+            raise ValueError('Sketched statistics do not store the vocabulary.')
+        return list(self.document_frequency.keys())
+
+
+def _collect_partition(arguments) -> CorpusStatistics:
+    term_lists, sketch_width, sketch_depth = arguments
+    return CorpusStatistics(sketch_width, sketch_depth).add_collection(term_lists)
+
+
+def get_partitions(term_lists, partition_size: int = DEFAULT_PARTITION_SIZE):
+    """
+    Splits a stream of documents into partitions for collect_corpus_statistics().
+    :param term_lists: Iterable of term lists, one per document
+    :param partition_size: Number of documents per partition
+    :return: Iterator of partitions, each a list of term lists
+    """
+    partition = []
+    for terms in term_lists:
+        partition.append(terms)
+        if len(partition) == partition_size:
+            yield partition
+            partition = []
+    if partition:
+        yield partition
+
+
+def collect_corpus_statistics(partitions, sketch_width: int = None, sketch_depth: int = 4,
+                              processes: int = None) -> CorpusStatistics:
+    """
+    Collects the statistics of several partitions of a corpus in parallel worker processes and merges them in the
+    order of the partitions. Partitions are taken from the iterable only as workers become free, so a generator (see
+    get_partitions()) streams a corpus larger than memory; at most two partitions per worker are held at a time.
+    :param partitions: Iterable of partitions, each a list of term lists (one per document)
+    :param sketch_width: Width of the count-min sketches, None for exact counting
+    :param sketch_depth: Number of rows of the count-min sketches
+    :param processes: Number of worker processes (default: number of CPUs)
+    :return: Merged statistics of all partitions
+    """
+    statistics = CorpusStatistics(sketch_width, sketch_depth)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for partition in partitions:
+            pending.append(executor.submit(_collect_partition, (partition, sketch_width, sketch_depth)))
+            if len(pending) >= 2 * (processes or os.cpu_count() or 1):
+                statistics.merge(pending.popleft().result())
+        while pending:
+            statistics.merge(pending.popleft().result())
+    return statistics
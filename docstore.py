@@ -0,0 +1,162 @@
+# Contains the binary document store, which keeps document bodies compressed on disk and decodes them on demand.
+#
+# File layout (all integers little endian):
+#   header        magic 'IRDS', format version (uint32), document count (uint32), metadata length (uint64)
+#   metadata      zlib-compressed JSON {'document_ids': [...], 'titles': [...]}
+#   offset table  one (offset: uint64, length: uint32) entry per document, in collection order
+#   blocks        one zlib-compressed JSON block [raw_text, terms, filtered_terms, stemmed_terms, stem_positions] per
+#                 document
+
+from document import Document
+import json
+import mmap
+import numpy as np
+import os
+import struct
+import zlib
+
+STORE_MAGIC = b'IRDS'
+STORE_VERSION = 3
+HEADER_FORMAT = '<4sIIQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+OFFSET_TABLE_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4')])
+BODY_FIELDS = ('raw_text', 'terms', 'filtered_terms', 'stemmed_terms', 'stem_positions')
+
+
+class StoredDocument(Document):
+    """
+    Document whose body (raw text and term lists) is decoded from a DocumentStore on first access. Only the document
+    ID and the title are held in memory until then.
+    """
+
+    def __init__(self, store: 'DocumentStore', index: int, document_id: int, title: str):
+        # Document.__init__() is not called on purpose: the body fields must stay unset until they are needed.
+        self._store = store
+        self._index = index
+        self.document_id = document_id
+        self.title = title
+
+    def __getattr__(self, name):
+        # Only called if regular attribute lookup fails, i. e. for body fields that were not decoded yet.
+        if name not in BODY_FIELDS:
+            raise AttributeError(name)
+        for field, value in zip(BODY_FIELDS, self._store.read_body(self._index)):
+            if field not in self.__dict__:
+                self.__dict__[field] = value
+        return self.__dict__[name]
+
+    def __getstate__(self):
+        # The memory map cannot be pickled, so the body is decoded and stored with the document.
+        state = {field: getattr(self, field) for field in BODY_FIELDS}
+        state['document_id'] = self.document_id
+        state['title'] = self.title
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class DocumentStore(object):
+    """
+    Read access to a document store file through mmap. Opening the store reads only the header, the metadata and the
+    offset table; document bodies are decompressed on demand.
+    """
+
+    def __init__(self, file_path: str):
+        with open(file_path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, metadata_length = struct.unpack_from(HEADER_FORMAT, self.buffer, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError(f'{file_path} is not a document store of version {STORE_VERSION}.')
+        metadata = json.loads(zlib.decompress(self.buffer[HEADER_SIZE:HEADER_SIZE + metadata_length]))
+        self.document_ids = metadata['document_ids']
+        self.titles = metadata['titles']
+        self.offsets = np.frombuffer(self.buffer, dtype=OFFSET_TABLE_DTYPE, count=count,
+                                     offset=HEADER_SIZE + metadata_length)
+        self.index_by_id = {document_id: index for index, document_id in enumerate(self.document_ids)}
+
+    def __len__(self) -> int:
+        return len(self.document_ids)
+
+    def read_body(self, index: int) -> list:
+        """
+        Decodes the body of a document.
+        :param index: Position of the document in the store
+        :return: List [raw_text, terms, filtered_terms, stemmed_terms, stem_positions]
+        """
+        offset, length = int(self.offsets[index]['offset']), int(self.offsets[index]['length'])
+        return json.loads(zlib.decompress(self.buffer[offset:offset + length]))
+
+    def get_document(self, document_id: int) -> StoredDocument:
+        """
+        Looks up a document by its ID in O(1).
+        :param document_id: ID of the document
+        :return: Document or None if the ID is unknown
+        """
+        index = self.index_by_id.get(document_id)
+        if index is None:
+            return None
+        return StoredDocument(self, index, document_id, self.titles[index])
+
+    def iter_documents(self):
+        """
+        Decodes all documents one after another without keeping them, so a store larger than memory can be streamed
+        (e. g. for out-of-core indexing).
+        :return: Iterator of Document objects in collection order
+        """
+        for index, document_id in enumerate(self.document_ids):
+            document = Document()
+            document.document_id = document_id
+            document.title = self.titles[index]
+            for field, value in zip(BODY_FIELDS, self.read_body(index)):
+                setattr(document, field, value)
+            yield document
+
+    def get_collection(self) -> list[StoredDocument]:
+        """
+        Returns all documents of the store. Their bodies are decoded when first accessed.
+        :return: List of documents
+        """
+        return [StoredDocument(self, index, document_id, self.titles[index])
+                for index, document_id in enumerate(self.document_ids)]
+
+
+def save_collection_as_store(collection: list[Document], file_path: str) -> None:
+    """
+    Saves the collection as a document store file.
+    :param collection: The collection to store (= a list of Document objects)
+    :param file_path: Path of the store file
+    """
+    metadata = zlib.compress(json.dumps({
+        'document_ids': [document.document_id for document in collection],
+        'titles': [document.title for document in collection]
+    }).encode())
+    blocks = [zlib.compress(json.dumps([getattr(document, field) for field in BODY_FIELDS]).encode())
+              for document in collection]
+
+    offsets = np.zeros(len(collection), dtype=OFFSET_TABLE_DTYPE)
+    position = HEADER_SIZE + len(metadata) + offsets.nbytes
+    for i, block in enumerate(blocks):
+        offsets[i] = (position, len(block))
+        position += len(block)
+
+    temporary_file_path = file_path + '.tmp'
+    with open(temporary_file_path, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, STORE_MAGIC, STORE_VERSION, len(collection), len(metadata)))
+        f.write(metadata)
+        f.write(offsets.tobytes())
+        for block in blocks:
+            f.write(block)
+    os.replace(temporary_file_path, file_path)
+
+
+def load_collection_from_store(file_path: str) -> list[Document]:
+    """
+    Loads the collection from a document store file. Only IDs and titles are read; bodies are decoded on demand.
+    :param file_path: Path of the store file
+    :return: list of Document objects, or None if there is no valid store file
+    """
+    try:
+        return DocumentStore(file_path).get_collection()
+    except (FileNotFoundError, ValueError, struct.error, zlib.error):
+        return None
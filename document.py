@@ -8,6 +8,7 @@ class Document(object):
         self.terms = []  # Holds all terms.
         self.filtered_terms = []  # Holds terms without stopwords.
         self.stemmed_terms = []  # Holds terms that were stemmed with Porter algorithm.
+        self.stem_positions = {}  # Maps the Porter stem of each term to the positions of its occurrences in terms.
 
 
     def __str__(self):
@@ -1,41 +1,78 @@
 import json
 
 from document import Document
+from functools import lru_cache
 import re
 import os
 from cleanup import remove_symbols
+import porter
 def extract_collection(source_file_path: str) -> list[Document]:
     """
     Loads a text file (aesopa10.txt) and extracts each of the listed fables/stories from the file.
     :param source_file_name: File name of the file that contains the fables
     :return: List of Document objects
     """
-    catalog = []  # This dictionary will store the document raw_data.
-
     with open(os.path.join(source_file_path), "r") as f:
         text = f.read()
+    return [create_document(document_id, title, normalize_text(story))
+            for document_id, (title, story) in enumerate(split_aesop_stories(text))]
+
+
+def split_aesop_stories(text: str) -> list[tuple]:
+    """
+    Splits the text of aesopa10.txt into its fables/stories.
+    :param text: Content of the file
+    :return: List of (title, text) pairs
+    """
     starting_point_of_stories=re.search(r"\n{3}Aesop's Fables",text)
     text_of_interest=text[starting_point_of_stories.end()+1:]
     stories=re.split(r'\n{3}', text_of_interest)[1:]
+    # Titles and texts alternate; a title without a text at the end is dropped.
+    return [(stories[i].strip(), stories[i+1]) for i in range(0, len(stories)-1, 2)]
 
-    document_id=0
-    for i in range(len(stories)):
-        if i%2==0:
-            document=Document()
-            document.title=stories[i].strip()
-            document.document_id=document_id
-            document_id+=1
-        else:
-            document.raw_text=remove_symbols(stories[i])
-            document.raw_text=document.raw_text.lower()
-            document.terms=document.raw_text.split(' ')
 
-            catalog.append(document)
+def normalize_text(text: str) -> str:
+    """
+    :param text: Text of a document as read from its source
+    :return: Text without symbols, in lower case
+    """
+    return remove_symbols(text).lower()
 
 
+def create_document(document_id: int, title: str, raw_text: str) -> Document:
+    """
+    Creates a document and splits its text into terms by single spaces.
+    :param document_id: ID of the document
+    :param title: Title of the document
+    :param raw_text: Normalized text of the document (see normalize_text())
+    :return: Document object
+    """
+    document=Document()
+    document.document_id=document_id
+    document.title=title
+    document.raw_text=raw_text
+    document.terms=document.raw_text.split(' ')
+    document.stem_positions=compute_stem_positions(document.terms)
+    return document
+
 
+@lru_cache(maxsize=65536)
+def get_stem(term: str) -> str:
+    return porter.stem_term(term)
 
-    return catalog
+
+def compute_stem_positions(terms: list[str]) -> dict:
+    """
+    Records where the terms of a document occur, grouped by their Porter stem, so all forms of a query term can be
+    found in the document without scanning its term list (see snippets.generate_snippet()).
+    :param terms: Term list of a document
+    :return: Dictionary that maps each stem to the ascending positions of the terms with that stem
+    """
+    stem_positions={}
+    for position,term in enumerate(terms):
+        if term:
+            stem_positions.setdefault(get_stem(term),[]).append(position)
+    return stem_positions
 
 
 def save_collection_as_json(collection: list[Document], file_path: str) -> None:
@@ -53,7 +90,8 @@ def save_collection_as_json(collection: list[Document], file_path: str) -> None:
             'raw_text': document.raw_text,
             'terms': document.terms,
             'filtered_terms': document.filtered_terms,
-            'stemmed_terms': document.stemmed_terms
+            'stemmed_terms': document.stemmed_terms,
+            'stem_positions': document.stem_positions
         }]
 
     with open(file_path, "w") as json_file:
@@ -79,6 +117,8 @@ def load_collection_from_json(file_path: str) -> list[Document]:
             document.terms = doc_dict.get('terms')
             document.filtered_terms = doc_dict.get('filtered_terms')
             document.stemmed_terms = doc_dict.get('stemmed_terms')
+            # Collections saved before stem positions were recorded get them computed from the term list.
+            document.stem_positions = doc_dict.get('stem_positions') or compute_stem_positions(document.terms)
             collection += [document]
 
         return collection
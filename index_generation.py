@@ -0,0 +1,93 @@
+# Contains the index generation, which bundles everything a search reads (collection, stop words and model) into one
+# object that is published as a whole.
+
+from bitmap import Bitmap
+from document import Document
+import itertools
+import query_parser
+
+GENERATION_FIELDS = ('collection', 'stop_word_list', 'model', 'model_arguments')
+
+
+class IndexGeneration(object):
+    """
+    Immutable bundle of a collection, its stop word list and the retrieval model built for it. A rebuild creates a new
+    generation and publishes it by replacing a single reference, so a search that holds a generation always sees a
+    collection and a model of the same build, even if a rebuild is published while it runs.
+    Derived lookup structures (universe bitmap, document index, stop word set, subexpression cache) are created on
+    first use and belong to the generation, so they are dropped together with it.
+    """
+
+    generation_numbers = itertools.count(1)
+
+    def __init__(self, collection: list[Document], stop_word_list: list[str], model=None,
+                 model_arguments: dict = None):
+        """
+        :param collection: List of Document objects
+        :param stop_word_list: List of stop words
+        :param model: Retrieval model built for the collection, or None
+        :param model_arguments: Keyword arguments the model was built with, used to build it again for a new collection
+        """
+        self.collection = collection
+        self.stop_word_list = stop_word_list
+        self.model = model
+        self.model_arguments = dict(model_arguments or {})
+        self.number = next(IndexGeneration.generation_numbers)
+        self.universe_bitmap = None
+        self.document_index = None
+        self.stop_word_set = None
+        self.subexpression_cache = None
+
+    def __setattr__(self, name, value):
+        if name in GENERATION_FIELDS and name in self.__dict__:
+            raise AttributeError(f'{name} of a published index generation cannot be changed, use replace() instead.')
+        super().__setattr__(name, value)
+
+    def __str__(self):
+        return f'Generation {self.number}: {len(self.collection)} documents, {self.model}'
+
+    def replace(self, **changes) -> 'IndexGeneration':
+        """
+        Creates a new generation that differs from this one in the given fields.
+        :param changes: New values for some of collection, stop_word_list, model and model_arguments
+        :return: New generation
+        """
+        fields = {name: getattr(self, name) for name in GENERATION_FIELDS}
+        fields.update(changes)
+        return IndexGeneration(**fields)
+
+    def get_universe_bitmap(self) -> Bitmap:
+        """
+        Returns a bitmap of all documents in the collection, used for negated query terms.
+        :return: Bitmap of all document IDs
+        """
+        if self.universe_bitmap is None:
+            document_ids = [d.document_id for d in self.collection]
+            self.universe_bitmap = Bitmap.from_ids(document_ids, max(document_ids, default=-1) + 1)
+        return self.universe_bitmap
+
+    def get_document(self, document_id: int) -> Document:
+        """
+        Looks up a document of the collection by its ID in O(1).
+        :param document_id: ID of the document
+        :return: Document or None if the ID is unknown
+        """
+        if self.document_index is None:
+            self.document_index = {d.document_id: d for d in self.collection}
+        return self.document_index.get(document_id)
+
+    def get_stop_word_set(self) -> frozenset:
+        """
+        :return: Stop words of the generation as a set, for O(1) lookups
+        """
+        if self.stop_word_set is None:
+            self.stop_word_set = frozenset(self.stop_word_list)
+        return self.stop_word_set
+
+    def get_subexpression_cache(self) -> query_parser.SubexpressionCache:
+        """
+        :return: Cache of the evaluated Boolean subexpressions of searches on this generation
+        """
+        if self.subexpression_cache is None:
+            self.subexpression_cache = query_parser.SubexpressionCache()
+        return self.subexpression_cache
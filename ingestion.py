@@ -0,0 +1,253 @@
+# Contains the ingestion of collections from several sources. Pluggable source readers split their input into parts,
+# the parts are parsed and normalized in worker processes, and the documents get consecutive IDs in source order. The
+# ID of every (source, key) pair is saved next to the collection, so documents keep their IDs when a source is added.
+#
+# Usage:
+#   python ingestion.py --aesop raw_data/aesopa10.txt --text-directory corpus/ --jsonl export.jsonl --processes 8
+#
+# Every source reader has the attribute source (the absolute path of its input) and the methods get_parts() (runs in
+# the main process and returns picklable descriptions of parts of the input, in source order) and read_part(part) (runs
+# in a worker process and returns the (key, title, text) records of one part). The key identifies a record within its
+# source and must be JSON-serializable; records with a key that was already ingested from the same source are skipped.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+import docstore
+import extraction
+
+DEFAULT_PART_SIZE = 1024 * 1024  # Bytes of input per part, i. e. per task of a worker process.
+
+
+class AesopReader(object):
+    """
+    Reads the fables of the Gutenberg file aesopa10.txt. The file is split into fables in the main process; only
+    normalization runs in the workers.
+    """
+
+    def __init__(self, file_path: str, part_size: int = DEFAULT_PART_SIZE):
+        self.file_path = file_path
+        self.part_size = part_size
+        self.source = os.path.abspath(file_path)
+
+    def get_parts(self) -> list:
+        """
+        :return: Lists of (key, title, text) records of about part_size bytes each
+        """
+        with open(self.file_path, 'r') as f:
+            stories = extraction.split_aesop_stories(f.read())
+        parts, part, size = [], [], 0
+        for index, (title, text) in enumerate(stories):
+            part.append((index, title, text))
+            size += len(text)
+            if size >= self.part_size:
+                parts.append(part)
+                part, size = [], 0
+        return parts + [part] if part else parts
+
+    def read_part(self, part: list) -> list[tuple]:
+        return part
+
+
+class TextDirectoryReader(object):
+    """
+    Reads a directory tree of plain text files, one document per file. The title is the file name without its
+    extension, the key the path relative to the directory.
+    """
+
+    def __init__(self, directory: str, extension: str = '.txt', part_size: int = DEFAULT_PART_SIZE):
+        self.directory = directory
+        self.extension = extension
+        self.part_size = part_size
+        self.source = os.path.abspath(directory)
+
+    def get_parts(self) -> list:
+        """
+        :return: Lists of relative file paths of about part_size bytes each, in sorted path order
+        """
+        parts, part, size = [], [], 0
+        for root, directories, file_names in os.walk(self.directory):
+            directories.sort()
+            for file_name in sorted(file_names):
+                if not file_name.endswith(self.extension):
+                    continue
+                file_path = os.path.join(root, file_name)
+                part.append(os.path.relpath(file_path, self.directory))
+                size += os.path.getsize(file_path)
+                if size >= self.part_size:
+                    parts.append(part)
+                    part, size = [], 0
+        return parts + [part] if part else parts
+
+    def read_part(self, part: list) -> list[tuple]:
+        records = []
+        for relative_path in part:
+            with open(os.path.join(self.directory, relative_path), 'r', errors='replace') as f:
+                text = f.read()
+            records.append((relative_path, os.path.splitext(os.path.basename(relative_path))[0], text))
+        return records
+
+
+class JsonlReader(object):
+    """
+    Reads a JSONL file with one document per line. The names of the ID, title and text fields are configurable; a
+    record is keyed by ('id', its ID as JSON), or by ('offset', its byte offset) if it has no ID, so the two kinds of
+    keys never collide and IDs of any JSON type can be used. A record without a title gets its ID as title. The file
+    is split into byte ranges at line boundaries, so a single large file is read by several workers.
+    """
+
+    def __init__(self, file_path: str, id_field: str = 'id', title_field: str = 'title', text_field: str = 'text',
+                 part_size: int = DEFAULT_PART_SIZE):
+        self.file_path = file_path
+        self.id_field = id_field
+        self.title_field = title_field
+        self.text_field = text_field
+        self.part_size = part_size
+        self.source = os.path.abspath(file_path)
+
+    def get_parts(self) -> list:
+        """
+        :return: (start, end) byte ranges that begin at the start of a line
+        """
+        file_size = os.path.getsize(self.file_path)
+        starts = [0]
+        with open(self.file_path, 'rb') as f:
+            while starts[-1] + self.part_size < file_size:
+                f.seek(starts[-1] + self.part_size)
+                f.readline()
+                if f.tell() >= file_size:
+                    break
+                starts.append(f.tell())
+        return list(zip(starts, starts[1:] + [file_size]))
+
+    def read_part(self, part: tuple) -> list[tuple]:
+        start, end = part
+        with open(self.file_path, 'rb') as f:
+            f.seek(start)
+            lines = f.read(end - start).split(b'\n')
+        records = []
+        offset = start
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                if self.text_field not in record:
+                    raise ValueError(f'{self.file_path}: the record at byte {offset} has no field '
+                                     f'{self.text_field!r}.')
+                if self.id_field in record:
+                    record_id = record[self.id_field]
+                    key = ('id', json.dumps(record_id, sort_keys=True))
+                else:
+                    record_id = offset
+                    key = ('offset', offset)
+                records.append((key, str(record.get(self.title_field) or record_id), record[self.text_field]))
+            offset += len(line) + 1
+        return records
+
+
+def _normalize_part(arguments) -> list[tuple]:
+    reader, part = arguments
+    return [(json.dumps([reader.source, key]), title, extraction.normalize_text(text))
+            for key, title, text in reader.read_part(part)]
+
+
+def ingest(readers: list, processes: int = None, document_ids: dict = None) -> tuple:
+    """
+    Reads and normalizes the documents of several sources in parallel worker processes. The normalized texts are
+    split into terms in the calling process, because sending term lists back from the workers costs about four times
+    as much as splitting the texts again. Documents that were ingested before keep their IDs; new documents get IDs in
+    the order of the sources, their parts and the records within a part, so they do not depend on the number of
+    processes or on which worker finishes first.
+    :param readers: Source readers, e. g. [AesopReader('raw_data/aesopa10.txt')]
+    :param processes: Number of worker processes (default: number of CPUs); with 1, or a single part, everything is
+    done in the calling process
+    :param document_ids: IDs of the documents of the previous ingestion (see load_document_ids()), or None
+    :return: Tuple of the list of Document objects with consecutive IDs starting at 0 and the IDs of their documents
+    """
+    tasks = [(reader, part) for reader in readers for part in reader.get_parts()]
+    if processes == 1 or len(tasks) < 2:
+        return create_documents(map(_normalize_part, tasks), document_ids)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return create_documents(executor.map(_normalize_part, tasks), document_ids)
+
+
+def create_documents(parts, document_ids: dict = None) -> tuple:
+    """
+    Numbers the documents after the IDs of the previous ingestion. New documents come after all known ones. The IDs
+    stay consecutive, so if documents of the previous ingestion are missing, the documents after them move up.
+    :param parts: Iterable of lists of (key, title, normalized text) records, in source order. A key identifies the
+    source and the record within it.
+    :param document_ids: Dictionary that maps the keys of the previous ingestion to their document IDs, or None
+    :return: Tuple of the documents with consecutive IDs, without the records whose key was already seen, and a
+    dictionary that maps their keys to their IDs
+    """
+    document_ids = document_ids or {}
+    records = {}
+    for part in parts:
+        for key, title, raw_text in part:
+            if key not in records:
+                records[key] = (title, raw_text)
+    new_id = max(document_ids.values(), default=-1) + 1
+    order = []
+    for key in records:
+        if key in document_ids:
+            order.append((document_ids[key], key))
+        else:
+            order.append((new_id, key))
+            new_id += 1
+    order.sort()
+    collection = [extraction.create_document(document_id, *records[key]) for document_id, (_, key) in enumerate(order)]
+    return collection, {key: document_id for document_id, (_, key) in enumerate(order)}
+
+
+def load_document_ids(file_path: str) -> dict:
+    """
+    :param file_path: Path of the JSON file written by save_document_ids()
+    :return: Dictionary that maps the keys of the documents to their IDs, empty if the file does not exist
+    """
+    if not os.path.isfile(file_path):
+        return {}
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+
+def save_document_ids(document_ids: dict, file_path: str) -> None:
+    """
+    :param document_ids: Dictionary that maps the keys of the documents to their IDs, as returned by ingest()
+    :param file_path: Path of the JSON file
+    """
+    with open(file_path, 'w') as f:
+        json.dump(document_ids, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the collection from several sources in parallel.')
+    parser.add_argument('--aesop', action='append', default=[], help="Gutenberg file of Aesop's Fables")
+    parser.add_argument('--text-directory', action='append', default=[], help='Directory of .txt files')
+    parser.add_argument('--jsonl', action='append', default=[], help='JSONL file with one document per line')
+    parser.add_argument('--id-field', default='id', help='ID field of the JSONL records')
+    parser.add_argument('--title-field', default='title', help='Title field of the JSONL records')
+    parser.add_argument('--text-field', default='text', help='Text field of the JSONL records')
+    parser.add_argument('--processes', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--output', default=os.path.join('data', 'my_collection.json'),
+                        help='JSON collection to write (the document store is written next to it)')
+    arguments = parser.parse_args()
+
+    readers = [AesopReader(path) for path in arguments.aesop]
+    readers += [TextDirectoryReader(path) for path in arguments.text_directory]
+    readers += [JsonlReader(path, arguments.id_field, arguments.title_field, arguments.text_field)
+                for path in arguments.jsonl]
+    if not readers:
+        parser.error('No source given.')
+    document_ids_path = os.path.splitext(arguments.output)[0] + '.ids.json'
+    collection, document_ids = ingest(readers, arguments.processes, load_document_ids(document_ids_path))
+    extraction.save_collection_as_json(collection, arguments.output)
+    docstore.save_collection_as_store(collection, os.path.splitext(arguments.output)[0] + '.store')
+    save_document_ids(document_ids, document_ids_path)
+    print(f'Ingested {len(collection)} documents from {len(readers)} sources into {arguments.output}.',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,50 @@
+import copy
+import heapq
 import json
+import math
 import os
+import re
+import threading
 
 import cleanup
+import docstore
 import extraction
-import models
+import metrics
 import porter
+import query_parser
+import result_cursor
+import snapshot
+from bitmap import Bitmap
 from document import Document
-from pyparsing import Word, alphas, infixNotation, opAssoc
-import pyparsing
+from index_generation import IndexGeneration
 import time
-identifier = Word(alphas)
-and_op = '&'
-or_op = '|'
-not_op = '-'
-
-expr = infixNotation(
-    identifier,
-    [
-        (not_op, 1, opAssoc.RIGHT),
-        (and_op, 2, opAssoc.LEFT),
-        (or_op, 2, opAssoc.LEFT),
-    ]
-)
 # Important paths:
 RAW_DATA_PATH = 'raw_data'
 DATA_PATH = 'data'
 COLLECTION_PATH = os.path.join(DATA_PATH, 'my_collection.json')
+DOCUMENT_STORE_PATH = os.path.join(DATA_PATH, 'my_collection.store')
 STOPWORD_FILE_PATH = os.path.join(DATA_PATH, 'stopwords.json')
+# Document IDs of the ingested records by source and key, so the documents keep their IDs when the sources change.
+DOCUMENT_IDS_PATH = os.path.join(DATA_PATH, 'my_collection.ids.json')
+INDEX_PATH = os.path.join(DATA_PATH, 'index')  # Out-of-core index, built with spimi.py.
+# Old and new document IDs of a collection whose near-duplicates were removed, used to remap the ground truth.
+DOCUMENT_ID_MAP_PATH = os.path.join(DATA_PATH, 'document_id_map.json')
+METRICS_FILE_PATH = os.path.join(DATA_PATH, 'metrics.prom')  # Prometheus text; a .json path is written as JSON.
+METRICS_EXPORT_INTERVAL = 60  # Seconds between two writes of the metrics file while the menu runs.
 
 # Menu choices:
 (CHOICE_LIST, CHOICE_SEARCH, CHOICE_EXTRACT, CHOICE_UPDATE_STOP_WORDS, CHOICE_SET_MODEL, CHOICE_SHOW_DOCUMENT,
- CHOICE_EXIT) = 1, 2, 3, 4, 5, 6, 9
-MODEL_BOOL_LIN, MODEL_BOOL_INV, MODEL_BOOL_SIG, MODEL_FUZZY, MODEL_VECTOR = 1, 2, 3, 4, 5
+ CHOICE_MEMORY_REPORT, CHOICE_METRICS, CHOICE_EXIT) = 1, 2, 3, 4, 5, 6, 7, 8, 9
+(MODEL_BOOL_LIN, MODEL_BOOL_INV, MODEL_BOOL_SIG, MODEL_FUZZY, MODEL_VECTOR, MODEL_LSI,
+ MODEL_EXTENDED) = 1, 2, 3, 4, 5, 6, 7
 SW_METHOD_LIST, SW_METHOD_CROUCH = 1, 2
+SOURCE_AESOP, SOURCE_TEXT_DIRECTORY, SOURCE_JSONL = 1, 2, 3
+# Pseudo-relevance feedback (see rocchio_search()): number of top documents that are taken as relevant, number of
+# terms the query is expanded with, and the weights of the original query and of the centroid.
+FEEDBACK_DOCUMENTS = 5
+EXPANSION_TERMS = 5
+ROCCHIO_ALPHA, ROCCHIO_BETA = 1.0, 0.75
+BUCKLEY_LEWIT_GAMMA = 9  # The Buckley-Lewit algorithm stops once its top gamma documents are certain.
 
 
 class InformationRetrievalSystem(object):
@@ -41,31 +53,74 @@ class InformationRetrievalSystem(object):
             os.makedirs(DATA_PATH)
 
         # Collection of documents, initially empty.
-        try:
-            self.collection = extraction.load_collection_from_json(COLLECTION_PATH)
-        except FileNotFoundError:
-            print('No previous collection was found. Creating empty one.')
-            self.collection = []
+        collection = self.load_collection()
+
+        # Restore the last built model from a snapshot, if the input files are unchanged.
+        model, model_arguments = snapshot.load_latest_snapshot()
+        if model is not None:
+            print(f'Restored {model} from snapshot.')
 
         # Stopword list, initially empty.
         try:
             with open(STOPWORD_FILE_PATH, 'r') as f:
-                self.stop_word_list = json.load(f)
+                stop_word_list = json.load(f)
         except FileNotFoundError:
             print('No stopword list was found.')
-            self.stop_word_list = []
+            stop_word_list = []
 
-        self.model = None  # Saves the current IR model in use.
-        self.output_k = 10  # Controls how many results should be shown for a query.
+        # Current index generation (collection, stop words and model). Searches read it once and keep using that
+        # generation, rebuilds publish a new one by replacing this reference (see rebuild()).
+        self.generation = IndexGeneration(collection, stop_word_list, model, model_arguments)
+        self.rebuild_lock = threading.Lock()  # Serializes rebuilds; searches never acquire it.
+        self.rebuild_thread = None  # Thread of the last background rebuild.
+        self.variant_thread = None  # Thread that builds index variants in the background, see prepare_variants().
 
+        self.output_k = 10  # Controls how many results should be shown for a query.
+        self.auto_correct_queries = False  # Controls, whether queries without results are spelling corrected.
+        self.pseudo_relevance_feedback = False  # Controls, whether vector space queries are expanded (Rocchio).
+        # Candidates, false drops and tested signatures of signature searches, in total and for the last query.
+        self.signature_statistics = {}
+        self.last_signature_statistics = None
+        # Latencies and result counts of searches, build durations and cache hit rates, see get_metrics_gauges().
+        self.metrics = metrics.MetricsRegistry()
+        self.metrics.add_gauges(self.get_metrics_gauges)
+        self.metrics_exporter = None
+
+    @property
+    def collection(self) -> list[Document]:
+        return self.generation.collection
+
+    @collection.setter
+    def collection(self, collection: list[Document]):
+        self.generation = self.generation.replace(collection=collection)
+
+    @property
+    def stop_word_list(self) -> list[str]:
+        return self.generation.stop_word_list
+
+    @stop_word_list.setter
+    def stop_word_list(self, stop_word_list: list[str]):
+        self.generation = self.generation.replace(stop_word_list=stop_word_list)
+
+    @property
+    def model(self):
+        return self.generation.model
+
+    @model.setter
+    def model(self, model):
+        self.generation = self.generation.replace(model=model, model_arguments={})
 
     def main_menu(self):
         """
         Provides the main loop of the CLI menu that the user interacts with.
         """
+        self.metrics_exporter = metrics.MetricsExporter(self.metrics, METRICS_FILE_PATH, METRICS_EXPORT_INTERVAL)
+        self.metrics_exporter.start()
         while True:
             print(f'Current retrieval model: {self.model}')
             print(f'Current collection: {len(self.collection)} documents')
+            if self.rebuild_thread is not None and self.rebuild_thread.is_alive():
+                print('A rebuild is running in the background, searches use the current index until it is done.')
             print()
             print('Please choose an option:')
             print(f'{CHOICE_LIST} - List documents')
@@ -74,6 +129,8 @@ class InformationRetrievalSystem(object):
             print(f'{CHOICE_UPDATE_STOP_WORDS} - Rebuild stopword list')
             print(f'{CHOICE_SET_MODEL} - Set model')
             print(f'{CHOICE_SHOW_DOCUMENT} - Show a specific document')
+            print(f'{CHOICE_MEMORY_REPORT} - Show memory usage of index structures')
+            print(f'{CHOICE_METRICS} - Show query metrics')
             print(f'{CHOICE_EXIT} - Exit')
             action_choice = int(input('Enter choice: '))
 
@@ -88,6 +145,7 @@ class InformationRetrievalSystem(object):
 
             elif action_choice == CHOICE_SEARCH:
                 # Read a query string from the CLI and search for it.
+                import models
 
                 # Determine desired search parameters:
                 SEARCH_NORMAL, SEARCH_SW, SEARCH_STEM, SEARCH_SW_STEM = 1, 2, 3, 4
@@ -99,32 +157,48 @@ class InformationRetrievalSystem(object):
                 search_mode = int(input('Enter choice: '))
                 stop_word_filtering = (search_mode == SEARCH_SW) or (search_mode == SEARCH_SW_STEM)
                 stemming = (search_mode == SEARCH_STEM) or (search_mode == SEARCH_SW_STEM)
+                if isinstance(self.model, models.VectorSpaceModel):
+                    feedback = input('Expand the query with pseudo-relevance feedback? [y/N]: ')
+                    self.pseudo_relevance_feedback = feedback == 'y'
 
                 # Actual query processing begins here:
-                query = input('Query: ')
-                if stemming:
-                    query = porter.stem_query_terms(query)
+                raw_query = input('Query: ')
+                query = porter.stem_query_terms(raw_query) if stemming else raw_query
                 start_time=time.time()
-                if isinstance(self.model, models.InvertedListBooleanModel):
-                    results = self.inverted_list_search(query, stemming, stop_word_filtering)
-                elif isinstance(self.model, models.VectorSpaceModel):
-                    results = self.buckley_lewit_search(query, stemming, stop_word_filtering)
-                elif isinstance(self.model, models.SignatureBasedBooleanModel):
-                    results = self.signature_search(query, stemming, stop_word_filtering)
-                else:
-                    results = self.basic_query_search(query, stemming, stop_word_filtering)
+                generation = self.generation  # The whole query is answered from one index generation.
+                cursor = self.search_cursor(query, stemming, stop_word_filtering, generation)
+
+                # Queries without results are checked for syntax errors and misspelled terms:
+                query_error = None if cursor.has_more() else self.get_query_error(query, generation)
+                if query_error is not None:
+                    print(f'Invalid query: {query_error}')
+                elif not cursor.has_more():
+                    corrected_query = self.correct_query(raw_query, generation)
+                    if corrected_query is not None and self.auto_correct_queries:
+                        print(f'No results for "{raw_query}", showing results for "{corrected_query}" instead.')
+                        query = porter.stem_query_terms(corrected_query) if stemming else corrected_query
+                        cursor = self.search_cursor(query, stemming, stop_word_filtering, generation)
+                    elif corrected_query is not None:
+                        print(f'Did you mean: {corrected_query}')
 
-                ranked_results=sorted(results, key=lambda x: x[0], reverse=True)
-                
                 print(f'Top {self.output_k} Relevant Documents:')
-                # Output of results:
-                for (score, document) in ranked_results[:self.output_k]:
-                    print(f'{score}: {document}')
-
-                # Output of quality metrics:
+                # Output of results (the cursor yields them in ranking order, one page at a time):
+                query_terms = re.findall('[a-z]+', query.lower())
+                self.print_results(cursor.next_page(), query_terms)
+
+                # Output of quality metrics (ranked models are evaluated on their first page, Boolean models on
+                # their result bitmap, so their results are not looked up beyond the page shown):
+                if isinstance(cursor.source, result_cursor.BitmapResultSource):
+                    precision, recall = self.calculate_bitmap_quality(query, cursor.source.bitmap, generation)
+                else:
+                    results = cursor.peek(self.output_k if cursor.source.ranked else None)
+                    precision = self.calculate_precision(query, results, generation)
+                    recall = self.calculate_recall(query, results, generation)
                 print()
-                print(f'precision: {self.calculate_precision(query,results)}')
-                print(f'recall: {self.calculate_recall(query,results)}')
+                print(f'precision: {precision}')
+                print(f'recall: {recall}')
+                if isinstance(generation.model, models.SignatureBasedBooleanModel):
+                    print(f'false drops: {self.get_false_drop_summary()}')
 
                 # Measure and print query processing time in ms
                 
@@ -132,22 +206,51 @@ class InformationRetrievalSystem(object):
                 processing_time_ms = (end_time - start_time) * 1000
                 print(f'Query processing time: {processing_time_ms:.2f} ms')
 
-            elif action_choice == CHOICE_EXTRACT:
-                # Extract document collection from text file.
+                while cursor.has_more() and input('Show next page? [y/N]: ') == 'y':
+                    self.print_results(cursor.next_page(), query_terms)
 
-                raw_collection_file = os.path.join(RAW_DATA_PATH, 'aesopa10.txt')
-                self.collection = extraction.extract_collection(raw_collection_file)
-                assert isinstance(self.collection, list)
-                assert all(isinstance(d, Document) for d in self.collection)
+            elif action_choice == CHOICE_EXTRACT:
+                # Extract document collection from a source, parsed in parallel worker processes.
+                import ingestion
+                import near_duplicates
+
+                print('Available sources:')
+                print(f"{SOURCE_AESOP} - Aesop's Fables (raw_data/aesopa10.txt)")
+                print(f'{SOURCE_TEXT_DIRECTORY} - Directory of text files')
+                print(f'{SOURCE_JSONL} - JSONL file')
+                source_choice = int(input('Enter choice: '))
+                if source_choice == SOURCE_TEXT_DIRECTORY:
+                    reader = ingestion.TextDirectoryReader(input('Directory: '))
+                elif source_choice == SOURCE_JSONL:
+                    reader = ingestion.JsonlReader(input('JSONL file: '), input('ID field [id]: ') or 'id',
+                                                   input('Title field [title]: ') or 'title',
+                                                   input('Text field [text]: ') or 'text')
+                else:
+                    reader = ingestion.AesopReader(os.path.join(RAW_DATA_PATH, 'aesopa10.txt'))
+                collection, document_ids = ingestion.ingest([reader],
+                                                            document_ids=ingestion.load_document_ids(DOCUMENT_IDS_PATH))
+                print(f'Extracted {len(collection)} documents.')
+                assert isinstance(collection, list)
+                assert all(isinstance(d, Document) for d in collection)
+
+                id_map = {}
+                if input('Should near-duplicate documents be removed? [y/N]: ') == 'y':
+                    collection, clusters, id_map = near_duplicates.remove_near_duplicates(collection)
+                    print(f'Removed {sum(len(cluster) - 1 for cluster in clusters)} near-duplicates '
+                          f'({len(clusters)} clusters).')
 
                 if input('Should stopwords be filtered? [y/N]: ') == 'y':
-                    cleanup.filter_collection(self.collection)
+                    cleanup.filter_collection(collection)
 
                 if input('Should stemming be performed? [y/N]: ') == 'y':
-                    porter.stem_all_documents(self.collection)
+                    porter.stem_all_documents(collection)
 
-                extraction.save_collection_as_json(self.collection, COLLECTION_PATH)
-                print('Done.\n')
+                # The collection and its ID maps are saved and the current model is rebuilt for it before all of them
+                # are published together.
+                background = input('Rebuild in the background? [y/N]: ') == 'y'
+                self.rebuild(collection=collection, document_ids=document_ids, document_id_map=id_map,
+                             background=background)
+                print('Rebuild started.\n' if background else 'Done.\n')
 
             elif action_choice == CHOICE_UPDATE_STOP_WORDS:
                 # Rebuild the stop word list, using one out of two methods.
@@ -160,20 +263,23 @@ class InformationRetrievalSystem(object):
                 if method_choice in (SW_METHOD_LIST, SW_METHOD_CROUCH):
                     # Load stop words using the desired method:
                     if method_choice == SW_METHOD_LIST:
-                        self.stop_word_list = cleanup.load_stop_word_list(os.path.join(RAW_DATA_PATH, 'englishST.txt'))
-                        print('Done.\n')
+                        stop_word_list = cleanup.load_stop_word_list(os.path.join(RAW_DATA_PATH, 'englishST.txt'))
+                    elif method_choice == SW_METHOD_CROUCH and os.path.isfile(DOCUMENT_STORE_PATH):
+                        # The documents are streamed from the store instead of decoding the whole collection.
+                        stop_word_list = cleanup.create_stop_word_list_from_store(DOCUMENT_STORE_PATH)
                     elif method_choice == SW_METHOD_CROUCH:
-                        self.stop_word_list = cleanup.create_stop_word_list_by_frequency(self.collection)
-                        print('Done.\n')
+                        stop_word_list = cleanup.create_stop_word_list_by_frequency(self.collection)
 
-                    # Save new stopword list into file:
-                    with open(STOPWORD_FILE_PATH, 'w') as f:
-                        json.dump(self.stop_word_list, f)
+                    # Save new stopword list into file and publish it:
+                    self.rebuild(stop_word_list=stop_word_list)
+                    print('Done.\n')
                 else:
                     print('Invalid choice.')
 
             elif action_choice == CHOICE_SET_MODEL:
                 # Choose and set the retrieval model to use for searches.
+                import models
+                import spimi
 
                 print()
                 print('Available models:')
@@ -182,34 +288,66 @@ class InformationRetrievalSystem(object):
                 print(f'{MODEL_BOOL_SIG} - Boolean model with signature-based search')
                 print(f'{MODEL_FUZZY} - Fuzzy set model')
                 print(f'{MODEL_VECTOR} - Vector space model')
+                print(f'{MODEL_LSI} - Latent semantic indexing')
+                print(f'{MODEL_EXTENDED} - Extended Boolean model (p-norm)')
                 model_choice = int(input('Enter choice: '))
-                if model_choice == MODEL_BOOL_LIN:
-                    self.model = models.LinearBooleanModel()
-                elif model_choice == MODEL_BOOL_INV:
-                    self.model = models.InvertedListBooleanModel()
-                elif model_choice == MODEL_BOOL_SIG:
-                    self.model = models.SignatureBasedBooleanModel()
-                elif model_choice == MODEL_FUZZY:
-                    self.model = models.FuzzySetModel()
-                elif model_choice == MODEL_VECTOR:
-                    self.model = models.VectorSpaceModel()
+                model_classes = {
+                    MODEL_BOOL_LIN: models.LinearBooleanModel,
+                    MODEL_BOOL_INV: models.InvertedListBooleanModel,
+                    MODEL_BOOL_SIG: models.SignatureBasedBooleanModel,
+                    MODEL_FUZZY: models.FuzzySetModel,
+                    MODEL_VECTOR: models.VectorSpaceModel
+                }
+                model_arguments = {}
+                if model_choice == MODEL_LSI:
+                    model_classes[MODEL_LSI] = models.LSIModel
+                    rank = input(f'Rank of the LSI model [{models.LSIModel.DEFAULT_RANK}]: ')
+                    model_arguments['rank'] = int(rank) if rank else models.LSIModel.DEFAULT_RANK
+                elif model_choice == MODEL_EXTENDED:
+                    model_classes[MODEL_EXTENDED] = models.ExtendedBooleanModel
+                    p = input(f'p of the p-norm [{models.ExtendedBooleanModel.DEFAULT_P:g}]: ')
+                    model_arguments['p'] = float(p) if p else models.ExtendedBooleanModel.DEFAULT_P
+                if (model_choice in (MODEL_BOOL_INV, MODEL_VECTOR) and
+                        os.path.isfile(os.path.join(INDEX_PATH, spimi.METADATA_FILE_NAME)) and
+                        input('Load the inverted lists from the out-of-core index? [y/N]: ') == 'y'):
+                    model_arguments['index_directory'] = INDEX_PATH
+                if model_choice in model_classes:
+                    background = input('Build in the background? [y/N]: ') == 'y'
+                    # Index variants are built on first use unless they are prepared together with the model.
+                    prepare_stemming = input('Prepare the index for searches with stemming? [y/N]: ') == 'y'
+                    prepare_filtering = input('Prepare the index for searches without stop words? [y/N]: ') == 'y'
+                    self.rebuild(model_class=model_classes[model_choice], model_arguments=model_arguments,
+                                 background=background)
+                    self.prepare_variants(prepare_stemming, prepare_filtering, background=background)
+                    if background:
+                        print('Build started, searches use the current model until it is done.')
+                    elif isinstance(self.model, models.LSIModel):
+                        print(self.model.get_build_report())
                 else:
                     print('Invalid choice.')
 
             elif action_choice == CHOICE_SHOW_DOCUMENT:
                 target_id = int(input('ID of the desired document:'))
-                found = False
-                for document in self.collection:
-                    if document.document_id == target_id:
-                        print(document.title)
-                        print('-' * len(document.title))
-                        print(document.raw_text)
-                        found = True
-
-                if not found:
+                document = self.get_document(target_id)
+                if document is not None:
+                    print(document.title)
+                    print('-' * len(document.title))
+                    print(document.raw_text)
+                else:
                     print(f'Document #{target_id} not found!')
 
+            elif action_choice == CHOICE_MEMORY_REPORT:
+                import memory_report
+                print(memory_report.format_memory_report(self.get_memory_report()))
+                for name, seconds in getattr(self.model, 'variant_build_times', {}).items():
+                    print(f'Index variant {name} built in {seconds:.3f} s')
+
+            elif action_choice == CHOICE_METRICS:
+                print(metrics.format_summary(self.metrics))
+                print(f'Metrics are written to {METRICS_FILE_PATH} every {METRICS_EXPORT_INTERVAL} s.')
+
             elif action_choice == CHOICE_EXIT:
+                self.metrics_exporter.stop()
                 break
             else:
                 print('Invalid choice.')
@@ -218,7 +356,421 @@ class InformationRetrievalSystem(object):
             input('Press ENTER to continue...')
             print()
 
-    def basic_query_search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
+    def print_results(self, results: list, query_terms: list[str]) -> None:
+        """
+        Prints results with a snippet of each document.
+        :param results: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        :param query_terms: Terms to highlight in the snippets
+        """
+        import snippets
+        for (score, document) in results:
+            print(f'{score}: {document}')
+            print(f'    {snippets.generate_snippet(document, query_terms)}')
+
+    def set_model(self, model_class, **model_arguments) -> None:
+        """
+        Sets the retrieval model (see rebuild()).
+        :param model_class: Class of the retrieval model to use
+        :param model_arguments: Keyword arguments for building the model, e. g. the rank of an LSIModel
+        """
+        self.rebuild(model_class=model_class, model_arguments=model_arguments)
+
+    def rebuild(self, collection: list[Document] = None, stop_word_list: list[str] = None, model_class=None,
+                model_arguments: dict = None, document_ids: dict = None, document_id_map: dict = None,
+                background: bool = False) -> threading.Thread:
+        """
+        Builds a new index generation and publishes it by replacing self.generation. Searches that are running keep
+        the generation they started with, so they neither wait for the rebuild nor see a collection and a model of
+        different builds. Rebuilds are serialized among each other.
+        :param collection: New collection, which is saved to the data directory (default: keep the current one)
+        :param stop_word_list: New stop word list, which is saved to the data directory (default: keep the current one)
+        :param model_class: Class of the new retrieval model. If only the collection is replaced, the current model is
+        built again for the new collection.
+        :param model_arguments: Keyword arguments for building the model, e. g. the rank of an LSIModel
+        :param document_ids: IDs of the ingested records of a new collection (see ingestion.ingest()), or None
+        :param document_id_map: Old and new IDs of a new collection whose near-duplicates were removed (see
+        near_duplicates.remove_near_duplicates()), or None
+        :param background: Controls, whether the rebuild runs in a background thread
+        :return: The background thread, or None if the rebuild is already done
+        """
+        def build_and_publish():
+            with self.rebuild_lock:
+                self.generation = self.build_generation(self.generation, collection, stop_word_list, model_class,
+                                                        model_arguments, document_ids, document_id_map)
+
+        if not background:
+            build_and_publish()
+            return None
+        self.rebuild_thread = threading.Thread(target=build_and_publish, daemon=True)
+        self.rebuild_thread.start()
+        return self.rebuild_thread
+
+    def prepare_variants(self, stemming: bool, stop_word_filtering: bool, background: bool = False,
+                         generation: IndexGeneration = None) -> threading.Thread:
+        """
+        Builds the index variants of the model that searches with a configuration need (see
+        models.RetrievalModel.get_variant()), so their build time is not paid by the first search.
+        :param stemming: Controls, whether the variants for stemming are built
+        :param stop_word_filtering: Controls, whether the variants for stop word filtering are built
+        :param background: Controls, whether the variants are built in a background thread. The thread waits for a
+        running background rebuild and prepares the model it publishes.
+        :param generation: Index generation whose model is prepared (default: the current one)
+        :return: The background thread, or None if the variants are already built
+        """
+        def prepare():
+            if generation is None and rebuild_thread is not None:
+                rebuild_thread.join()
+            model = (generation or self.generation).model
+            if model is not None:
+                model.prepare_variants(stemming, stop_word_filtering)
+
+        rebuild_thread = self.rebuild_thread
+        if not background:
+            prepare()
+            return None
+        self.variant_thread = threading.Thread(target=prepare, daemon=True)
+        self.variant_thread.start()
+        return self.variant_thread
+
+    def build_generation(self, base: IndexGeneration, collection: list[Document] = None,
+                         stop_word_list: list[str] = None, model_class=None, model_arguments: dict = None,
+                         document_ids: dict = None, document_id_map: dict = None) -> IndexGeneration:
+        """
+        Builds a new index generation from a base generation, without modifying or publishing anything in memory.
+        :param base: Generation that provides all parts that are not replaced
+        :param collection: New collection, or None
+        :param stop_word_list: New stop word list, or None
+        :param model_class: Class of the new retrieval model, or None
+        :param model_arguments: Keyword arguments for building the model
+        :param document_ids: IDs of the ingested records of the new collection, saved with it if given
+        :param document_id_map: Old and new IDs of the documents of the new collection, saved with it (see
+        load_ground_truth())
+        :return: New generation
+        """
+        import models
+        if collection is not None:
+            # Models read the collection from the data directory, so it is saved first.
+            extraction.save_collection_as_json(collection, COLLECTION_PATH)
+            docstore.save_collection_as_store(collection, DOCUMENT_STORE_PATH)
+            if document_ids is not None:
+                import ingestion
+                ingestion.save_document_ids(document_ids, DOCUMENT_IDS_PATH)
+            # The ground truth refers to the documents by their original IDs, so it is remapped with the collection.
+            if any(old_id != new_id for old_id, new_id in (document_id_map or {}).items()):
+                with open(DOCUMENT_ID_MAP_PATH, 'w') as f:
+                    json.dump(document_id_map, f)
+            elif os.path.isfile(DOCUMENT_ID_MAP_PATH):
+                os.remove(DOCUMENT_ID_MAP_PATH)
+            if model_class is None and base.model is not None:
+                model_class, model_arguments = type(base.model), base.model_arguments
+        if stop_word_list is not None:
+            with open(STOPWORD_FILE_PATH, 'w') as f:
+                json.dump(stop_word_list, f)
+
+        if model_class is not None:
+            model = self.load_or_build_model(model_class, model_arguments or {})
+        else:
+            model, model_arguments = base.model, base.model_arguments
+            if stop_word_list is not None and isinstance(model, models.LinearBooleanModel):
+                # The published model is not changed, its copy gets the new stop words.
+                model = copy.copy(model)
+                model.set_stop_words(stop_word_list)
+
+        return IndexGeneration(collection if collection is not None else base.collection,
+                               stop_word_list if stop_word_list is not None else base.stop_word_list,
+                               model, model_arguments)
+
+    def load_or_build_model(self, model_class, model_arguments: dict):
+        """
+        Loads a valid snapshot of a model if available, otherwise the model is built and a snapshot is saved for the
+        next start.
+        :param model_class: Class of the retrieval model
+        :param model_arguments: Keyword arguments for building the model
+        :return: Retrieval model
+        """
+        fingerprint = snapshot.compute_fingerprint(model_arguments)
+        snapshot_name = snapshot.get_snapshot_name(model_class, model_arguments)
+        start_time = time.perf_counter()
+        model = snapshot.load_model_snapshot(snapshot_name, fingerprint)
+        if model is not None:
+            self.metrics.observe('index_build_seconds', time.perf_counter() - start_time, model=model_class.__name__,
+                                 source='snapshot')
+            return model
+        model = model_class(**model_arguments)
+        # The spelling corrector is part of the build, so queries without results do not wait for it.
+        model.get_spelling_corrector()
+        self.metrics.observe('index_build_seconds', time.perf_counter() - start_time, model=model_class.__name__,
+                             source='build')
+        snapshot.save_model_snapshot(model, fingerprint, snapshot_name, model_arguments)
+        return model
+
+    def load_collection(self) -> list[Document]:
+        """
+        Loads the collection from the document store, so that only IDs and titles are read at startup. Falls back to
+        the JSON collection (and creates the document store from it) if the store is missing or older than the JSON
+        file.
+        :return: List of Document objects
+        """
+        if os.path.isfile(DOCUMENT_STORE_PATH) and (not os.path.isfile(COLLECTION_PATH) or
+                                                    os.path.getmtime(DOCUMENT_STORE_PATH) >=
+                                                    os.path.getmtime(COLLECTION_PATH)):
+            collection = docstore.load_collection_from_store(DOCUMENT_STORE_PATH)
+            if collection is not None:
+                return collection
+        collection = extraction.load_collection_from_json(COLLECTION_PATH)
+        if collection:
+            docstore.save_collection_as_store(collection, DOCUMENT_STORE_PATH)
+        return collection
+
+    def get_document(self, document_id: int) -> Document:
+        """
+        Looks up a document of the current collection by its ID in O(1).
+        :param document_id: ID of the document
+        :return: Document or None if the ID is unknown
+        """
+        return self.generation.get_document(document_id)
+
+    def get_memory_report(self) -> list[dict]:
+        """
+        Measures the memory of the collection, of every data structure of the current model and of the caches of the
+        system (see memory_report.get_memory_report()).
+        :return: One row per structure
+        """
+        import memory_report
+        generation = self.generation
+        structures = [('collection', generation.collection)]
+        if generation.model is not None:
+            for name, structure in vars(generation.model).items():
+                if name == 'variants':
+                    structures += [(f'model.variant: {variant_name}', variant)
+                                   for variant_name, variant in structure.items()]
+                elif not isinstance(structure, (int, float, str, bool, type(None))):
+                    structures.append((f'model.{name}', structure))
+        structures += [
+            ('cache: universe bitmap', generation.universe_bitmap),
+            ('cache: document index', generation.document_index),
+            ('cache: subexpressions', generation.subexpression_cache)
+        ]
+        return memory_report.get_memory_report(structures)
+
+    def search(self, query: str, stemming: bool, stop_word_filtering: bool, generation: IndexGeneration = None) -> list:
+        """
+        Searches with the search method of the current model.
+        :param query: Query string (already stemmed if stemming is used)
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        import models
+        if generation is None:
+            generation = self.generation
+        start_time = time.perf_counter()
+        if isinstance(generation.model, models.InvertedListBooleanModel):
+            results = self.inverted_list_search(query, stemming, stop_word_filtering, generation)
+        elif isinstance(generation.model, models.VectorSpaceModel) and self.pseudo_relevance_feedback:
+            results = self.rocchio_search(query, stemming, stop_word_filtering, generation)
+        elif isinstance(generation.model, models.VectorSpaceModel):
+            results = self.buckley_lewit_search(query, stemming, stop_word_filtering, generation)
+        elif isinstance(generation.model, models.LSIModel):
+            results = self.lsi_search(query, stemming, stop_word_filtering, generation)
+        elif isinstance(generation.model, models.ExtendedBooleanModel):
+            results = self.p_norm_search(query, stemming, stop_word_filtering, generation)
+        elif isinstance(generation.model, models.SignatureBasedBooleanModel):
+            results = self.signature_search(query, stemming, stop_word_filtering, generation)
+        else:
+            results = self.basic_query_search(query, stemming, stop_word_filtering, generation)
+        self.record_search(generation, stemming, stop_word_filtering, time.perf_counter() - start_time, len(results),
+                           self.pseudo_relevance_feedback)
+        return results
+
+    def search_cursor(self, query: str, stemming: bool, stop_word_filtering: bool, generation: IndexGeneration = None,
+                      page_size: int = None, pseudo_relevance_feedback: bool = None) -> result_cursor.ResultCursor:
+        """
+        Searches with the current model and returns a lazy cursor. The query is evaluated to a bitmap or a score array
+        right away, but results are ranked and their documents are looked up only page by page.
+        :param query: Query string (already stemmed if stemming is used)
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
+        :param page_size: Number of results per page (default: output_k)
+        :param pseudo_relevance_feedback: Controls, whether vector space queries are expanded (default:
+        self.pseudo_relevance_feedback)
+        :return: Cursor over the results
+        """
+        if generation is None:
+            generation = self.generation
+        if pseudo_relevance_feedback is None:
+            pseudo_relevance_feedback = self.pseudo_relevance_feedback
+        state = {'query': query, 'stemming': stemming, 'stop_word_filtering': stop_word_filtering,
+                 'pseudo_relevance_feedback': pseudo_relevance_feedback, 'generation': generation.number}
+        start_time = time.perf_counter()
+        source = self.get_result_source(query, stemming, stop_word_filtering, generation, pseudo_relevance_feedback)
+        self.record_search(generation, stemming, stop_word_filtering, time.perf_counter() - start_time, len(source),
+                           pseudo_relevance_feedback)
+        return result_cursor.ResultCursor(source, generation.get_document, page_size or self.output_k, state)
+
+    def record_search(self, generation: IndexGeneration, stemming: bool, stop_word_filtering: bool, seconds: float,
+                      result_count: int, pseudo_relevance_feedback: bool = False) -> None:
+        """
+        Adds a search to the latency and result count histograms, broken down by model and search mode.
+        :param generation: Index generation that was searched
+        :param stemming: Controls, whether stemming was used
+        :param stop_word_filtering: Controls, whether stop-words were ignored
+        :param seconds: Time the search took
+        :param result_count: Number of retrieved documents
+        :param pseudo_relevance_feedback: Controls, whether vector space queries were expanded
+        """
+        import models
+        mode = '+'.join([name for name, used in (('stop_words', stop_word_filtering), ('stemming', stemming),
+                                                 ('feedback', pseudo_relevance_feedback and
+                                                  isinstance(generation.model, models.VectorSpaceModel)))
+                         if used]) or 'standard'
+        model = type(generation.model).__name__
+        self.metrics.observe('search_latency_seconds', seconds, model=model, mode=mode)
+        self.metrics.observe('search_results', result_count, metrics.COUNT_BUCKETS, model=model, mode=mode)
+
+    def get_metrics_gauges(self) -> list[tuple]:
+        """
+        Reads the metrics of the current index generation that are kept by other structures: the hit rate of the
+        subexpression cache and the build times of the index variants of the model.
+        :return: List of (name, labels, value) triples (see metrics.MetricsRegistry.add_gauges())
+        """
+        generation = self.generation
+        gauges = []
+        cache = generation.subexpression_cache
+        if cache is not None:
+            labels = {'generation': generation.number}
+            gauges += [('subexpression_cache_hits', labels, cache.hits),
+                       ('subexpression_cache_misses', labels, cache.misses),
+                       ('subexpression_cache_hit_ratio', labels, cache.get_hit_rate()),
+                       ('subexpression_cache_postings', labels, cache.postings)]
+        model = type(generation.model).__name__
+        for variant, seconds in getattr(generation.model, 'variant_build_times', {}).items():
+            gauges.append(('index_variant_build_seconds', {'model': model, 'variant': variant}, seconds))
+        return gauges
+
+    def resume_cursor(self, token: str) -> result_cursor.ResultCursor:
+        """
+        Recreates a cursor from its continuation token. The query is evaluated again, and the cursor continues after
+        the results that were already consumed.
+        :param token: Continuation token of a cursor
+        :return: Cursor positioned at the next page
+        """
+        state = result_cursor.decode_token(token)
+        generation = self.generation
+        if state.get('generation') != generation.number:
+            raise ValueError('The continuation token belongs to an index generation that was replaced by a rebuild.')
+        try:
+            cursor = self.search_cursor(state['query'], state['stemming'], state['stop_word_filtering'], generation,
+                                        state['page_size'], state['pseudo_relevance_feedback'])
+            cursor.position = state['position']
+        except KeyError:
+            raise ValueError('Invalid continuation token.')
+        return cursor
+
+    def get_result_source(self, query: str, stemming: bool, stop_word_filtering: bool, generation: IndexGeneration,
+                          pseudo_relevance_feedback: bool = False):
+        """
+        Evaluates a query with the search method of the model, without materializing the results.
+        :param query: Query string (already stemmed if stemming is used)
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :param pseudo_relevance_feedback: Controls, whether vector space queries are expanded (see rocchio_search())
+        :return: Result source for a ResultCursor
+        """
+        import models
+        model = generation.model
+        if isinstance(model, models.InvertedListBooleanModel):
+            return result_cursor.BitmapResultSource(
+                self.inverted_list_bitmap(query, stemming, stop_word_filtering, generation))
+        elif isinstance(model, models.VectorSpaceModel):
+            # The Buckley-Lewit algorithm stops as soon as its top documents are known, so it has no further pages.
+            if pseudo_relevance_feedback:
+                results = self.rocchio_search(query, stemming, stop_word_filtering, generation)
+            else:
+                results = self.buckley_lewit_search(query, stemming, stop_word_filtering, generation)
+            return result_cursor.ListResultSource([(score, d.document_id) for score, d in results], ranked=True)
+        elif isinstance(model, models.LSIModel):
+            scores = self.lsi_scores(query, stemming, stop_word_filtering, generation)
+            if scores is None:
+                return result_cursor.ListResultSource([], ranked=True)
+            return result_cursor.RankedResultSource(scores)
+        elif isinstance(model, models.ExtendedBooleanModel):
+            return self.p_norm_source(query, stemming, stop_word_filtering, generation)
+        elif isinstance(model, models.SignatureBasedBooleanModel):
+            return result_cursor.BitmapResultSource(
+                self.signature_bitmap(query, stemming, stop_word_filtering, generation))
+        else:
+            return result_cursor.BitmapResultSource(
+                self.basic_query_bitmap(query, stemming, stop_word_filtering, generation))
+
+    def get_bitmap_results(self, retrieved_documents: Bitmap, generation: IndexGeneration) -> list:
+        """
+        :param retrieved_documents: Bitmap of the documents retrieved by a Boolean query
+        :param generation: Index generation the bitmap belongs to
+        :return: List of tuples (1.0, document) in the order of the document IDs
+        """
+        return [(1.0, generation.get_document(document_id)) for document_id in retrieved_documents]
+
+    def get_top_results(self, scores: 'np.ndarray', generation: IndexGeneration) -> list:
+        """
+        :param scores: Array of scores indexed by document ID, or None
+        :param generation: Index generation the scores belong to
+        :return: List of tuples (score, document) of the output_k best documents with a positive score
+        """
+        if scores is None:
+            return []
+        results = result_cursor.RankedResultSource(scores).get_results(0, self.output_k)
+        return [(score, generation.get_document(document_id)) for score, document_id in results]
+
+    def get_query_error(self, query: str, generation: IndexGeneration = None) -> str:
+        """
+        Checks a query against the Boolean query grammar. The search methods treat an invalid query as a query without
+        results, so the menu uses this to tell the user what is wrong with it.
+        :param query: Query string
+        :param generation: Index generation whose model the query is for (default: the current one)
+        :return: Description of the syntax error, or None if the query is valid or the model takes free text queries
+        """
+        import models
+        if generation is None:
+            generation = self.generation
+        if isinstance(generation.model, (models.VectorSpaceModel, models.LSIModel)):
+            return None
+        try:
+            query_parser.parse_query(generation.model.query_to_representation(query))
+        except query_parser.QueryParseError as error:
+            return str(error)
+        return None
+
+    def correct_query(self, query: str, generation: IndexGeneration = None) -> str:
+        """
+        Replaces all terms of a query that do not occur in the collection with their closest vocabulary term (edit
+        distance up to 2). The vocabulary is the one of the non stemmed inverted list of the current model, whose
+        spelling corrector is built with the model (see models.RetrievalModel.get_spelling_corrector()).
+        :param query: Query string (not stemmed)
+        :param generation: Index generation to use (default: the current one)
+        :return: Corrected query, or None if no term could be corrected (or the model has no vocabulary)
+        """
+        if generation is None:
+            generation = self.generation
+        spelling_corrector = generation.model.get_spelling_corrector() if generation.model is not None else None
+        if spelling_corrector is None:
+            return None
+
+        def correct_term(term_match) -> str:
+            correction = spelling_corrector.correct(term_match.group(0))
+            return correction if correction is not None else term_match.group(0)
+
+        query = query.lower()
+        corrected_query = re.sub('[a-z]+', correct_term, query)
+        return corrected_query if corrected_query != query else None
+
+    def basic_query_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                           generation: IndexGeneration = None) -> list:
         """
         Searches the collection for a query string. This method is "basic" in that it does not use any special algorithm
         to accelerate the search. It simply calculates all representations and matches them, returning a sorted list of
@@ -226,246 +778,181 @@ class InformationRetrievalSystem(object):
         :param query: Query string
         :param stemming: Controls, whether stemming is used
         :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
-        def compute_expression_from_collection(expression)->set:
-
-            result_set=set()
-            last_operator=None
-            is_negation=False
-            for element in expression:
-                if isinstance(element,pyparsing.results.ParseResults):
-                    current_group_set=compute_expression_from_collection(element)
-                    if is_negation:
-                        union_set=set([d.document_id for d in self.collection])
-                        
-                        current_group_set=union_set.difference(current_group_set)
-                        
-                        is_negation=False
-                    
-                    if len(result_set)>0:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_group_set)
-                            
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_group_set)
-                    else:
-                        result_set=current_group_set
-                    continue
-                if element not in ['&','|']:
-                    if element=='-':
-                        is_negation=True
-                        continue
-                    if cleanup.is_stop_word(element,self.stop_word_list) and stop_word_filtering:
-                        continue
-                    
-                    current_term=element
-                    
-                    current_term=cleanup.remove_symbols(current_term)
-                    if stemming:
-                        current_term=porter.stem_term(current_term)
+        if generation is None:
+            generation = self.generation
+        return self.get_bitmap_results(self.basic_query_bitmap(query, stemming, stop_word_filtering, generation),
+                                       generation)
 
-                    current_term_set=set(get_terms_documents(current_term))
-                    
-                    
-        
-                    if is_negation:
+    def basic_query_bitmap(self, query: str, stemming: bool, stop_word_filtering: bool,
+                           generation: IndexGeneration) -> Bitmap:
+        """
+        Evaluates a Boolean query by matching the representations of all documents (see basic_query_search()).
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :return: Bitmap of the retrieved documents (empty if the query is invalid)
+        """
 
-                        union_set=set([d.document_id for d in self.collection])
-                        
-                        current_term_set=union_set.difference(current_term_set)
-                        
-                        is_negation=False
-                    
-                    if last_operator is None and len(result_set)==0:
-                        result_set=current_term_set
-                    else:
-                        if last_operator=='&':
-                          
-                            result_set=result_set.intersection(current_term_set)
-                            
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_term_set)
-                       
+        import models
+        def get_terms_documents(term) -> set:
+            nonlocal document_representations
+            if cleanup.is_stop_word(term, generation.get_stop_word_set()) and stop_word_filtering:
+                return None
+            current_term = cleanup.remove_symbols(term)
+            if stemming:
+                current_term = porter.stem_term(current_term)
+            # The representations are only needed if a term is not in the subexpression cache.
+            if document_representations is None:
+                if isinstance(generation.model, models.LinearBooleanModel):
+                    document_representations = generation.model.get_collection_representations(
+                        generation.collection, stop_word_filtering, stemming)
                 else:
-                    last_operator=element
-        
-            
-            return result_set
-        def get_terms_documents(term)->list:
-            documents=[]
+                    document_representations = [
+                        generation.model.document_to_representation(d, stop_word_filtering, stemming)
+                        for d in generation.collection]
+            documents = []
             for i in range(len(document_representations)):
-                if self.model.match(document_representations[i],term)==1.0:
-                    documents.append(self.collection[i].document_id)
-            return documents
-        
-        query_representation = self.model.query_to_representation(query)
-        queries=[query_representation]
-        document_representations = [self.model.document_to_representation(d, stop_word_filtering, stemming)
-                                    for d in self.collection]
-        
-        for qr in queries:
-            #try:
-                parsed_query = expr.parseString(qr)
-                retrieved_documents=list(compute_expression_from_collection(parsed_query))
-                
-                results=[]
-                for d in self.collection:
-                    if d.document_id in retrieved_documents:
-                        results.append((1.0,d))
-                results=sorted(results, key=lambda x: x[0], reverse=True)
-                return results
-            #except:
-            #     results=[]
-            #     for d in self.collection:
-            #             results.append((0.0,d.document_id))
-            #     results=sorted(results, key=lambda x: x[0], reverse=True)
-            #     return results
-
-    def inverted_list_search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
+                if generation.model.match(document_representations[i], current_term) == 1.0:
+                    documents.append(generation.collection[i].document_id)
+            return Bitmap.from_ids(documents, universe.size)
+
+        query_representation = generation.model.query_to_representation(query)
+        document_representations = None
+        universe = generation.get_universe_bitmap()
+
+        try:
+            parsed_query = query_parser.parse_query(query_representation)
+        except query_parser.QueryParseError:
+            return universe - universe
+        return query_parser.evaluate_query(parsed_query, get_terms_documents, universe,
+                                           generation.get_subexpression_cache(), (stemming, stop_word_filtering))
+
+    def inverted_list_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                             generation: IndexGeneration = None) -> list:
         """
         Fast Boolean query search for inverted lists.
         :param query: Query string
         :param stemming: Controls, whether stemming is used
         :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
-        def compute_expression_from_collection(expression)->set:
-            result_set=set()
-            last_operator=None
-            is_negation=False
-            for element in expression:
-                if isinstance(element,pyparsing.results.ParseResults):
-                    current_group_set=compute_expression_from_collection(element)
-                    if is_negation:
-                        union_set=set([d.document_id for d in self.collection])
-                        
-                        current_group_set=union_set.difference(current_group_set)
-                        
-                        is_negation=False
-                    
-                    if len(result_set)>0:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_group_set)
-                            
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_group_set)
-                    else:
-                        result_set=current_group_set
-                    continue
-                if element not in ['&','|']:
-                    if element=='-':
-                        is_negation=True
-                        continue
-
-                    if cleanup.is_stop_word(element,self.stop_word_list) and stop_word_filtering:
-                        continue
-                    
-                    current_term=element
-                    
-                    current_term=cleanup.remove_symbols(current_term)
-                    if stemming:
-                        current_term=porter.stem_term(current_term)
-                        current_term_set=set(self.model.stemmed_inverted_list[current_term])
-                    else:
-                        current_term_set=set(self.model.non_stemmed_inverted_list[current_term])
-                    
-        
-                    if is_negation:
-                        union_set=set([d.document_id for d in self.collection])
-                        current_term_set=union_set.difference(current_term_set)
-                        is_negation=False
-                    
-                    if last_operator is None and len(result_set)==0:
-                        result_set=current_term_set
-                    else:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_term_set)
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_term_set)
-                       
-                else:
-                    last_operator=element
-        
-            return result_set
-
-                        
-                    
-        
-        query_representation = self.model.query_to_representation(query)
-        queries=[query_representation]
-        for qr in queries:
-            try:
-                parsed_query = expr.parseString(qr)
-                retrieved_documents=list(compute_expression_from_collection(parsed_query))
-                
-                results=[]
-                for d in self.collection:
-                    if d.document_id in retrieved_documents:
-                        results.append((1.0,d))
-                results=sorted(results, key=lambda x: x[0], reverse=True)
-                return results
-            except:
-                results=[]
-                return results
-
-            
+        if generation is None:
+            generation = self.generation
+        return self.get_bitmap_results(self.inverted_list_bitmap(query, stemming, stop_word_filtering, generation),
+                                       generation)
 
+    def inverted_list_bitmap(self, query: str, stemming: bool, stop_word_filtering: bool,
+                             generation: IndexGeneration) -> Bitmap:
+        """
+        Evaluates a Boolean query on the posting bitmaps of the inverted lists.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :return: Bitmap of the retrieved documents (empty if the query is invalid or contains unknown terms)
+        """
 
-        
-
+        def get_terms_documents(term) -> set:
+            if cleanup.is_stop_word(term, generation.get_stop_word_set()) and stop_word_filtering:
+                return None
+            current_term = cleanup.remove_symbols(term)
+            if stemming:
+                current_term = porter.stem_term(current_term)
+            return generation.model.get_posting_bitmap(current_term, stemming)
 
-    def buckley_lewit_search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
+        query_representation = generation.model.query_to_representation(query)
+        universe = generation.model.universe_bitmap
+        try:
+            parsed_query = query_parser.parse_query(query_representation)
+        except query_parser.QueryParseError:
+            return universe - universe
+        try:
+            return query_parser.evaluate_query(parsed_query, get_terms_documents, universe,
+                                               generation.get_subexpression_cache(), (stemming, stop_word_filtering))
+        except KeyError:
+            # A term that does not occur in the collection empties the whole result (see get_posting_bitmap()).
+            return universe - universe
+
+    def buckley_lewit_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                             generation: IndexGeneration = None) -> list:
         """
         Fast query search for the Vector Space Model using the algorithm by Buckley & Lewit.
         :param query: Query string
         :param stemming: Controls, whether stemming is used
         :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
+        if generation is None:
+            generation = self.generation
         
-        query=self.model.query_to_representation(query)
-        raw_terms=query.split(' ')
-        query_terms=[]
+        query_vector=self.get_weighted_query_vector(query, stemming, stop_word_filtering, generation)
+        top_docs,_=self.buckley_lewit_rank(query_vector, stemming, generation)
+        results=[]
+        for result in top_docs:
+            results.append((result[1],generation.collection[result[0]]))
+        return results
+
+    def get_weighted_query_vector(self, query: str, stemming: bool, stop_word_filtering: bool,
+                                  generation: IndexGeneration) -> list[tuple]:
+        """
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :return: List of (term, query term weight) pairs by descending weight
+        """
+        query_terms=self.get_vector_query_terms(query, stemming, stop_word_filtering, generation)
         query_vector=[]
-        for i in range(len(raw_terms)):
-            if cleanup.is_stop_word(raw_terms[i],self.stop_word_list) and stop_word_filtering:
-                continue
-                    
-            current_term=raw_terms[i]
-                    
-            current_term=cleanup.remove_symbols(current_term)
-            if stemming:
-                current_term=porter.stem_term(current_term)
-            query_terms.append(current_term)
         
         for t in list(set(query_terms)):
-            query_vector.append((t,self.model.get_query_term_weight(query_terms,t,stemming)))
-        query_vector=sorted(query_vector,key=lambda pair:pair[1],reverse=True)
+            query_vector.append((t,generation.model.get_query_term_weight(query_terms,t,stemming)))
+        return sorted(query_vector,key=lambda pair:pair[1],reverse=True)
 
-        gamma=9
-        auxiliary_data_structure={}
-        top_docs=[]
+    def buckley_lewit_rank(self, query_vector: list[tuple], stemming: bool, generation: IndexGeneration,
+                           accumulators: dict = None) -> tuple:
+        """
+        Accumulates the scores of a query vector term by term and stops as soon as the remaining query terms cannot
+        change the top documents any more (Buckley & Lewit). Document weights are normalized to at most 1, so a
+        remaining term can add at most its query weight.
+        :param query_vector: List of (term, query term weight) pairs by descending weight
+        :param stemming: Controls, whether the stemmed inverted list is used
+        :param generation: Index generation to search
+        :param accumulators: Scores of documents for terms that were accumulated before, continued in place (default:
+        start from scratch)
+        :return: Tuple (list of up to 10 (document ID, score) pairs by descending score, number of query terms that
+        were accumulated before the search stopped)
+        """
+        gamma=BUCKLEY_LEWIT_GAMMA
+        auxiliary_data_structure=accumulators if accumulators is not None else {}
+        top_docs=heapq.nlargest(gamma+1,auxiliary_data_structure.items(),key=lambda x:x[1])
+        processed_terms=len(query_vector)
         if stemming:
-            inverted_list=self.model.stemmed_inverted_list
+            inverted_list=generation.model.stemmed_inverted_list
         else:
-            inverted_list=self.model.non_stemmed_inverted_list
+            inverted_list=generation.model.non_stemmed_inverted_list
+        postings=[inverted_list[term] if weight>0 else [] for term,weight in query_vector]
         for i,query_term in enumerate(query_vector):
             if query_term[1]>0:
             
-                for document_weight_pair in inverted_list[query_term[0]]:
+                for document_weight_pair in postings[i]:
                     pair=document_weight_pair
                     if pair[0] not in auxiliary_data_structure.keys():
                         auxiliary_data_structure[pair[0]]=pair[1]*query_term[1]
                     else:
                         auxiliary_data_structure[pair[0]]+=pair[1]*query_term[1]
-                
-                    current_relevant_docs=[(doc,auxiliary_data_structure[doc]) for doc in list(auxiliary_data_structure.keys())]
-                    current_relevant_docs=sorted(current_relevant_docs,key=lambda x:x[1],reverse=True)
-                    top_docs=current_relevant_docs
+
+                # Only the top gamma+1 documents are needed, once all postings of the term are accumulated
+                # (heapq.nlargest() keeps the order of sorted() for equal scores).
+                top_docs=heapq.nlargest(gamma+1,auxiliary_data_structure.items(),key=lambda x:x[1])
                 
                 remaining_weights=0
                 for j in range(i+1,len(query_vector)):
@@ -473,188 +960,302 @@ class InformationRetrievalSystem(object):
                 
                 if len(top_docs)>gamma:
                     if top_docs[gamma-1][1]>top_docs[gamma][1]+remaining_weights:
+                        processed_terms=i+1
                         break
-        top_docs=top_docs[:gamma+1] 
-        
-        results=[]
-        for result in top_docs:
-            results.append((result[1],self.collection[result[0]]))
-        return results
-
+        return top_docs[:gamma+1],processed_terms
 
+    def buckley_lewit_rank_dense(self, query_vector: list[tuple], stemming: bool, generation: IndexGeneration,
+                                 scores: 'np.ndarray') -> list[tuple]:
+        """
+        Like buckley_lewit_rank(), but adds each posting list at once to a dense score array, using the CSR copy of the
+        inverted list (see models.VectorSpaceModel.get_sparse_scorer()). Used for expanded queries, whose expansion
+        terms have long posting lists.
+        :param query_vector: List of (term, query term weight) pairs by descending weight
+        :param stemming: Controls, whether the stemmed weights are used
+        :param generation: Index generation to search
+        :param scores: Scores of documents for terms that were accumulated before, continued in place
+        :return: List of up to 10 (document ID, score) pairs by descending score and ascending ID
+        """
+        gamma = BUCKLEY_LEWIT_GAMMA
+        scorer = generation.model.get_sparse_scorer(stemming)
+        terms = [(scorer.term_ids[term], weight) for term, weight in query_vector
+                 if weight > 0 and term in scorer.term_ids]
+        # The first entry of a posting list holds its largest weight.
+        upper_bounds = [weight * scorer.data[scorer.indptr[term_id]] for term_id, weight in terms]
+        remaining_weights = sum(upper_bounds)
+        for i, ((term_id, weight), upper_bound) in enumerate(zip(terms, upper_bounds)):
+            start, end = scorer.indptr[term_id], scorer.indptr[term_id + 1]
+            scores[scorer.indices[start:end]] += weight * scorer.data[start:end]
+            remaining_weights -= upper_bound
+            # The gap between the gamma-th and the next document is at most the best score, so the ranking is only
+            # checked when the remaining terms cannot close every gap of that size.
+            if i + 1 < len(terms) and scores.max() > remaining_weights:
+                top_docs = result_cursor.RankedResultSource(scores).get_results(0, gamma + 1)
+                if len(top_docs) > gamma and top_docs[gamma - 1][0] > top_docs[gamma][0] + remaining_weights:
+                    break
+        top_docs = result_cursor.RankedResultSource(scores).get_results(0, gamma + 1)
+        return [(document_id, score) for score, document_id in top_docs]
+
+    def rocchio_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                       generation: IndexGeneration = None) -> list:
+        """
+        Buckley-Lewit search with pseudo-relevance feedback (Rocchio): the best FEEDBACK_DOCUMENTS documents of the
+        query are taken as relevant, and the EXPANSION_TERMS strongest new terms of their centroid are added to the
+        query, q' = ROCCHIO_ALPHA * q / |q| + ROCCHIO_BETA * centroid (restricted to the expansion terms). The centroid
+        is computed from the precomputed document vectors of the model, so no posting list is scanned for it. The
+        second Buckley-Lewit pass continues from the scores of the first one, so only the expansion terms (and the
+        query terms the first pass did not reach) are accumulated.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        import numpy as np
+        if generation is None:
+            generation = self.generation
+        query_vector = self.get_weighted_query_vector(query, stemming, stop_word_filtering, generation)
+        accumulators = {}
+        top_docs, processed_terms = self.buckley_lewit_rank(query_vector, stemming, generation, accumulators)
+        feedback_documents = [document_id for document_id, _ in top_docs[:FEEDBACK_DOCUMENTS]]
+        if feedback_documents:
+            query_terms = {term for term, _ in query_vector}
+            stop_words = generation.get_stop_word_set() if stop_word_filtering else frozenset()
+            expansion_terms = []
+            for term, weight in generation.model.get_document_vectors(stemming).get_centroid(feedback_documents):
+                if len(expansion_terms) == EXPANSION_TERMS:
+                    break
+                if term not in query_terms and term not in stop_words:
+                    expansion_terms.append((term, ROCCHIO_BETA * weight))
+            # The scores of the first pass are scaled to the normalized query.
+            scale = ROCCHIO_ALPHA / math.sqrt(sum(weight ** 2 for _, weight in query_vector))
+            scores = np.zeros(generation.model.document_id_count)
+            scores[np.fromiter(accumulators.keys(), dtype=np.int64, count=len(accumulators))] = np.fromiter(
+                accumulators.values(), dtype=np.float64, count=len(accumulators)) * scale
+            remaining_terms = [(term, scale * weight) for term, weight in query_vector[processed_terms:]]
+            expanded_query_vector = sorted(remaining_terms + expansion_terms, key=lambda pair: pair[1], reverse=True)
+            top_docs = self.buckley_lewit_rank_dense(expanded_query_vector, stemming, generation, scores)
+        return [(score, generation.get_document(document_id)) for document_id, score in top_docs]
+
+    def get_vector_query_terms(self, query: str, stemming: bool, stop_word_filtering: bool,
+                               generation: IndexGeneration = None) -> list[str]:
+        """
+        Splits a query for the Vector Space Model into its terms and applies stop word filtering and stemming.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
+        :return: List of query terms (with duplicates)
+        """
+        if generation is None:
+            generation = self.generation
+        query=generation.model.query_to_representation(query)
+        raw_terms=query.split(' ')
+        query_terms=[]
+        for i in range(len(raw_terms)):
+            if cleanup.is_stop_word(raw_terms[i],generation.stop_word_list) and stop_word_filtering:
+                continue
                     
-                
+            current_term=raw_terms[i]
+                    
+            current_term=cleanup.remove_symbols(current_term)
+            if stemming:
+                current_term=porter.stem_term(current_term)
+            query_terms.append(current_term)
+        return query_terms
+
+    def batch_vector_search(self, queries: list[str], stemming: bool, stop_word_filtering: bool, k: int = None,
+                            generation: IndexGeneration = None) -> list:
+        """
+        Scores many queries at once for the Vector Space Model, using one sparse matrix product per batch instead of
+        one accumulator per query. Meant for offline evaluation and bulk re-ranking. Unlike buckley_lewit_search(),
+        the scores are exact (no early termination).
+        :param queries: List of query strings
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param k: Number of results per query (default: output_k)
+        :param generation: Index generation to search (default: the current one)
+        :return: One list per query of tuples, where the first element is the relevance score and the second the
+        corresponding document
+        """
+        if generation is None:
+            generation = self.generation
+        if k is None:
+            k=self.output_k
+        query_vectors=[]
+        for query in queries:
+            query_terms=self.get_vector_query_terms(query, stemming, stop_word_filtering, generation)
+            query_vectors.append({t: generation.model.get_query_term_weight(query_terms,t,stemming) for t in set(query_terms)})
+        top_k=generation.model.get_sparse_scorer(stemming).top_k_batch(query_vectors, k)
+        return [[(score, generation.get_document(document_id)) for document_id, score in query_top_k] for query_top_k in top_k]
+
+    def lsi_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                   generation: IndexGeneration = None) -> list:
+        """
+        Query search for Latent Semantic Indexing: The query is folded into the latent space and compared to all
+        document embeddings with one matrix-vector product.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        if generation is None:
+            generation = self.generation
+        return self.get_top_results(self.lsi_scores(query, stemming, stop_word_filtering, generation), generation)
 
-    def signature_search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
+    def lsi_scores(self, query: str, stemming: bool, stop_word_filtering: bool,
+                   generation: IndexGeneration) -> 'np.ndarray':
+        """
+        Computes the cosine between the folded query and all document embeddings.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :return: Array of scores indexed by document ID, or None if no query term is known
+        """
+        query_terms = self.get_vector_query_terms(query, stemming, stop_word_filtering, generation)
+        query_vector = generation.model.fold_query(query_terms, stemming)
+        if not query_vector.any():
+            return None
+        return generation.model.get_latent_space(stemming)[1] @ query_vector
+
+    def p_norm_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                      generation: IndexGeneration = None) -> list:
+        """
+        Ranked Boolean query search for the Extended Boolean Model. Only the documents in the postings of the query
+        terms are scored with the p-norm operators, and only the output_k best documents with a positive score are
+        turned into results.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        if generation is None:
+            generation = self.generation
+        results = self.p_norm_source(query, stemming, stop_word_filtering, generation).get_results(0, self.output_k)
+        return [(score, generation.get_document(document_id)) for score, document_id in results]
+
+    def p_norm_source(self, query: str, stemming: bool, stop_word_filtering: bool, generation: IndexGeneration):
+        """
+        Scores a query with the p-norm operators of the Extended Boolean Model.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :return: Result source, which is empty if the query is invalid or all terms were ignored
+        """
+
+        def get_term_weights(term) -> tuple:
+            if cleanup.is_stop_word(term, generation.stop_word_list) and stop_word_filtering:
+                return None
+            current_term = cleanup.remove_symbols(term)
+            if stemming:
+                current_term = porter.stem_term(current_term)
+            return generation.model.get_term_weights(current_term, stemming)
+
+        query_representation = generation.model.query_to_representation(query)
+        try:
+            parsed_query = query_parser.parse_query(query_representation)
+        except query_parser.QueryParseError:
+            return result_cursor.ListResultSource([], ranked=True)
+        scores = generation.model.score_query(parsed_query, get_term_weights)
+        if scores is None:
+            return result_cursor.ListResultSource([], ranked=True)
+        return result_cursor.SparseRankedResultSource(*scores, generation.model.get_document_count(stemming))
+
+    def signature_search(self, query: str, stemming: bool, stop_word_filtering: bool,
+                         generation: IndexGeneration = None) -> list:
         """
         Fast Boolean query search using signatures for quicker processing.
         :param query: Query string
         :param stemming: Controls, whether stemming is used
         :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search (default: the current one)
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
-        def compute_expression_from_collection(expression)->set:
-                    result_set=set()
-                    last_operator=None
-                    is_negation=False
-                    for element in expression:
-                        if isinstance(element,pyparsing.results.ParseResults):
-                            current_group_set=compute_expression_from_collection(element)
-                            if is_negation:
-                                union_set=set([d.document_id for d in self.collection])
-                                
-                                current_group_set=union_set.difference(current_group_set)
-                                
-                                is_negation=False
-                            
-                            if len(result_set)>0:
-                                if last_operator=='&':
-                                    result_set=result_set.intersection(current_group_set)
-                                    
-                                elif last_operator=='|':
-                                    result_set=result_set.union(current_group_set)
-                            else:
-                                result_set=current_group_set
-                            continue
-                            
-                        if element not in ['&','|']:
-                            if element=='-':
-                                is_negation=True
-                                continue
-
-                            if cleanup.is_stop_word(element,self.stop_word_list) and stop_word_filtering:
-                                continue
-                            
-                            current_term=element
-                            
-                            current_term=cleanup.remove_symbols(current_term)
-                            if stemming:
-                                current_term=porter.stem_term(current_term)
-                            
-                            current_term_set=set(get_terms_documents(current_term,stemming,stop_word_filtering))
-                            
-                
-                            if is_negation:
-                                union_set=set([d.document_id for d in self.collection])
-                                
-                                current_term_set=union_set.difference(current_term_set)
-                                is_negation=False
-                            
-                            if last_operator is None and len(result_set)==0:
-                                result_set=current_term_set
-                            else:
-                                if last_operator=='&':
-                                    result_set=result_set.intersection(current_term_set)
-                                elif last_operator=='|':
-                                    result_set=result_set.union(current_term_set)
-                            
-                        else:
-                            last_operator=element
-                
-                    return result_set
-
-        def get_terms_documents(term,stemming,stop_word_filtering)->list:
-            candidates=[]
-            if stemming and stop_word_filtering:
-                for document in list(self.model.stemmed_filtered_signature_files.keys()):
-                    if self.model.match(self.model.stemmed_filtered_signature_files[document],term)==1.0:
-                        candidates.append(document)
-            elif stemming:
-                for document in list(self.model.stemmed_signature_files.keys()):
-                    if self.model.match(self.model.stemmed_signature_files[document],term)==1.0:
-                        candidates.append(document)
-            elif stop_word_filtering:
-                for document in list(self.model.non_stemmed_filtered_signature_files.keys()):
-                    if self.model.match(self.model.non_stemmed_filtered_signature_files[document],term)==1.0:
-                        candidates.append(document)
-            else:
-                for document in list(self.model.non_stemmed_signature_files.keys()):
-                    if self.model.match(self.model.non_stemmed_signature_files[document],term)==1.0:
-                        candidates.append(document)
-            documents=[]
-            for candidate in candidates:
-                if stemming:
-                    if term in self.model.collection[candidate].stemmed_terms:
-                        documents.append(candidate)
-                else:
-                    if term in self.model.collection[candidate].terms:
-                        documents.append(candidate)
-            return documents
+        if generation is None:
+            generation = self.generation
+        return self.get_bitmap_results(self.signature_bitmap(query, stemming, stop_word_filtering, generation),
+                                       generation)
 
-        query_representation = self.model.query_to_representation(query)
-        queries=[query_representation]
-        for qr in queries:
-            try:
-                parsed_query = expr.parseString(qr)
-                retrieved_documents=list(compute_expression_from_collection(parsed_query))
-            
-                results=[]
-                for d in self.collection:
-                    if d.document_id in retrieved_documents:
-                        results.append((1.0,d))
-                results=sorted(results, key=lambda x: x[0], reverse=True)
-                return results
-            except:
-                results=[]
-                return results
+    def signature_bitmap(self, query: str, stemming: bool, stop_word_filtering: bool,
+                         generation: IndexGeneration) -> Bitmap:
+        """
+        Evaluates a Boolean query with the signature trees and records the false drops of the query.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param generation: Index generation to search
+        :return: Bitmap of the retrieved documents (empty if the query is invalid)
+        """
 
-    def calculate_precision(self,query: str, result_list: list[tuple]) -> float:
-        
-        def compute_expression_from_ground_truth(expression)->set:
-
-            result_set=set()
-            last_operator=None
-            is_negation=False
-            for element in expression:
-                if isinstance(element,pyparsing.results.ParseResults):
-                    current_group_set=compute_expression_from_ground_truth(element)
-                    if is_negation:
-                        union_set=set([d.document_id for d in self.collection])
-                        
-                        current_group_set=union_set.difference(current_group_set)
-                        
-                        is_negation=False
-                    
-                    if len(result_set)>0:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_group_set)
-                            
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_group_set)
-                    else:
-                        result_set=current_group_set
-                    continue
-                    
-                if element not in ['&','|']:
-                    if element=='-':
-                        is_negation=True
-                        continue
-                    
-                    current_term=element
-                    current_term_set=set(gt_search_terms[porter.stem_term(current_term)])
-                    if is_negation:
-                       
-                        union_set=set([d.document_id for d in self.collection])
-                        current_term_set=set(gt_search_terms[porter.stem_term(current_term)])
-                        
-                        current_term_set=union_set.difference(current_term_set)
-                        is_negation=False
-                    
-                    if last_operator is None and len(result_set)==0:
-                        result_set=current_term_set
-                    else:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_term_set)
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_term_set)
-                            
-                else:
-                    last_operator=element
-            return result_set
+        def get_terms_documents(term) -> set:
+            if cleanup.is_stop_word(term, generation.get_stop_word_set()) and stop_word_filtering:
+                return None
+            current_term = cleanup.remove_symbols(term)
+            if stemming:
+                current_term = porter.stem_term(current_term)
+            documents = generation.model.get_term_documents(current_term, stemming, stop_word_filtering, statistics)
+            return Bitmap.from_ids(documents, universe.size)
+
+        statistics = {'candidates': 0, 'false_drops': 0, 'visited_signatures': 0}
+        query_representation = generation.model.query_to_representation(query)
+        universe = generation.get_universe_bitmap()
+        try:
+            parsed_query = query_parser.parse_query(query_representation)
+            retrieved_documents = query_parser.evaluate_query(parsed_query, get_terms_documents, universe,
+                                                              generation.get_subexpression_cache(),
+                                                              (stemming, stop_word_filtering))
+        except query_parser.QueryParseError:
+            retrieved_documents = universe - universe
+        self.last_signature_statistics = statistics
+        for name, value in statistics.items():
+            self.signature_statistics[name] = self.signature_statistics.get(name, 0) + value
+        self.signature_statistics['queries'] = self.signature_statistics.get('queries', 0) + 1
+        return retrieved_documents
+
+    def get_false_drop_summary(self) -> str:
+        """
+        Describes how often signatures matched documents that do not contain the searched term.
+        :return: False drops of the last signature search and the false drop rate of all signature searches
+        """
+        last, total = self.last_signature_statistics, self.signature_statistics
+        if last is None:
+            return 'no signature search yet'
+        total_rate = total['false_drops'] / total['candidates'] if total['candidates'] else 0.0
+        return (f"{last['false_drops']} of {last['candidates']} candidates "
+                f"({total_rate:.1%} of all candidates in {total['queries']} queries)")
+
+    def get_all_document_ids(self, generation: IndexGeneration = None) -> set:
+        """
+        Returns the IDs of all documents in the collection, e. g. as the universe for negated query terms.
+        :param generation: Index generation to use (default: the current one)
+        :return: Set of document IDs
+        """
+        if generation is None:
+            generation = self.generation
+        return set([d.document_id for d in generation.collection])
+
+    def load_ground_truth(self) -> dict:
+        """
+        Loads the ground truth file. If near-duplicates were removed from the collection, the relevant documents are
+        remapped to their new IDs; a removed duplicate counts as the document it was collapsed into.
+        :return: Dictionary that maps each stemmed search term to the IDs of its relevant documents
+        """
         gt_file_path=os.path.join(RAW_DATA_PATH, 'ground_truth.txt')
         with open(gt_file_path,'r') as f:
             gt_file=f.readlines()
+        try:
+            with open(DOCUMENT_ID_MAP_PATH,'r') as f:
+                id_map={int(old_id):new_id for old_id,new_id in json.load(f).items()}
+        except FileNotFoundError:
+            id_map={}
         gt_search_terms={}
         for row in gt_file:
             if row=='\n':
@@ -662,26 +1263,63 @@ class InformationRetrievalSystem(object):
             term=row.split('-')[0].strip()
             relevant_docs=row.split('-')[1].strip().split(', ')
             relevant_docs=[int(id)-1 for id in relevant_docs]
+            relevant_docs=list(dict.fromkeys(id_map.get(id,id) for id in relevant_docs))
             gt_search_terms[porter.stem_term(term)]=relevant_docs
-        
-        query_representation = self.model.query_to_representation(query)
-        if not isinstance(self.model,models.VectorSpaceModel):
-            queries=[query_representation]
-            for qr in queries:
-                try:
-                    parsed_query = expr.parseString(qr)
-                    retrieved_gt_documents=list(compute_expression_from_ground_truth(parsed_query))
-                    if len(set(retrieved_gt_documents))==0:
-                        return -1
-                    retrieved_query_documents=[]
-                    for doc in result_list:
-                        if doc[0]==1.0:
-                            retrieved_query_documents.append(doc[1].document_id) 
-                    if len(set(retrieved_query_documents))==0:
-                        return 0.0
-                    return len(set(retrieved_gt_documents).intersection(set(retrieved_query_documents)))/len(set(retrieved_query_documents))
-                except:
+        return gt_search_terms
+
+    def calculate_bitmap_quality(self, query: str, retrieved_documents: Bitmap,
+                                 generation: IndexGeneration = None) -> tuple:
+        """
+        Computes precision and recall of a Boolean query from the bitmap of its results, with the same values as
+        calculate_precision() and calculate_recall(). The number of retrieved documents is the popcount of the bitmap,
+        and only the relevant documents of the ground truth are tested against it, so no result is looked up.
+        :param query: Query string (already stemmed if stemming is used)
+        :param retrieved_documents: Bitmap of the retrieved documents
+        :param generation: Index generation the bitmap belongs to (default: the current one)
+        :return: Tuple of precision and recall (both -1 if the ground truth has no relevant documents for the query)
+        """
+        if generation is None:
+            generation = self.generation
+        gt_search_terms = self.load_ground_truth()
+        try:
+            parsed_query = query_parser.parse_query(generation.model.query_to_representation(query))
+            relevant_documents = query_parser.evaluate_query(
+                parsed_query, lambda term: set(gt_search_terms[porter.stem_term(term)]),
+                self.get_all_document_ids(generation))
+        except Exception:
+            return -1, -1
+        if len(relevant_documents) == 0:
+            return -1, -1
+        retrieved_count = len(retrieved_documents)
+        if retrieved_count == 0:
+            return 0.0, 0.0
+        retrieved_relevant_count = sum(document_id in retrieved_documents for document_id in relevant_documents)
+        return retrieved_relevant_count / retrieved_count, retrieved_relevant_count / len(relevant_documents)
+
+    def calculate_precision(self,query: str, result_list: list[tuple], generation: IndexGeneration = None) -> float:
+        import models
+        if generation is None:
+            generation = self.generation
+        gt_search_terms = self.load_ground_truth()
+
+        query_representation = generation.model.query_to_representation(query)
+        if not isinstance(generation.model,(models.VectorSpaceModel,models.LSIModel)):
+            try:
+                parsed_query = query_parser.parse_query(query_representation)
+                retrieved_gt_documents = query_parser.evaluate_query(
+                    parsed_query, lambda term: set(gt_search_terms[porter.stem_term(term)]),
+                    self.get_all_document_ids(generation))
+                if len(retrieved_gt_documents)==0:
                     return -1
+                retrieved_query_documents=[]
+                for doc in result_list:
+                    if doc[0]>0:
+                        retrieved_query_documents.append(doc[1].document_id) 
+                if len(set(retrieved_query_documents))==0:
+                    return 0.0
+                return len(retrieved_gt_documents.intersection(set(retrieved_query_documents)))/len(set(retrieved_query_documents))
+            except:
+                return -1
         else:
             try:
                 query_terms=query_representation.split(' ')
@@ -715,90 +1353,30 @@ class InformationRetrievalSystem(object):
         
         
 
-    def calculate_recall(self,query: str, result_list: list[tuple]) -> float:
-        
-        def compute_expression_from_ground_truth(expression)->set:
-
-            result_set=set()
-            last_operator=None
-            is_negation=False
-            for element in expression:
-                if isinstance(element,pyparsing.results.ParseResults):
-                    current_group_set=compute_expression_from_ground_truth(element)
-                    if is_negation:
-                        union_set=set([d.document_id for d in self.collection])
-                        
-                        current_group_set=union_set.difference(current_group_set)
-                        
-                        is_negation=False
-                    
-                    if len(result_set)>0:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_group_set)
-                            
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_group_set)
-                    else:
-                        result_set=current_group_set
-                    continue
-                if element not in ['&','|']:
-                    if element=='-':
-                        is_negation=True
-                        continue
-                    
-                    current_term=element
-                    if is_negation:
-                      
-                        union_set=set([d.document_id for d in self.collection])
-                        current_term_set=set(gt_search_terms[porter.stem_term(current_term)])
-                        
-                        current_term_set=union_set.difference(current_term_set)
-                        is_negation=False
-                    else:
-                        current_term_set=set(gt_search_terms[porter.stem_term(current_term)])
-                    
-                    
-                    if last_operator is None and len(result_set)==0:
-                        result_set=current_term_set
-                    else:
-                        if last_operator=='&':
-                            result_set=result_set.intersection(current_term_set)
-                        elif last_operator=='|':
-                            result_set=result_set.union(current_term_set)             
-                            
-                else:
-                    last_operator=element
-            return result_set
-        gt_file_path=os.path.join(RAW_DATA_PATH, 'ground_truth.txt')
-        with open(gt_file_path,'r') as f:
-            gt_file=f.readlines()
-        gt_search_terms={}
-        for row in gt_file:
-            if row=='\n':
-                break
-            term=row.split('-')[0].strip()
-            relevant_docs=row.split('-')[1].strip().split(', ')
-            relevant_docs=[int(id)-1 for id in relevant_docs]
-            gt_search_terms[porter.stem_term(term)]=relevant_docs
-        
-        query_representation = self.model.query_to_representation(query)
-        if not isinstance(self.model,models.VectorSpaceModel):
-            queries=[query_representation]
-            for qr in queries:
-                try:
-                    parsed_query = expr.parseString(qr)
-                    retrieved_gt_documents=list(compute_expression_from_ground_truth(parsed_query))
-                    if len(set(retrieved_gt_documents))==0:
-                        return -1
-                    retrieved_query_documents=[]
-                    for doc in result_list:
-                        if doc[0]==1.0:
-                            retrieved_query_documents.append(doc[1].document_id) 
-                    if len(set(retrieved_query_documents))==0:
-                        return 0.0
-                    return len(set(retrieved_gt_documents).intersection(set(retrieved_query_documents)))/len(set(retrieved_gt_documents))
-                except:
+    def calculate_recall(self,query: str, result_list: list[tuple], generation: IndexGeneration = None) -> float:
+        import models
+        if generation is None:
+            generation = self.generation
+        gt_search_terms = self.load_ground_truth()
+
+        query_representation = generation.model.query_to_representation(query)
+        if not isinstance(generation.model,(models.VectorSpaceModel,models.LSIModel)):
+            try:
+                parsed_query = query_parser.parse_query(query_representation)
+                retrieved_gt_documents = query_parser.evaluate_query(
+                    parsed_query, lambda term: set(gt_search_terms[porter.stem_term(term)]),
+                    self.get_all_document_ids(generation))
+                if len(retrieved_gt_documents)==0:
                     return -1
+                retrieved_query_documents=[]
+                for doc in result_list:
+                    if doc[0]>0:
+                        retrieved_query_documents.append(doc[1].document_id) 
+                if len(set(retrieved_query_documents))==0:
+                    return 0.0
+                return len(retrieved_gt_documents.intersection(set(retrieved_query_documents)))/len(retrieved_gt_documents)
+            except:
+                return -1
         else:
             try:
                 query_terms=query_representation.split(' ')
@@ -0,0 +1,111 @@
+# Contains the memory accounting of all index structures held by the information retrieval system.
+
+from bitmap import Bitmap
+import mmap
+import numpy as np
+import sys
+import types
+
+CONTAINER_TYPES = (list, tuple, set, frozenset, dict)
+
+
+def get_deep_size(obj, seen: set = None) -> int:
+    """
+    Computes the memory size of an object including everything it references. Objects already contained in seen are
+    not counted again, so a seen set shared between several calls counts shared objects only once.
+    :param obj: Object to measure
+    :param seen: IDs of objects that were already counted (updated by this function)
+    :return: Size in bytes
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, (type, types.ModuleType, types.FunctionType, mmap.mmap)):
+            continue
+        seen.add(id(current))
+        if isinstance(current, np.ndarray):
+            # sys.getsizeof() includes the data only if the array owns it. Views share the memory of their base,
+            # which is counted once through the base (except for memory mapped files, which are not held in memory).
+            size += sys.getsizeof(current)
+            if current.base is not None and not isinstance(current.base, mmap.mmap):
+                stack.append(current.base)
+            continue
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        if hasattr(current, '__dict__'):
+            stack.append(current.__dict__)
+    return size
+
+
+def count_entries(structure) -> int:
+    """
+    Counts the top-level entries of a structure (e. g. the terms of an inverted list).
+    :param structure: Structure to count
+    :return: Number of entries, or 0 if the structure has no length
+    """
+    try:
+        return len(structure)
+    except TypeError:
+        return 0
+
+
+def count_postings(structure) -> int:
+    """
+    Counts the postings of a structure: the elements of all values of a dictionary (e. g. document IDs of an inverted
+    list or block signatures of a signature file), the set bits of a bitmap, or the elements of an array.
+    :param structure: Structure to count
+    :return: Number of postings, or 0 if the structure has no postings
+    """
+    if isinstance(structure, Bitmap):
+        return len(structure)
+    if isinstance(structure, np.ndarray):
+        return structure.size
+    if isinstance(structure, dict):
+        return sum(count_entries(value) if isinstance(value, CONTAINER_TYPES + (Bitmap, np.ndarray)) else 1
+                   for value in structure.values())
+    return 0
+
+
+def get_memory_report(structures: list[tuple]) -> list[dict]:
+    """
+    Measures a list of structures. Objects shared between structures are counted for the first structure only, so
+    the sizes add up to the total memory.
+    :param structures: List of (name, structure) pairs
+    :return: One row per structure with the keys name, bytes, entries, postings and bytes_per_posting
+    """
+    seen = set()
+    report = []
+    for name, structure in structures:
+        size = get_deep_size(structure, seen)
+        postings = count_postings(structure)
+        report.append({
+            'name': name,
+            'bytes': size,
+            'entries': count_entries(structure),
+            'postings': postings,
+            'bytes_per_posting': size / postings if postings else None
+        })
+    return report
+
+
+def format_memory_report(report: list[dict]) -> str:
+    """
+    Formats a memory report as a table.
+    :param report: Report as returned by get_memory_report()
+    :return: Table as text
+    """
+    name_width = max([len(row['name']) for row in report] + [len('Structure')])
+    lines = [f'{"Structure":<{name_width}} {"Size (KiB)":>12} {"Entries":>10} {"Postings":>10} {"B/posting":>10}']
+    for row in report:
+        bytes_per_posting = f'{row["bytes_per_posting"]:.1f}' if row['bytes_per_posting'] is not None else '-'
+        lines.append(f'{row["name"]:<{name_width}} {row["bytes"] / 1024:>12.1f} {row["entries"]:>10} '
+                     f'{row["postings"]:>10} {bytes_per_posting:>10}')
+    lines.append(f'{"Total":<{name_width}} {sum(row["bytes"] for row in report) / 1024:>12.1f}')
+    return '\n'.join(lines)
@@ -0,0 +1,220 @@
+# Contains the metrics registry of the information retrieval system: histograms (query latencies, result counts,
+# build durations) and gauges that are read when the metrics are exported (e. g. cache hit rates). Metrics are
+# written as Prometheus text or as JSON, on demand or at intervals by a MetricsExporter.
+
+from bisect import bisect_left
+import json
+import os
+import threading
+
+# Upper bounds of the histogram buckets. Latencies use exponential buckets from 0.1 ms to about 2 minutes, so a
+# quantile is estimated with an error of at most 25%; counts use the 1-2-5 series up to one million.
+LATENCY_BUCKETS = tuple(0.0001 * 1.25 ** i for i in range(64))
+COUNT_BUCKETS = (0,) + tuple(m * 10 ** e for e in range(6) for m in (1, 2, 5)) + (1000000,)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def format_labels(labels: tuple, extra: str = '') -> str:
+    """
+    :param labels: Sorted (name, value) pairs
+    :param extra: Additional label in Prometheus syntax, e. g. le="0.5"
+    :return: Labels in Prometheus syntax, e. g. {model="VectorSpaceModel",mode="standard"}
+    """
+    parts = [f'{name}="{value}"' for name, value in labels] + ([extra] if extra else [])
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Histogram(object):
+    """
+    Distribution of observed values in fixed buckets, like a Prometheus histogram. Quantiles are interpolated linearly
+    within the bucket that contains them and clipped to the smallest and largest observed value.
+    """
+
+    def __init__(self, buckets: tuple):
+        """
+        :param buckets: Ascending upper bounds of the buckets; values above the last bound fall into an extra bucket
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def get_quantile(self, q: float) -> float:
+        """
+        :param q: Quantile in [0, 1], e. g. 0.95
+        :return: Estimated value of the quantile (0.0 if nothing was observed)
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.max
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return min(max(lower + (self.buckets[i] - lower) * (rank - cumulative) / count, self.min), self.max)
+            cumulative += count
+        return self.max
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe collection of named histograms, each broken down by labels (e. g. model and search mode). Gauges are
+    not stored but provided by callbacks, which are called whenever the metrics are read.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # (name, sorted label pairs) -> Histogram
+        self.gauge_callbacks = []
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+        """
+        Adds a value to a histogram, which is created on first use.
+        :param name: Name of the metric, in Prometheus style with its unit, e. g. search_latency_seconds
+        :param value: Observed value
+        :param buckets: Bucket bounds of the histogram if it is created
+        :param labels: Labels of the histogram, e. g. model='VectorSpaceModel'
+        """
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def add_gauges(self, callback) -> None:
+        """
+        :param callback: Function without arguments that returns a list of (name, labels dictionary, value) triples
+        """
+        self.gauge_callbacks.append(callback)
+
+    def get_gauges(self) -> list[tuple]:
+        """
+        :return: Current (name, sorted label pairs, value) triples of all gauges
+        """
+        return [(name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())), value)
+                for callback in self.gauge_callbacks for name, labels, value in callback()]
+
+    def get_summary(self) -> list[dict]:
+        """
+        :return: One row per histogram with the keys name, labels, count, sum and one key per quantile (p50, p95, p99)
+        """
+        with self.lock:
+            rows = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                row = {'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum}
+                for q in QUANTILES:
+                    row[f'p{round(q * 100)}'] = histogram.get_quantile(q)
+                rows.append(row)
+            return rows
+
+    def to_prometheus_text(self) -> str:
+        """
+        :return: All metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self.lock:
+            names = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in names:
+                    lines.append(f'# TYPE {name} histogram')
+                    names.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    le = 'le="' + (bound if isinstance(bound, str) else f'{bound:g}') + '"'
+                    lines.append(f'{name}_bucket{format_labels(labels, le)} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum!r}')
+                lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        names = set()
+        for name, labels, value in self.get_gauges():
+            if name not in names:
+                lines.append(f'# TYPE {name} gauge')
+                names.add(name)
+            lines.append(f'{name}{format_labels(labels)} {float(value)!r}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> str:
+        """
+        :return: Summary of all histograms (see get_summary()) and the current gauges as JSON
+        """
+        gauges = [{'name': name, 'labels': dict(labels), 'value': value} for name, labels, value in self.get_gauges()]
+        return json.dumps({'histograms': self.get_summary(), 'gauges': gauges}, indent=1)
+
+    def write(self, file_path: str) -> None:
+        """
+        Writes all metrics to a file, replacing it atomically so readers never see a partial file.
+        :param file_path: Path of the file; a .json file gets JSON, any other file Prometheus text
+        """
+        text = self.to_json() if file_path.endswith('.json') else self.to_prometheus_text()
+        temporary_file_path = file_path + '.tmp'
+        with open(temporary_file_path, 'w') as f:
+            f.write(text)
+        os.replace(temporary_file_path, file_path)
+
+
+class MetricsExporter(object):
+    """
+    Writes the metrics of a registry to a file at fixed intervals in a background thread.
+    """
+
+    def __init__(self, registry: MetricsRegistry, file_path: str, interval: float):
+        """
+        :param registry: Registry to export
+        :param file_path: Path of the metrics file (see MetricsRegistry.write())
+        :param interval: Seconds between two writes
+        """
+        self.registry = registry
+        self.file_path = file_path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.registry.write(self.file_path)
+
+    def stop(self) -> None:
+        """
+        Stops the background thread and writes the metrics a last time.
+        """
+        self.stopped.set()
+        self.registry.write(self.file_path)
+
+
+def format_summary(registry: MetricsRegistry) -> str:
+    """
+    Formats the quantiles of all histograms and the current gauges as a table. Durations are shown in milliseconds.
+    :param registry: Registry to format
+    :return: Table as text
+    """
+    rows = registry.get_summary()
+    if not rows:
+        return 'No metrics recorded yet.'
+    names = [row['name'] + format_labels(tuple(row['labels'].items())) for row in rows]
+    name_width = max(len(name) for name in names + ['Metric'])
+    lines = [f'{"Metric":<{name_width}} {"Count":>8} {"p50":>12} {"p95":>12} {"p99":>12}']
+    for name, row in zip(names, rows):
+        if row['name'].endswith('_seconds'):
+            quantiles = [f'{row[p] * 1000:.2f} ms' for p in ('p50', 'p95', 'p99')]
+        else:
+            quantiles = [f'{row[p]:.1f}' for p in ('p50', 'p95', 'p99')]
+        lines.append(f'{name:<{name_width}} {row["count"]:>8} ' + ' '.join(f'{q:>12}' for q in quantiles))
+    for name, labels, value in registry.get_gauges():
+        value = f'{value:.1%}' if name.endswith('_ratio') else (f'{value * 1000:.2f} ms' if name.endswith('_seconds')
+                                                                 else f'{value:g}')
+        lines.append(f'{name}{format_labels(labels)}: {value}')
+    return '\n'.join(lines)
@@ -4,13 +4,29 @@ from abc import ABC, abstractmethod
 
 from document import Document
 from cleanup import load_stop_word_list
-from cleanup import remove_symbols
-from cleanup import remove_stop_words_from_term_list
+from bitmap import Bitmap
+from signature_tree import SignatureTree
+from sparse_scoring import DocumentVectorStore
+from sparse_scoring import SparseVectorSpaceScorer
+from spelling import SpellingCorrector
+from stem_classes import get_stem_classes
+from stem_classes import StemmedInvertedList
 import extraction
 import porter
+import query_parser
+import spimi
+import numpy as np
 import os
 import math
 import re
+import threading
+import time
+import tracemalloc
+
+# Serializes the construction of index variants, which can run in a background thread (see get_variant()).
+variant_lock=threading.RLock()
+
+
 class RetrievalModel(ABC):
     @abstractmethod
     def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False):
@@ -44,6 +60,67 @@ class RetrievalModel(ABC):
         """
         raise NotImplementedError()
 
+    def get_variant(self, name: str):
+        """
+        Returns an index variant of the model, e. g. the stemmed inverted list. A variant is built on first use by the
+        method build_<name>() of the model and kept in self.variants; its build time is recorded in
+        self.variant_build_times.
+        :param name: Name of the variant
+        :return: The variant
+        """
+        if name not in self.variants:
+            with variant_lock:
+                if name not in self.variants:
+                    start_time=time.perf_counter()
+                    variant=getattr(self,f'build_{name}')()
+                    self.variant_build_times[name]=time.perf_counter()-start_time
+                    self.variants[name]=variant
+        return self.variants[name]
+
+    def get_variant_names(self, stemming=False, stopword_filtering=False) -> list[str]:
+        """
+        :param stemming: Controls, whether stemming is used in the searches
+        :param stopword_filtering: Controls, whether stopwords are ignored in the searches
+        :return: Names of the index variants that searches with this configuration need
+        """
+        return []
+
+    def prepare_variants(self, stemming=False, stopword_filtering=False) -> None:
+        """
+        Builds all index variants that searches with a configuration need, so the first search does not wait for them.
+        :param stemming: Controls, whether stemming is used in the searches
+        :param stopword_filtering: Controls, whether stopwords are ignored in the searches
+        """
+        for name in self.get_variant_names(stemming,stopword_filtering):
+            self.get_variant(name)
+
+    @property
+    def vocabulary_model(self) -> 'RetrievalModel':
+        """
+        Model whose non stemmed inverted list holds the vocabulary of this model, e. g. for spelling correction. Models
+        that take their weights from a Vector Space Model return that model.
+        """
+        return self
+
+    def get_spelling_corrector(self) -> SpellingCorrector:
+        """
+        Returns the spelling corrector for the vocabulary of the model. It is a variant of the vocabulary model, which
+        is built together with the model (see InformationRetrievalSystem.load_or_build_model()) and saved in its
+        snapshot, so correcting a query only looks terms up.
+        :return: Spelling corrector, or None if the model has no inverted list
+        """
+        vocabulary_model=self.vocabulary_model
+        if not hasattr(vocabulary_model,'non_stemmed_inverted_list'):
+            return None
+        return vocabulary_model.get_variant('spelling_corrector')
+
+    def build_spelling_corrector(self) -> SpellingCorrector:
+        inverted_list=self.non_stemmed_inverted_list
+        if isinstance(inverted_list,spimi.PostingsFile):
+            # The document frequencies are part of the dictionary, so no posting list is read.
+            return SpellingCorrector(dict(inverted_list.document_frequencies))
+        return SpellingCorrector({term:len(postings) for term,postings in inverted_list.items()})
+
 
 class LinearBooleanModel(RetrievalModel):
     DATA_PATH = 'data'
@@ -51,23 +128,57 @@ class LinearBooleanModel(RetrievalModel):
 
     def __init__(self):
         self.stop_words=load_stop_word_list(self.STOPWORD_FILE_PATH)
+        self.stop_word_set=set(self.stop_words)
+        self.stem_cache={}  # Maps each term to its stem, so every distinct term is stemmed only once.
+        # Document representations per (stopword_filtering, stemming), see get_collection_representations().
+        self.representation_cache={}
+        self.cached_collection=None  # Collection the cached representations belong to.
 
     def __str__(self):
         return 'Boolean Model (Linear)'
+
+    def set_stop_words(self, stop_words: list[str]) -> None:
+        """
+        Replaces the stop word list and drops all cached representations that depend on it.
+        :param stop_words: New list of stop words
+        """
+        self.stop_words=stop_words
+        self.stop_word_set=set(stop_words)
+        self.representation_cache={}
+
+    def stem(self, term: str) -> str:
+        if term not in self.stem_cache:
+            self.stem_cache[term]=porter.stem_term(term)
+        return self.stem_cache[term]
+
     def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False) -> list[str]:
-        results=[]
+        results=document.terms
         if stopword_filtering:
-            results=remove_stop_words_from_term_list(document.terms)
-            if stemming:
-                results=[porter.stem_term(term) for term in results]
-                return results
-            return results
+            results=[term for term in results if term not in self.stop_word_set]
         if stemming:
-            results=[porter.stem_term(term) for term in document.terms]
-            return results
-        return document.terms
-        
-        
+            results=[self.stem(term) for term in results]
+        return results
+
+    def get_collection_representations(self, collection: list[Document], stopword_filtering=False,
+                                       stemming=False) -> list[frozenset]:
+        """
+        Returns the representations of all documents of a collection as frozensets, so that match() is a single hash
+        lookup. Representations are computed once per (stopword_filtering, stemming) variant and cached until another
+        collection is passed or the stop word list changes.
+        :param collection: Document collection
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        :return: List of representations in the order of the collection
+        """
+        if self.cached_collection is not collection:
+            self.representation_cache={}
+            self.cached_collection=collection
+        key=(stopword_filtering,stemming)
+        if key not in self.representation_cache:
+            self.representation_cache[key]=[frozenset(self.document_to_representation(d,stopword_filtering,stemming))
+                                            for d in collection]
+        return self.representation_cache[key]
+
     def query_to_representation(self, query: str) -> str:
         query=query.lower()
         return query
@@ -76,34 +187,110 @@ class LinearBooleanModel(RetrievalModel):
         return query_representation in document_representation
 
 
+class DocumentIdPostingsFile(spimi.PostingsFile):
+    """
+    Postings file of an out-of-core index as inverted list of the InvertedListBooleanModel: term -> set of document IDs.
+    """
+
+    def convert_postings(self, term: str, term_postings: list[int]) -> set[int]:
+        return set(term_postings[0::2])
+
+
+class WeightedPostingsFile(spimi.PostingsFile):
+    """
+    Postings file of an out-of-core index as inverted list of the VectorSpaceModel: term -> (document ID, weight, term
+    frequency) triples by descending weight. The weights are computed from the document norms when a posting list is
+    read.
+    """
+
+    def __init__(self, file_path: str, document_count: int, norms: list[float] = None):
+        """
+        :param file_path: Path of the postings file
+        :param document_count: Number of documents
+        :param norms: Norms of the document vectors, indexed by document ID (can be set after the dictionary is read)
+        """
+        super().__init__(file_path)
+        self.document_count=document_count
+        self.norms=norms
+
+    def convert_postings(self, term: str, term_postings: list[int]) -> list[tuple]:
+        idf=math.log(self.document_count/self.document_frequencies[term])
+        norms=self.norms
+        triples=[(d,tf*idf/norms[d] if norms[d]>0 else 0.0,tf) for d,tf in zip(term_postings[0::2],term_postings[1::2])]
+        return sorted(triples,key=lambda triple:triple[1],reverse=True)
+
+
 class InvertedListBooleanModel(RetrievalModel):
     
-    def __init__(self):
-        self.stemmed_inverted_list={}
+    def __init__(self, index_directory: str = None):
+        """
+        :param index_directory: Directory of an index built by spimi.build_index(). If given, the inverted lists are
+        loaded from it instead of being built from the collection in memory.
+        """
+        self.index_directory=index_directory
+        self.variants={}  # Index variants built on first use, see get_variant().
+        self.variant_build_times={}
+        if index_directory is not None:
+            self.load_index(index_directory)
+            return
+        # Only the surface forms are indexed; stemmed lookups are answered from the stem classes, see
+        # get_posting_bitmap().
         self.non_stemmed_inverted_list={}
         DATA_PATH = 'data'
         COLLECTION_PATH = os.path.join(DATA_PATH, 'my_collection.json')
         collection=extraction.load_collection_from_json(COLLECTION_PATH)
-        porter.stem_all_documents(collection)
         for doc in collection:
-            for term in doc.stemmed_terms:
-                if term not in self.stemmed_inverted_list.keys():
-                    self.stemmed_inverted_list[term]=[doc.document_id]
-                else:
-                    self.stemmed_inverted_list[term].append(doc.document_id)
-            
             for term in doc.terms:
                 if term not in self.non_stemmed_inverted_list.keys():
                     self.non_stemmed_inverted_list[term]=[doc.document_id]
                 else:
                     self.non_stemmed_inverted_list[term].append(doc.document_id)
-        
-        for term in self.stemmed_inverted_list.keys():
-            self.stemmed_inverted_list[term]=set(sorted(self.stemmed_inverted_list[term]))
 
         for term in self.non_stemmed_inverted_list.keys():
             self.non_stemmed_inverted_list[term]=set(sorted(self.non_stemmed_inverted_list[term]))
-    
+
+        # Posting lists are materialized as bitmaps on first use. The universe bitmap is used for negation.
+        self.bitmap_size=max([doc.document_id for doc in collection],default=-1)+1
+        self.universe_bitmap=Bitmap.from_ids([doc.document_id for doc in collection],self.bitmap_size)
+        self.posting_bitmaps={}
+
+    def load_index(self, index_directory: str) -> None:
+        """
+        Opens the inverted lists of an index built out of core (see spimi.py). Only the dictionary is loaded, the
+        posting list of a query term is read from disk when its bitmap is created.
+        :param index_directory: Directory of the index
+        """
+        metadata=spimi.load_index_metadata(index_directory)
+        self.non_stemmed_inverted_list=DocumentIdPostingsFile(spimi.get_postings_path(index_directory))
+        self.bitmap_size=metadata['document_id_count']
+        self.universe_bitmap=Bitmap.from_ids(metadata['document_ids'],self.bitmap_size)
+        self.posting_bitmaps={}
+
+    def get_posting_bitmap(self, term: str, stemming=False) -> Bitmap:
+        """
+        Returns the posting list of a term as a bitmap. Bitmaps are created on first use and cached. The posting list
+        of a stem is the union of the posting lists of all surface forms in its stem class.
+        :param term: Term to look up (already stemmed if stemming is used)
+        :param stemming: Controls, whether the term is looked up as a stem
+        :return: Bitmap of the documents that contain the term
+        :raises KeyError: If the term does not occur in the collection
+        """
+        key=(term,stemming)
+        if key not in self.posting_bitmaps:
+            if stemming:
+                stem_classes=self.get_variant('stem_classes')
+                document_ids=set().union(*[self.non_stemmed_inverted_list[t] for t in stem_classes[term]])
+            else:
+                document_ids=self.non_stemmed_inverted_list[term]
+            self.posting_bitmaps[key]=Bitmap.from_ids(document_ids,self.bitmap_size)
+        return self.posting_bitmaps[key]
+
+    def build_stem_classes(self) -> dict:
+        return get_stem_classes(self.non_stemmed_inverted_list.keys())
+
+    def get_variant_names(self, stemming=False, stopword_filtering=False) -> list[str]:
+        return ['stem_classes'] if stemming else []
+
     def query_to_representation(self, query: str) -> str:
         query=query.lower()
         return query
@@ -125,70 +312,107 @@ class SignatureBasedBooleanModel(RetrievalModel):
         self.D=4
         self.m=3
         self.primes=self.generate_primes()
-        self.non_stemmed_signature_files={}
-        self.stemmed_signature_files={}
-        self.stemmed_filtered_signature_files={}
-        self.non_stemmed_filtered_signature_files={}
+        # Only the surface forms are indexed. The stemmed and stopword filtered variants are derived from them, see
+        # get_variant_terms().
+        self.variants={}  # Index variants built on first use, see get_variant().
+        self.variant_build_times={}
+        self.signature_files={}
         DATA_PATH = 'data'
         COLLECTION_PATH = os.path.join(DATA_PATH, 'my_collection.json')
         self.collection=extraction.load_collection_from_json(COLLECTION_PATH)
-        porter.stem_all_documents(self.collection)
         for i in range(len(self.collection)):
-            
-            self.stemmed_signature_files[self.collection[i].document_id]=[]
-            self.non_stemmed_signature_files[self.collection[i].document_id]=[]
-            self.stemmed_filtered_signature_files[self.collection[i].document_id]=[]
-            self.non_stemmed_filtered_signature_files[self.collection[i].document_id]=[]
-
-            #signatures for stemmed terms
-            block_signature=0
-            for j in range(len(self.collection[i].stemmed_terms)):
-                term_signature=self.get_hash(self.collection[i].stemmed_terms[j])
-                block_signature|=term_signature
-                if (j+1)%self.D==0:
-                    self.stemmed_signature_files[i].append(block_signature)
-                    block_signature=0
-            if len(self.collection[i].stemmed_terms)%self.D!=0:
-                self.stemmed_signature_files[i].append(block_signature)
-
-            #signatures for non stemmed terms
+            self.signature_files[self.collection[i].document_id]=[]
             block_signature=0
             for j in range(len(self.collection[i].terms)):
                 term_signature=self.get_hash(self.collection[i].terms[j])
                 block_signature|=term_signature
                 if (j+1)%self.D==0:
-                    self.non_stemmed_signature_files[i].append(block_signature)
+                    self.signature_files[i].append(block_signature)
                     block_signature=0
             if len(self.collection[i].terms)%self.D!=0:
-                self.non_stemmed_signature_files[i].append(block_signature)
+                self.signature_files[i].append(block_signature)
+        self.signature_tree=SignatureTree(self.signature_files)
 
-            #signatures for filtered non stemmed terms
-            block_signature=0
-            for j in range(len(self.collection[i].filtered_terms)):
-                term_signature=self.get_hash(self.collection[i].filtered_terms[j])
-                block_signature|=term_signature
-                if (j+1)%self.D==0:
-                    self.non_stemmed_filtered_signature_files[i].append(block_signature)
-                    block_signature=0
-            if len(self.collection[i].filtered_terms)%self.D!=0:
-                self.non_stemmed_filtered_signature_files[i].append(block_signature)
+        # Term sets for the verification of candidates, see get_term_documents().
+        self.term_sets={}
+        for document in self.collection:
+            self.term_sets[document.document_id]=frozenset(document.terms)
 
-            #signatures for filtered stemmed terms
-            block_signature=0
-            for j in range(len(self.collection[i].filtered_terms)):
-                term_signature=self.get_hash(porter.stem_term(self.collection[i].filtered_terms[j]))
-                block_signature|=term_signature
-                if (j+1)%self.D==0:
-                    self.stemmed_filtered_signature_files[i].append(block_signature)
-                    block_signature=0
-            if len(self.collection[i].filtered_terms)%self.D!=0:
-                self.stemmed_filtered_signature_files[i].append(block_signature)
+    def build_stem_classes(self) -> dict:
+        return get_stem_classes(set().union(*self.term_sets.values()))
 
+    def build_removed_stop_words(self) -> frozenset:
+        """
+        :return: Surface forms that the stop word filter of the extraction removed, which are never found in the
+        filtered variants
+        """
+        removed_stop_words=set()
+        for document in self.collection:
+            removed_stop_words.update(self.term_sets[document.document_id].difference(document.filtered_terms))
+        return frozenset(removed_stop_words)
+
+    def get_variant_names(self, stemming=False, stopword_filtering=False) -> list[str]:
+        names=[]
+        if stemming:
+            names.append('stem_classes')
+        if stopword_filtering:
+            names.append('removed_stop_words')
+        return names
+
+    def get_variant_terms(self, term: str, stemming: bool, stopword_filtering: bool) -> list[str]:
+        """
+        Returns the surface forms that represent a term in a variant of the index.
+        :param term: Term (already stemmed if stemming is used)
+        :param stemming: Controls, whether the term is a stem, which stands for all surface forms of its stem class
+        :param stopword_filtering: Controls, whether surface forms removed by the stop word filter are left out
+        :return: List of surface forms
+        """
+        terms=self.get_variant('stem_classes').get(term,[]) if stemming else [term]
+        if stopword_filtering:
+            removed_stop_words=self.get_variant('removed_stop_words')
+            terms=[t for t in terms if t not in removed_stop_words]
+        return terms
+
+    def get_candidates(self, term: str, stemming: bool, stopword_filtering: bool, statistics: dict = None) -> list[int]:
+        """
+        Finds the documents whose signatures may contain a term by descending the signature tree once for each surface
+        form of the term in the searched variant. Candidates can be false drops and still have to be verified.
+        :param term: Term (already stemmed if stemming is used)
+        :param stemming: Controls, whether stemmed terms are searched
+        :param stopword_filtering: Controls, whether the terms without stopwords are searched
+        :param statistics: If given, the number of tested signatures is added to its 'visited_signatures' entry
+        :return: Ascending list of candidate document IDs
+        """
+        candidates=set()
+        for t in self.get_variant_terms(term,stemming,stopword_filtering):
+            candidates.update(self.signature_tree.search(self.get_hash(t),statistics))
+        return sorted(candidates)
+
+    def get_term_documents(self, term: str, stemming: bool, stopword_filtering: bool,
+                           statistics: dict = None) -> list[int]:
+        """
+        Finds the documents that contain a term: candidates from the signature tree are verified with hash lookups of
+        the surface forms of the term in the term set of the document. Candidates that fail the verification are false
+        drops.
+        :param term: Term (already stemmed if stemming is used)
+        :param stemming: Controls, whether stemmed terms are searched
+        :param stopword_filtering: Controls, whether the terms without stopwords are searched
+        :param statistics: If given, the numbers of candidates, false drops and tested signatures are added to its
+        'candidates', 'false_drops' and 'visited_signatures' entries
+        :return: Ascending list of document IDs
+        """
+        terms=self.get_variant_terms(term,stemming,stopword_filtering)
+        candidates=self.get_candidates(term,stemming,stopword_filtering,statistics)
+        documents=[candidate for candidate in candidates if not self.term_sets[candidate].isdisjoint(terms)]
+        if statistics is not None:
+            statistics['candidates']=statistics.get('candidates',0)+len(candidates)
+            statistics['false_drops']=statistics.get('false_drops',0)+len(candidates)-len(documents)
+        return documents
 
     def match(self, document_representation, query_representation) -> float:
         pattern_signature=self.get_hash(query_representation)
         for block_signature in document_representation:
-            if block_signature&pattern_signature:
+            if (block_signature&pattern_signature)==pattern_signature:
                 return 1.0
         return 0.0
     
@@ -252,56 +476,130 @@ class SignatureBasedBooleanModel(RetrievalModel):
 
 class VectorSpaceModel(RetrievalModel):
    
-    def __init__(self):
-        self.stemmed_inverted_list={}
+    def __init__(self, index_directory: str = None):
+        """
+        :param index_directory: Directory of an index built by spimi.build_index(). If given, the weights are computed
+        from its term frequencies instead of from the collection in memory.
+        """
+        self.index_directory=index_directory
+        self.variants={}  # Index variants built on first use, see get_variant().
+        self.variant_build_times={}
+        if index_directory is not None:
+            self.load_index(index_directory)
+            return
         self.non_stemmed_inverted_list={}
         DATA_PATH = 'data'
         COLLECTION_PATH = os.path.join(DATA_PATH, 'my_collection.json')
         collection=extraction.load_collection_from_json(COLLECTION_PATH)
         self.N=len(collection)
-        self.stemmed_n={}
-        self.stemmed_norms={}
         self.non_stemmed_norms={}
         self.non_stemmed_n={}
-        porter.stem_all_documents(collection)
 
         for doc in collection:
-            for t in list(set(doc.stemmed_terms)):
-                if not t in self.stemmed_n.keys():
-                    self.stemmed_n[t]=1
-                else:
-                    self.stemmed_n[t]+=1
-
             for t in list(set(doc.terms)):
                 if not t in self.non_stemmed_n.keys():
                     self.non_stemmed_n[t]=1
                 else:
                     self.non_stemmed_n[t]+=1
         for doc in collection:
-            self.stemmed_norms[doc.document_id]=self.get_document_norm(doc.document_id,collection,True)
             self.non_stemmed_norms[doc.document_id]=self.get_document_norm(doc.document_id,collection,False)
 
+        # The postings keep the term frequency as third element, so the stemmed weights can be derived from them.
         for doc in collection:
-            stemmed_terms=list(set(doc.stemmed_terms))
             non_stemmed_terms=list(set(doc.terms))
-
-            for term in stemmed_terms:
-                if term not in self.stemmed_inverted_list.keys():
-                    self.stemmed_inverted_list[term]=[(doc.document_id,self.get_term_weight(term,doc.document_id,collection,True))]
-                else:
-                    self.stemmed_inverted_list[term].append((doc.document_id,self.get_term_weight(term,doc.document_id,collection,True)))
-            
             for term in non_stemmed_terms:
+                weight=self.get_term_weight(term,doc.document_id,collection,False)
+                posting=(doc.document_id,weight,doc.terms.count(term))
                 if term not in self.non_stemmed_inverted_list.keys():
-                    self.non_stemmed_inverted_list[term]=[(doc.document_id,self.get_term_weight(term,doc.document_id,collection,False))]
+                    self.non_stemmed_inverted_list[term]=[posting]
                 else:
-                    self.non_stemmed_inverted_list[term].append((doc.document_id,self.get_term_weight(term,doc.document_id,collection,False)))
-        
-        for term in self.stemmed_inverted_list.keys():
-            self.stemmed_inverted_list[term]=sorted(self.stemmed_inverted_list[term],key=lambda pair:pair[1],reverse=True)
+                    self.non_stemmed_inverted_list[term].append(posting)
 
         for term in self.non_stemmed_inverted_list.keys():
             self.non_stemmed_inverted_list[term]=sorted(self.non_stemmed_inverted_list[term],key=lambda pair:pair[1],reverse=True)
+
+        self.document_id_count=max([doc.document_id for doc in collection],default=-1)+1
+
+    def build_stemmed_inverted_list(self) -> StemmedInvertedList:
+        """
+        Derives the stemmed inverted list from the surface form inverted list and the stem classes of its terms.
+        """
+        stem_classes=get_stem_classes(self.non_stemmed_inverted_list.keys())
+        return StemmedInvertedList(self.non_stemmed_inverted_list,stem_classes,self.N,self.document_id_count)
+
+    @property
+    def stemmed_inverted_list(self) -> StemmedInvertedList:
+        return self.get_variant('stemmed_inverted_list')
+
+    @property
+    def stemmed_n(self) -> dict:
+        return self.stemmed_inverted_list.n
+
+    @property
+    def stemmed_norms(self) -> list[float]:
+        return self.stemmed_inverted_list.norms
+
+    def get_variant_names(self, stemming=False, stopword_filtering=False) -> list[str]:
+        return ['stemmed_inverted_list'] if stemming else []
+
+    def load_index(self, index_directory: str) -> None:
+        """
+        Opens the inverted list of an index built out of core (see spimi.py). The postings file is read once for the
+        document norms; afterwards only the dictionary and the norms are held in memory, and the weights of a posting
+        list are computed when it is read. Index variants that need all weights (the stemmed inverted list, the sparse
+        scorer of the LSI and p-norm models and of relevance feedback) still hold them in memory.
+        :param index_directory: Directory of the index
+        """
+        metadata=spimi.load_index_metadata(index_directory)
+        self.N=metadata['document_count']
+        self.document_id_count=metadata['document_id_count']
+        postings_path=spimi.get_postings_path(index_directory)
+        self.non_stemmed_inverted_list=WeightedPostingsFile(postings_path,self.N)
+        self.non_stemmed_n=self.non_stemmed_inverted_list.document_frequencies
+        norms=self.load_norms(postings_path)
+        self.non_stemmed_inverted_list.norms=norms
+        self.non_stemmed_norms={d:norms[d] for d in metadata['document_ids']}
+
+    def load_norms(self, postings_path: str) -> list[float]:
+        """
+        :param postings_path: Path of a postings file with term frequencies
+        :return: Norms of the tf-idf vectors of the documents, indexed by document ID
+        """
+        norms=np.zeros(self.document_id_count)
+        for term,postings in spimi.read_postings(postings_path):
+            idf=math.log(self.N/self.non_stemmed_n[term])
+            np.add.at(norms,postings[0::2],(np.asarray(postings[1::2],dtype=np.float64)*idf)**2)
+        return np.sqrt(norms).tolist()
+
+    def get_sparse_scorer(self, stemming=False) -> SparseVectorSpaceScorer:
+        """
+        Returns the batched scoring engine for the stemmed or non stemmed weights, a CSR copy of the inverted list. It
+        is built on first use.
+        :param stemming: Controls, whether the stemmed inverted list is used
+        :return: Scorer that holds the weights as a sparse matrix
+        """
+        return self.get_variant('stemmed_sparse_scorer' if stemming else 'sparse_scorer')
+
+    def build_sparse_scorer(self) -> SparseVectorSpaceScorer:
+        return SparseVectorSpaceScorer(self.non_stemmed_inverted_list,self.document_id_count)
+
+    def build_stemmed_sparse_scorer(self) -> SparseVectorSpaceScorer:
+        return SparseVectorSpaceScorer(self.stemmed_inverted_list,self.document_id_count)
+
+    def get_document_vectors(self, stemming=False) -> DocumentVectorStore:
+        """
+        Returns the weight vectors of all documents for relevance feedback. They are built on first use.
+        :param stemming: Controls, whether the stemmed weights are used
+        :return: Store of the document vectors
+        """
+        return self.get_variant('stemmed_document_vectors' if stemming else 'document_vectors')
+
+    def build_document_vectors(self) -> DocumentVectorStore:
+        return DocumentVectorStore(self.get_sparse_scorer(False))
+
+    def build_stemmed_document_vectors(self) -> DocumentVectorStore:
+        return DocumentVectorStore(self.get_sparse_scorer(True))
+
     def get_term_weight(self,term,document,collection,stemming=False):
         relative_frequency=0
         absolute_frequency=0
@@ -342,13 +640,13 @@ class VectorSpaceModel(RetrievalModel):
                 relative_frequencies[query_terms[i]]+=1
             max_relative_frequency=max(max_relative_frequency,relative_frequencies[query_terms[i]])
         if stemming:
-            if term not in self.stemmed_inverted_list.keys():
+            if term not in self.stemmed_n.keys():
                 return 0
-            absolute_frequency=len(self.stemmed_inverted_list[term])
+            absolute_frequency=self.stemmed_n[term]
         else:
-            if term not in self.non_stemmed_inverted_list.keys():
+            if term not in self.non_stemmed_n.keys():
                 return 0
-            absolute_frequency=len(self.non_stemmed_inverted_list[term])
+            absolute_frequency=self.non_stemmed_n[term]
         if relative_frequency>0:
             term_weight=(0.5+(0.5*relative_frequency/max_relative_frequency))*math.log(self.N/absolute_frequency)
         else:
@@ -399,6 +697,229 @@ class VectorSpaceModel(RetrievalModel):
         return 'Vector Space Model'
 
 
+class LSIModel(RetrievalModel):
+    DEFAULT_RANK = 100
+    OVERSAMPLING = 10  # Additional random directions for the randomized SVD.
+    POWER_ITERATIONS = 2  # Power iterations of the randomized SVD, improve the accuracy for slowly decaying spectra.
+
+    def __init__(self, rank: int = DEFAULT_RANK, vector_space_model: 'VectorSpaceModel' = None):
+        """
+        Latent Semantic Indexing on the tf-idf weights of the Vector Space Model. The term-document matrix A is
+        approximated by a truncated SVD A ~ U_k S_k V_k^T. Documents are represented by the rows of V_k S_k, queries are
+        folded in as U_k^T q, and both are compared by the cosine.
+        :param rank: Number of latent dimensions k
+        :param vector_space_model: Built Vector Space Model to take the weights from. Built here if not given.
+        """
+        start_time=time.time()
+        self.rank=rank
+        self.variants={}  # Latent spaces per stemming variant, built on first use, see get_latent_space().
+        self.variant_build_times={}
+        self.build_peak_memory=0
+        self.vector_space_model=vector_space_model if vector_space_model is not None else VectorSpaceModel()
+        self.build_time=time.time()-start_time
+
+    @property
+    def vocabulary_model(self) -> 'VectorSpaceModel':
+        return self.vector_space_model
+
+    def get_latent_space(self, stemming=False) -> tuple:
+        """
+        :param stemming: Controls, whether the stemmed variant is used
+        :return: Tuple (U_k as float32 matrix of shape (terms, k), normalized rows of V_k S_k as float32 matrix)
+        """
+        return self.get_variant('stemmed_latent_space' if stemming else 'latent_space')
+
+    def build_latent_space(self) -> tuple:
+        return self.compute_latent_space(False)
+
+    def build_stemmed_latent_space(self) -> tuple:
+        return self.compute_latent_space(True)
+
+    def compute_latent_space(self, stemming: bool) -> tuple:
+        """
+        Computes the truncated SVD of the term-document matrix of a stemming variant and records the peak memory.
+        :param stemming: Controls, whether the stemmed variant is used
+        :return: See get_latent_space()
+        """
+        tracing=tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        scorer=self.vector_space_model.get_sparse_scorer(stemming)
+        term_vectors,singular_values,document_vectors=self.truncated_svd(scorer)
+        embeddings=document_vectors*singular_values
+        norms=np.linalg.norm(embeddings,axis=1,keepdims=True)
+        norms[norms==0]=1
+        latent_space=(np.ascontiguousarray(term_vectors,dtype=np.float32),
+                      np.ascontiguousarray(embeddings/norms,dtype=np.float32))
+
+        self.build_peak_memory=max(self.build_peak_memory,tracemalloc.get_traced_memory()[1])
+        if not tracing:
+            tracemalloc.stop()
+        return latent_space
+
+    def get_variant_names(self, stemming=False, stopword_filtering=False) -> list[str]:
+        return ['stemmed_latent_space' if stemming else 'latent_space']
+
+    def truncated_svd(self, scorer: SparseVectorSpaceScorer):
+        """
+        Computes the rank-k SVD of the term-document matrix with the randomized algorithm of Halko et al. (2011). Only
+        products with the sparse matrix are needed, the matrix is never stored densely.
+        :param scorer: Sparse term-document matrix
+        :return: Tuple (U_k, singular values, V_k)
+        """
+        term_count=len(scorer.indptr)-1
+        rank=max(0,min(self.rank,term_count,scorer.document_count))
+        random_generator=np.random.default_rng(0)
+        sketch_size=min(rank+self.OVERSAMPLING,term_count,scorer.document_count)
+        basis,_=np.linalg.qr(scorer.dot(random_generator.standard_normal((scorer.document_count,sketch_size))))
+        for _ in range(self.POWER_ITERATIONS):
+            basis,_=np.linalg.qr(scorer.transpose_dot(basis))
+            basis,_=np.linalg.qr(scorer.dot(basis))
+        projected_t=scorer.transpose_dot(basis)  # (Q^T A)^T
+        small_u,singular_values,small_vt=np.linalg.svd(projected_t.T,full_matrices=False)
+        term_vectors=basis@small_u[:,:rank]
+        return term_vectors,singular_values[:rank],small_vt[:rank].T
+
+    def get_build_report(self) -> str:
+        variants=''.join(f', {name} in {seconds:.2f} s' for name,seconds in self.variant_build_times.items())
+        index_memory=sum(matrix.nbytes for latent_space in self.variants.values() for matrix in latent_space)
+        return (f'{self} built in {self.build_time:.2f} s{variants}, peak build memory '
+                f'{self.build_peak_memory/2**20:.1f} MiB, index memory {index_memory/2**20:.1f} MiB')
+
+    def query_to_representation(self, query: str) -> str:
+        return self.vector_space_model.query_to_representation(query)
+
+    def fold_query(self, query_terms: list[str], stemming=False) -> np.ndarray:
+        """
+        Folds a query into the latent space: q_k = U_k^T q, normalized to unit length.
+        :param query_terms: Query terms (already filtered and stemmed)
+        :param stemming: Controls, whether the stemmed variant is used
+        :return: Query vector of length k
+        """
+        scorer=self.vector_space_model.get_sparse_scorer(stemming)
+        term_ids,weights=[],[]
+        for term in set(query_terms):
+            weight=self.vector_space_model.get_query_term_weight(query_terms,term,stemming)
+            if weight>0 and term in scorer.term_ids:
+                term_ids.append(scorer.term_ids[term])
+                weights.append(weight)
+        query_vector=np.asarray(weights,dtype=np.float32)@self.get_latent_space(stemming)[0][term_ids]
+        norm=np.linalg.norm(query_vector)
+        return query_vector/norm if norm>0 else query_vector
+
+    def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False) -> np.ndarray:
+        return self.get_latent_space(stemming)[1][document.document_id]
+
+    def match(self, document_representation, query_representation) -> float:
+        return float(document_representation@query_representation)
+
+    def __str__(self):
+        return f'Latent Semantic Indexing (rank {self.rank})'
+
+
+class ExtendedBooleanModel(RetrievalModel):
+    DEFAULT_P = 2.0
+
+    def __init__(self, p: float = DEFAULT_P, vector_space_model: 'VectorSpaceModel' = None):
+        """
+        Extended Boolean model (p-norm model by Salton, Fox & Wu) on the normalized tf-idf weights of the Vector Space
+        Model. Queries use the Boolean grammar (&, |, -), but every document gets a score in [0, 1]:
+        OR(x_1..x_n) = (mean(x_i^p))^(1/p), AND(x_1..x_n) = 1 - (mean((1-x_i)^p))^(1/p), NOT(x) = 1 - x.
+        p = 1 ranks like the vector space model, large p approaches strict Boolean logic.
+        :param p: Norm parameter (at least 1)
+        :param vector_space_model: Built Vector Space Model to take the weights from. Built here if not given.
+        """
+        if p<1:
+            raise ValueError(f'p must be at least 1, got {p}.')
+        self.p=p
+        self.vector_space_model=vector_space_model if vector_space_model is not None else VectorSpaceModel()
+
+    @property
+    def vocabulary_model(self) -> 'VectorSpaceModel':
+        return self.vector_space_model
+
+    def get_term_weights(self, term: str, stemming=False) -> tuple:
+        """
+        Returns the postings of a term with their weights.
+        :param term: Term (already stemmed if stemming is used)
+        :param stemming: Controls, whether the stemmed weights are used
+        :return: Sparse scores (document IDs, weights, 0.0) of the documents that contain the term (see score_query())
+        """
+        scorer=self.vector_space_model.get_sparse_scorer(stemming)
+        term_id=scorer.term_ids.get(term)
+        if term_id is None:
+            return np.zeros(0,dtype=np.int64),np.zeros(0),0.0
+        start,end=scorer.indptr[term_id],scorer.indptr[term_id+1]
+        return scorer.indices[start:end].astype(np.int64),scorer.data[start:end],0.0
+
+    def get_document_count(self, stemming=False) -> int:
+        return self.vector_space_model.get_sparse_scorer(stemming).document_count
+
+    def prepare_variants(self, stemming=False, stopword_filtering=False) -> None:
+        self.vector_space_model.get_sparse_scorer(stemming)
+
+    def score_query(self, node: tuple, get_term_weights) -> tuple:
+        """
+        Scores the documents for a parsed query. Scores are sparse: a triple (document IDs, scores, default), where the
+        sorted document IDs are the union of the postings of the query terms and every other document has the default
+        score. Only NOT makes the default nonzero, so no operation touches documents outside the union. Chains of the
+        same operator (a & b & c) are combined into one n-ary operation, so the score does not depend on how the parser
+        nested them.
+        :param node: Root node of a parsed query (see query_parser)
+        :param get_term_weights: Function that returns the sparse weights of a term, or None if the term should be
+        ignored (e. g. because it is a stop word). Ignored terms drop out of the surrounding operation.
+        :return: Sparse scores, or None if all terms were ignored
+        """
+        kind=node[0]
+        if kind==query_parser.TERM:
+            return get_term_weights(node[1])
+        if kind==query_parser.NOT:
+            operand=self.score_query(node[1],get_term_weights)
+            if operand is None:
+                return None
+            document_ids,scores,default=operand
+            return document_ids,1-scores,1-default
+        operands=[self.score_query(child,get_term_weights) for child in self.get_operands(node,kind)]
+        operands=[operand for operand in operands if operand is not None]
+        if not operands:
+            return None
+        if len(operands)==1:
+            return operands[0]
+        document_ids=operands[0][0]
+        for operand in operands[1:]:
+            document_ids=np.union1d(document_ids,operand[0])
+        # One row per operand, one column per document of the union and a last column for all other documents.
+        values=np.empty((len(operands),len(document_ids)+1))
+        for row,(operand_ids,scores,default) in zip(values,operands):
+            row[:]=default
+            row[np.searchsorted(document_ids,operand_ids)]=scores
+        if kind==query_parser.OR:
+            values=np.mean(np.power(values,self.p),axis=0)**(1/self.p)
+        else:
+            values=1-np.mean(np.power(1-values,self.p),axis=0)**(1/self.p)
+        return document_ids,values[:-1],float(values[-1])
+
+    def get_operands(self, node: tuple, kind: str) -> list[tuple]:
+        if node[0]!=kind:
+            return [node]
+        return self.get_operands(node[1],kind)+self.get_operands(node[2],kind)
+
+    def query_to_representation(self, query: str) -> str:
+        query=query.lower()
+        return query
+
+    def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False) -> list[str]:
+        pass
+
+    def match(self, document_representation, query_representation) -> float:
+        pass
+
+    def __str__(self):
+        return f'Extended Boolean Model (p-norm, p={self.p:g})'
+
+
 class FuzzySetModel(RetrievalModel):
 
     def __init__(self):
@@ -0,0 +1,136 @@
+# Contains the near-duplicate detection of a collection: MinHash sketches of the term shingles of every document are
+# grouped by locality-sensitive hashing (LSH banding), so only documents that share a band of their sketch are compared.
+
+import zlib
+
+import numpy as np
+
+from document import Document
+
+SHINGLE_SIZE = 3  # Number of consecutive terms per shingle.
+BANDS, ROWS = 32, 4  # The sketch of BANDS * ROWS MinHash values is split into BANDS bands of ROWS values.
+DEFAULT_THRESHOLD = 0.8  # Minimum estimated Jaccard similarity of the shingle sets of near-duplicates.
+SHINGLE_BASE = 1000003  # Base of the rolling hash that combines the 32-bit term hashes of a shingle.
+HASH_MASK = np.uint64(0xFFFFFFFF)
+EMPTY_SKETCH_VALUE = 0xFFFFFFFF
+SEED = 47
+
+
+def get_shingle_hashes(terms: list[str], term_hashes: dict, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hashes the shingles of a document. A shingle hash combines the hashes of its terms like a polynomial rolling hash,
+    so every term is hashed only once per collection.
+    :param terms: Term list of a document
+    :param term_hashes: Cache that maps terms to their hashes, shared by all documents of a collection
+    :param shingle_size: Number of consecutive terms per shingle
+    :return: Distinct 32-bit shingle hashes. A document with fewer terms has its whole text as only shingle,
+    an empty document has none.
+    """
+    hashes = []
+    for term in terms:
+        if term:
+            if term not in term_hashes:
+                term_hashes[term] = zlib.crc32(term.encode())
+            hashes.append(term_hashes[term])
+    hashes = np.array(hashes, dtype=np.uint64)
+    shingle_count = max(len(hashes) - shingle_size + 1, min(len(hashes), 1))
+    shingle_hashes = hashes[:shingle_count]
+    for offset in range(1, min(shingle_size, len(hashes))):
+        shingle_hashes = (shingle_hashes * np.uint64(SHINGLE_BASE) + hashes[offset:offset + shingle_count]) & HASH_MASK
+    return np.unique(shingle_hashes)
+
+
+class MinHasher(object):
+    """
+    Computes MinHash sketches: the minimum of each of BANDS * ROWS random hash functions over the shingles of a
+    document. The hash functions are multiply-shift hashes h(x) = ((a * x + b) mod 2^64) div 2^32 with random odd a,
+    which need no modulo operation. The share of equal positions in the sketches of two documents estimates the Jaccard
+    similarity of their shingle sets.
+    """
+
+    def __init__(self, sketch_size: int = BANDS * ROWS, seed: int = SEED):
+        random = np.random.default_rng(seed)
+        self.a = random.integers(0, 1 << 64, size=(sketch_size, 1), dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self.b = random.integers(0, 1 << 64, size=(sketch_size, 1), dtype=np.uint64, endpoint=False)
+
+    def get_sketch(self, shingle_hashes: np.ndarray) -> np.ndarray:
+        """
+        :param shingle_hashes: Distinct shingle hashes of a document (see get_shingle_hashes())
+        :return: MinHash values (all EMPTY_SKETCH_VALUE for a document without shingles)
+        """
+        if not len(shingle_hashes):
+            return np.full(len(self.a), EMPTY_SKETCH_VALUE, dtype=np.uint32)
+        return ((self.a * shingle_hashes + self.b) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+
+def find_near_duplicates(collection: list[Document], threshold: float = DEFAULT_THRESHOLD) -> list[list[int]]:
+    """
+    Finds clusters of near-duplicate documents in linear time. For every band, documents with equal band values fall
+    into one bucket and are compared with the first document of the bucket only; a pair whose sketches agree in at
+    least the threshold share of positions is merged into one cluster. Documents without terms are never duplicates.
+    :param collection: List of Document objects
+    :param threshold: Minimum estimated Jaccard similarity of near-duplicates
+    :return: Clusters as lists of positions in the collection, in collection order; only clusters with more than one
+    document are returned
+    """
+    min_hasher = MinHasher()
+    term_hashes = {}
+    sketches = np.array([min_hasher.get_sketch(get_shingle_hashes(document.terms, term_hashes))
+                         for document in collection],
+                        dtype=np.uint32).reshape(len(collection), BANDS * ROWS)
+    non_empty = np.flatnonzero((sketches != EMPTY_SKETCH_VALUE).any(axis=1))
+
+    # Union-find forest over the collection; the root of a cluster is always its first document.
+    parents = np.arange(len(collection))
+
+    def find(position: int) -> int:
+        root = position
+        while parents[root] != root:
+            root = parents[root]
+        while parents[position] != root:
+            parents[position], position = root, parents[position]
+        return root
+
+    for band in range(BANDS):
+        band_values = np.ascontiguousarray(sketches[non_empty, band * ROWS:(band + 1) * ROWS])
+        _, first_positions, buckets = np.unique(band_values.view(np.dtype((np.void, 4 * ROWS))).ravel(),
+                                                return_index=True, return_inverse=True)
+        representatives = non_empty[first_positions[buckets]]
+        candidates = np.flatnonzero(representatives != non_empty)
+        if not len(candidates):
+            continue
+        similarities = (sketches[non_empty[candidates]] == sketches[representatives[candidates]]).mean(axis=1)
+        for candidate in candidates[similarities >= threshold]:
+            root, other_root = sorted((find(representatives[candidate]), find(non_empty[candidate])))
+            parents[other_root] = root
+
+    clusters = {}
+    for position in range(len(collection)):
+        clusters.setdefault(find(position), []).append(position)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def remove_near_duplicates(collection: list[Document], threshold: float = DEFAULT_THRESHOLD) -> tuple:
+    """
+    Collapses every cluster of near-duplicates into its first document and renumbers the remaining documents, so the
+    document IDs stay consecutive.
+    :param collection: List of Document objects
+    :param threshold: Minimum estimated Jaccard similarity of near-duplicates
+    :return: Tuple of the reduced collection, the clusters (see find_near_duplicates()) and a dictionary that maps the
+    old ID of every document to its new ID; a removed duplicate is mapped to the new ID of the first document of its
+    cluster
+    """
+    clusters = find_near_duplicates(collection, threshold)
+    representatives = {position: cluster[0] for cluster in clusters for position in cluster[1:]}
+    id_map = {}
+    reduced_collection = []
+    for position, document in enumerate(collection):
+        if position in representatives:
+            # The first document of a cluster comes before its duplicates, so it already has its new ID.
+            id_map[document.document_id] = id_map[collection[representatives[position]].document_id]
+        else:
+            id_map[document.document_id] = len(reduced_collection)
+            reduced_collection.append(document)
+    for document in reduced_collection:
+        document.document_id = id_map[document.document_id]
+    return reduced_collection, clusters, id_map
@@ -0,0 +1,288 @@
+# Contains the parser and evaluator for Boolean queries.
+#
+# Grammar (from lowest to highest precedence):
+#   or_expression  := and_expression ('|' and_expression)*
+#   and_expression := not_expression ('&' not_expression)*
+#   not_expression := '-' not_expression | primary
+#   primary        := term | '(' or_expression ')'
+# Terms consist of letters only; all other characters (punctuation, digits) are removed from the query, so 'fox.'
+# searches for fox, like the documents, whose terms are stripped of their symbols as well.
+#
+# A parsed query is a tree of tuples: ('term', term), ('not', node), ('and', left, right) and ('or', left, right).
+# Tuples are immutable, so parsed queries can safely be shared by all consumers through the cache.
+# For the subexpression cache, queries are canonicalized into n-ary trees: ('and', operand, operand, ...) and
+# ('or', operand, operand, ...) with flattened, sorted and distinct operands.
+
+from collections import OrderedDict
+from functools import lru_cache
+import re
+import threading
+
+AND_OPERATOR, OR_OPERATOR, NOT_OPERATOR = '&', '|', '-'
+TERM, NOT, AND, OR = 'term', 'not', 'and', 'or'
+PARSE_CACHE_SIZE = 1024
+SUBEXPRESSION_CACHE_POSTINGS = 1000000  # Maximum number of document IDs in all cached subexpression results.
+
+TOKEN_PATTERN = re.compile(r'\s*(?:([A-Za-z]+)|(\S))')
+IGNORED_CHARACTERS = re.compile(r'[^A-Za-z\s&|()\-]')
+
+
+class QueryParseError(ValueError):
+    """
+    Raised if a query does not follow the Boolean query grammar.
+    """
+    pass
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query string so that equivalent spellings share one cache entry.
+    :param query: Query string
+    :return: Lower case query without ignored characters and without leading, trailing or repeated whitespace
+    """
+    return ' '.join(IGNORED_CHARACTERS.sub('', query.lower()).split())
+
+
+def tokenize_query(query: str) -> list[str]:
+    """
+    Splits a query string into terms, operators and parentheses. Characters that are neither letters nor operators
+    are removed first.
+    :param query: Query string
+    :return: List of tokens
+    """
+    tokens = []
+    position = 0
+    query = IGNORED_CHARACTERS.sub('', query).rstrip()
+    while position < len(query):
+        token_match = TOKEN_PATTERN.match(query, position)
+        term, symbol = token_match.groups()
+        tokens.append(term if term is not None else symbol)
+        position = token_match.end()
+    return tokens
+
+
+def parse_query(query: str) -> tuple:
+    """
+    Parses a Boolean query into a tree. Parsed queries are cached, keyed by the normalized query string, so parsing
+    the same query again (e. g. for the search and for its evaluation) costs a single dictionary lookup.
+    :param query: Query string with the operators & (and), | (or), - (not) and parentheses
+    :return: Root node of the parsed query
+    """
+    return _parse_normalized_query(normalize_query(query))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_normalized_query(query: str) -> tuple:
+    tokens = tokenize_query(query)
+    if not tokens:
+        raise QueryParseError('Empty query')
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def advance():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or_expression():
+        node = parse_and_expression()
+        while peek() == OR_OPERATOR:
+            advance()
+            node = (OR, node, parse_and_expression())
+        return node
+
+    def parse_and_expression():
+        node = parse_not_expression()
+        while peek() == AND_OPERATOR:
+            advance()
+            node = (AND, node, parse_not_expression())
+        return node
+
+    def parse_not_expression():
+        if peek() == NOT_OPERATOR:
+            advance()
+            return (NOT, parse_not_expression())
+        return parse_primary()
+
+    def parse_primary():
+        token = peek()
+        if token is None:
+            raise QueryParseError('Unexpected end of query')
+        if token == '(':
+            advance()
+            node = parse_or_expression()
+            if peek() != ')':
+                raise QueryParseError('Missing closing parenthesis')
+            advance()
+            return node
+        if token in (AND_OPERATOR, OR_OPERATOR, NOT_OPERATOR, ')'):
+            raise QueryParseError(f'Unexpected operator {token!r}')
+        return (TERM, advance())
+
+    root = parse_or_expression()
+    if position != len(tokens):
+        raise QueryParseError(f'Unexpected token {tokens[position]!r}')
+    return root
+
+
+def clear_parse_cache() -> None:
+    """
+    Removes all cached parsed queries.
+    """
+    _parse_normalized_query.cache_clear()
+    canonicalize_query.cache_clear()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def canonicalize_query(node: tuple) -> tuple:
+    """
+    Rewrites a parsed query into its canonical form, so that equivalent subexpressions such as (fox | wolf) and
+    (wolf | (fox | wolf)) share one cache entry. Chains of the same operator are flattened into one n-ary node whose
+    operands are sorted and distinct; & and | are commutative, associative and idempotent, also if an operand is
+    ignored during evaluation.
+    :param node: Root node of a parsed query
+    :return: Root node of the canonical query
+    """
+    kind = node[0]
+    if kind == TERM:
+        return node
+    if kind == NOT:
+        return (NOT, canonicalize_query(node[1]))
+    operands = set()
+    for child in node[1:]:
+        child = canonicalize_query(child)
+        if child[0] == kind:
+            operands.update(child[1:])
+        else:
+            operands.add(child)
+    if len(operands) == 1:
+        return operands.pop()
+    return (kind,) + tuple(sorted(operands))
+
+
+def get_query_terms(node: tuple) -> list[str]:
+    """
+    Collects all terms of a parsed query.
+    :param node: Root node of a parsed query
+    :return: List of terms in the order of their occurrence
+    """
+    if node[0] == TERM:
+        return [node[1]]
+    terms = []
+    for child in node[1:]:
+        terms += get_query_terms(child)
+    return terms
+
+
+def evaluate_query(node: tuple, get_term_documents, all_documents, cache: 'SubexpressionCache' = None,
+                   variant: tuple = ()):
+    """
+    Evaluates a parsed query bottom-up. Works on any set type that supports the operators &, | and -, i. e. on sets
+    as well as on bitmap.Bitmap.
+    :param node: Root node of a parsed query
+    :param get_term_documents: Function that returns the documents of a term, or None if the term should be ignored
+    (e. g. because it is a stop word). Ignored terms drop out of the surrounding operation, wherever they stand: with
+    stop word filtering, 'the & fox' and 'fox & the' both return the documents of fox.
+    :param all_documents: All documents (the universe), used for negation
+    :param cache: If given, the query is canonicalized and the results of all its subexpressions (terms included) are
+    looked up in and added to the cache. Results must not be modified by the caller.
+    :param variant: Settings that change the result of a subexpression (e. g. stemming), part of the cache key
+    :return: Matching documents, of the same type as all_documents
+    """
+    if cache is not None:
+        node = canonicalize_query(node)
+    result = _evaluate_node(node, get_term_documents, all_documents, cache, variant)
+    return all_documents - all_documents if result is None else result
+
+
+def _evaluate_node(node: tuple, get_term_documents, all_documents, cache, variant):
+    if cache is not None:
+        found, result = cache.get((node, variant))
+        if found:
+            return result
+    kind = node[0]
+    if kind == TERM:
+        result = get_term_documents(node[1])
+    elif kind == NOT:
+        operand = _evaluate_node(node[1], get_term_documents, all_documents, cache, variant)
+        result = None if operand is None else all_documents - operand
+    else:
+        result = None
+        for child in node[1:]:
+            operand = _evaluate_node(child, get_term_documents, all_documents, cache, variant)
+            if operand is None:
+                continue
+            if result is None:
+                result = operand
+            elif kind == AND:
+                result = result & operand
+            else:
+                result = result | operand
+    if cache is not None:
+        cache.put((node, variant), result)
+    return result
+
+
+class SubexpressionCache(object):
+    """
+    Least recently used cache of evaluated subexpressions, keyed by the canonical subexpression and the variant
+    settings of the search. Its size is bounded by the number of document IDs in all cached results, counting at
+    least one per entry. A cache belongs to one index generation (see IndexGeneration.get_subexpression_cache()), so it
+    is invalidated together with the index.
+    """
+
+    def __init__(self, max_postings: int = SUBEXPRESSION_CACHE_POSTINGS):
+        """
+        :param max_postings: Maximum number of document IDs in all cached results
+        """
+        self.max_postings = max_postings
+        self.entries = OrderedDict()  # Key -> (result, postings), from the least to the most recently used.
+        self.postings = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: tuple) -> tuple:
+        """
+        :param key: Pair of canonical subexpression and variant settings
+        :return: Pair of a flag, whether the key was found, and the cached result (None for ignored subexpressions)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return True, entry[0]
+
+    def put(self, key: tuple, result) -> None:
+        """
+        Adds a result and evicts the least recently used results until the cache fits into its bound. Results larger
+        than the bound are not cached.
+        :param key: Pair of canonical subexpression and variant settings
+        :param result: Evaluated documents of the subexpression, or None if it was ignored
+        """
+        postings = max(len(result), 1) if result is not None else 1
+        if postings > self.max_postings:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = (result, postings)
+            self.postings += postings
+            while self.postings > self.max_postings:
+                _, (_, evicted_postings) = self.entries.popitem(last=False)
+                self.postings -= evicted_postings
+
+    def get_hit_rate(self) -> float:
+        """
+        :return: Share of lookups that found a cached result (0.0 before the first lookup)
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,233 @@
+# Contains lazy result cursors, which hand out search results page by page and can be resumed from a continuation
+# token.
+
+from bitmap import Bitmap
+import base64
+import heapq
+import itertools
+import json
+import numpy as np
+
+
+def encode_token(state: dict) -> str:
+    """
+    Encodes the state of a cursor as an opaque continuation token.
+    :param state: JSON-serializable state
+    :return: Token string
+    """
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode('ascii')
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decodes a continuation token.
+    :param token: Token as returned by encode_token()
+    :return: State of the cursor
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid continuation token.')
+    if not isinstance(state, dict):
+        raise ValueError('Invalid continuation token.')
+    return state
+
+
+class BitmapResultSource(object):
+    """
+    Results of a Boolean query: the documents of a bitmap in ascending ID order, all with the score 1.0.
+    """
+    ranked = False
+
+    def __init__(self, bitmap: Bitmap):
+        self.bitmap = bitmap
+
+    def __len__(self) -> int:
+        return len(self.bitmap)
+
+    def get_results(self, start: int, count: int) -> list[tuple]:
+        """
+        :param start: Number of results to skip
+        :param count: Maximum number of results
+        :return: List of (score, document ID) pairs
+        """
+        return [(1.0, document_id) for document_id in self.bitmap.select(start, count)]
+
+
+class RankedResultSource(object):
+    """
+    Results of a ranked query: all documents with a positive score, by descending score and ascending ID. Only the
+    prefix of the ranking that was asked for is sorted; it grows by doubling when later pages are requested.
+    """
+    ranked = True
+
+    def __init__(self, scores: np.ndarray):
+        self.scores = scores
+        self.candidates = np.flatnonzero(scores > 0)
+        self.ranking = np.zeros(0, dtype=np.int64)  # Sorted prefix of the ranking.
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def get_results(self, start: int, count: int) -> list[tuple]:
+        """
+        :param start: Number of results to skip
+        :param count: Maximum number of results
+        :return: List of (score, document ID) pairs
+        """
+        end = min(start + count, len(self.candidates))
+        if end > len(self.ranking):
+            self.ranking = self.rank(max(end, 2 * len(self.ranking)))
+        return [(float(self.scores[d]), int(d)) for d in self.ranking[start:end]]
+
+    def rank(self, k: int) -> np.ndarray:
+        """
+        Finds the k best documents. Ties are broken by the document ID, so prefixes of different length agree.
+        :param k: Number of documents
+        :return: Document IDs in ranking order
+        """
+        candidates = self.candidates
+        if k < len(candidates):
+            candidate_scores = self.scores[candidates]
+            kth_score = -np.partition(-candidate_scores, k - 1)[k - 1]
+            candidates = candidates[candidate_scores >= kth_score]
+        return candidates[np.lexsort((candidates, -self.scores[candidates]))][:k]
+
+
+class SparseRankedResultSource(object):
+    """
+    Results of a ranked query with sparse scores (see models.ExtendedBooleanModel.score_query()): all documents with a
+    positive score, by descending score and ascending ID. Documents outside the scored set share the default score, so
+    only the first of them by ID can ever reach a page. The k best documents are kept with a heap; k grows by doubling
+    when later pages are requested.
+    """
+    ranked = True
+
+    def __init__(self, document_ids: np.ndarray, scores: np.ndarray, default: float, document_count: int):
+        """
+        :param document_ids: IDs of the scored documents
+        :param scores: Scores of these documents
+        :param default: Score of all other documents
+        :param document_count: Number of documents in the collection
+        """
+        positive = scores > 0
+        self.candidates = list(zip(scores[positive].tolist(), document_ids[positive].tolist()))
+        self.scored_ids = set(document_ids.tolist())
+        self.default = default
+        self.default_count = document_count - len(self.scored_ids) if default > 0 else 0
+        self.ranking = []  # Prefix of the ranking as (score, document ID) pairs.
+
+    def __len__(self) -> int:
+        return len(self.candidates) + self.default_count
+
+    def get_results(self, start: int, count: int) -> list[tuple]:
+        """
+        :param start: Number of results to skip
+        :param count: Maximum number of results
+        :return: List of (score, document ID) pairs
+        """
+        end = min(start + count, len(self))
+        if end > len(self.ranking):
+            self.ranking = self.rank(max(end, 2 * len(self.ranking)))
+        return self.ranking[start:end]
+
+    def rank(self, k: int) -> list[tuple]:
+        """
+        Finds the k best documents. Ties are broken by the document ID, so prefixes of different length agree.
+        :param k: Number of documents
+        :return: List of (score, document ID) pairs in ranking order
+        """
+        default_ids = (document_id for document_id in itertools.count() if document_id not in self.scored_ids)
+        default_results = [(self.default, document_id)
+                           for document_id in itertools.islice(default_ids, min(k, self.default_count))]
+        return heapq.nsmallest(k, self.candidates + default_results, key=lambda result: (-result[0], result[1]))
+
+
+class ListResultSource(object):
+    """
+    Results that are computed completely by the search method, e. g. the top documents of the Buckley-Lewit algorithm.
+    """
+
+    def __init__(self, results: list[tuple], ranked: bool):
+        """
+        :param results: List of (score, document ID) pairs in result order
+        :param ranked: Controls, whether the results are ranked by score
+        """
+        self.results = results
+        self.ranked = ranked
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def get_results(self, start: int, count: int) -> list[tuple]:
+        return self.results[start:start + count]
+
+
+class ResultCursor(object):
+    """
+    Lazy view on the results of a query. Results are produced by the source only when a page is consumed, and their
+    documents are looked up only then. The continuation token encodes the query and the position, so the search can
+    be resumed later (see InformationRetrievalSystem.resume_cursor()).
+    """
+
+    def __init__(self, source, get_document, page_size: int, state: dict, position: int = 0):
+        """
+        :param source: Result source that provides the results by position
+        :param get_document: Function that returns the document of an ID
+        :param page_size: Number of results per page
+        :param state: Description of the query, which is encoded in the continuation token
+        :param position: Number of results that were already consumed
+        """
+        self.source = source
+        self.get_document = get_document
+        self.page_size = page_size
+        self.state = state
+        self.position = position
+        self.next_results = None  # Results of the next page, fetched in advance by has_more().
+
+    def __iter__(self):
+        while True:
+            page = self.next_page()
+            if not page:
+                return
+            yield from page
+
+    def next_page(self) -> list[tuple]:
+        """
+        Consumes the next page of results.
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document (empty if all results were consumed)
+        """
+        results = self.next_results
+        if results is None:
+            results = self.source.get_results(self.position, self.page_size)
+        self.next_results = None
+        self.position += len(results)
+        return [(score, self.get_document(document_id)) for score, document_id in results]
+
+    def has_more(self) -> bool:
+        """
+        :return: True if another page has results
+        """
+        if self.next_results is None:
+            self.next_results = self.source.get_results(self.position, self.page_size)
+        return len(self.next_results) > 0
+
+    def peek(self, count: int = None) -> list[tuple]:
+        """
+        Returns results from the beginning without consuming them, e. g. to evaluate the query.
+        :param count: Maximum number of results (default: all)
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        results = self.source.get_results(0, len(self.source) if count is None else count)
+        return [(score, self.get_document(document_id)) for score, document_id in results]
+
+    @property
+    def continuation_token(self) -> str:
+        """
+        Opaque token to resume the cursor at its current position, or None if all results were consumed.
+        """
+        if not self.has_more():
+            return None
+        return encode_token(dict(self.state, position=self.position, page_size=self.page_size))
@@ -0,0 +1,81 @@
+# Contains the signature tree (S-tree), a hierarchy of superimposed signatures over the block signatures of a
+# collection.
+
+import numpy as np
+
+DEFAULT_FANOUT = 16  # Number of nodes of a level that are superimposed into one group signature of the level above.
+
+
+def expand_children(child_starts: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """
+    Returns the positions of all children of some nodes in the level below.
+    :param child_starts: Start of the children of every node in the level below (with one extra entry for the end)
+    :param nodes: Ascending node positions
+    :return: Ascending child positions
+    """
+    starts = child_starts[nodes]
+    lengths = child_starts[nodes + 1] - starts
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+class SignatureTree(object):
+    """
+    Multi-level signature index. Level 0 holds the block signatures of all documents, level 1 one signature per
+    document (the OR of its block signatures) and every further level the OR of up to fanout consecutive signatures of
+    the level below, until the top level has at most fanout signatures. A signature that does not contain all bits of
+    a term signature rules out the whole subtree below it, so a lookup descends only into matching subtrees.
+    """
+
+    def __init__(self, signature_files: dict, fanout: int = DEFAULT_FANOUT):
+        """
+        :param signature_files: Maps each document ID to the list of its block signatures (integers of up to 64 bits)
+        :param fanout: Number of children per group signature
+        """
+        self.document_ids = np.array(list(signature_files.keys()), dtype=np.int64)
+        block_counts = np.array([len(blocks) for blocks in signature_files.values()], dtype=np.int64)
+        block_starts = np.concatenate(([0], np.cumsum(block_counts)))
+        blocks = np.fromiter((block for blocks in signature_files.values() for block in blocks), dtype=np.uint64,
+                             count=int(block_starts[-1]))
+        # Documents without blocks keep the empty signature, which matches no term.
+        document_signatures = np.zeros(len(block_counts), dtype=np.uint64)
+        if len(blocks):
+            non_empty = block_counts > 0
+            document_signatures[non_empty] = np.bitwise_or.reduceat(blocks, block_starts[:-1][non_empty])
+
+        self.levels = [blocks, document_signatures]  # Signatures per level, from the blocks up to the top level.
+        self.child_starts = [None, block_starts]  # Per level: start of the children of each node in the level below.
+        while len(self.levels[-1]) > fanout:
+            level = self.levels[-1]
+            starts = np.arange(0, len(level), fanout)
+            self.levels.append(np.bitwise_or.reduceat(level, starts))
+            self.child_starts.append(np.append(starts, len(level)))
+
+    def __len__(self) -> int:
+        return len(self.document_ids)
+
+    def search(self, pattern: int, statistics: dict = None) -> list[int]:
+        """
+        Finds all documents with at least one block signature that contains all bits of a pattern.
+        :param pattern: Signature of the searched term
+        :param statistics: If given, the number of tested signatures is added to its 'visited_signatures' entry
+        :return: Ascending list of candidate document IDs
+        """
+        pattern = np.uint64(pattern)
+        nodes = np.arange(len(self.levels[-1]))
+        visited = len(nodes)
+        nodes = nodes[(self.levels[-1] & pattern) == pattern]
+        for level in range(len(self.levels) - 1, 0, -1):
+            nodes = expand_children(self.child_starts[level], nodes)
+            visited += len(nodes)
+            nodes = nodes[(self.levels[level - 1][nodes] & pattern) == pattern]
+        if statistics is not None:
+            statistics['visited_signatures'] = statistics.get('visited_signatures', 0) + visited
+        # Matching blocks are mapped to their documents.
+        documents = np.unique(np.searchsorted(self.child_starts[1], nodes, side='right') - 1)
+        return self.document_ids[documents].tolist()
+
+    def count_signatures(self) -> int:
+        """
+        :return: Number of signatures on all levels
+        """
+        return sum(len(level) for level in self.levels)
@@ -0,0 +1,138 @@
+# Contains all functions that save and restore built retrieval models (warm start).
+
+import hashlib
+import os
+import pickle
+import re
+
+DATA_PATH = 'data'
+COLLECTION_PATH = os.path.join(DATA_PATH, 'my_collection.json')
+DOCUMENT_STORE_PATH = os.path.join(DATA_PATH, 'my_collection.store')
+STOPWORD_FILE_PATH = os.path.join(DATA_PATH, 'stopwords.json')
+SNAPSHOT_PATH = os.path.join(DATA_PATH, 'snapshots')
+SNAPSHOT_VERSION = 14  # Increase whenever the layout of a model or of the snapshot file changes.
+
+
+def compute_fingerprint(model_arguments: dict = None, collection_path: str = COLLECTION_PATH,
+                        stop_word_path: str = STOPWORD_FILE_PATH, store_path: str = DOCUMENT_STORE_PATH) -> str:
+    """
+    Computes a fingerprint of the index input: the size and modification time of the collection file, the document
+    store (which models read the documents from), the stop word list and, for a model loaded from an out-of-core
+    index, the metadata file of the index (which is rewritten by every build of the index), and the arguments the model
+    is built with. A snapshot is only valid as long as all of them are unchanged. Only the file metadata is read, so
+    the fingerprint costs the same for every collection size.
+    :param model_arguments: Keyword arguments the model is built with
+    :param collection_path: Path of the JSON collection file
+    :param stop_word_path: Path of the JSON stop word file
+    :param store_path: Path of the document store
+    :return: Hex digest that identifies the current index input
+    """
+    parts = [str(SNAPSHOT_VERSION), repr(sorted((model_arguments or {}).items()))]
+    paths = [collection_path, store_path, stop_word_path]
+    if (model_arguments or {}).get('index_directory') is not None:
+        import spimi
+        paths.append(os.path.join(model_arguments['index_directory'], spimi.METADATA_FILE_NAME))
+    for path in paths:
+        try:
+            status = os.stat(path)
+            parts.append(f'{path}:{status.st_size}:{status.st_mtime_ns}')
+        except FileNotFoundError:
+            parts.append(f'{path}:<missing>')
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def get_snapshot_file_path(snapshot_name: str) -> str:
+    """
+    Returns the path of a snapshot file.
+    :param snapshot_name: Name of the snapshot, i. e. the class name of the model (e. g. 'VectorSpaceModel'), followed
+    by its parameters if it has any (see get_snapshot_name())
+    :return: Path of the snapshot file
+    """
+    return os.path.join(SNAPSHOT_PATH, snapshot_name + '.pickle')
+
+
+def get_snapshot_name(model_class, model_arguments: dict = None) -> str:
+    """
+    Returns the snapshot name of a model class built with the given arguments, e. g. 'LSIModel-rank=100'.
+    :param model_class: Class of the model
+    :param model_arguments: Keyword arguments the model is built with
+    :return: Snapshot name
+    """
+    name = model_class.__name__
+    for key, value in sorted((model_arguments or {}).items()):
+        # Characters that are not allowed in file names (e. g. path separators of directory arguments) are replaced.
+        name += f'-{key}=' + re.sub(r'[^A-Za-z0-9.]', '_', str(value))
+    return name
+
+
+def save_model_snapshot(model, fingerprint: str, snapshot_name: str = None, model_arguments: dict = None) -> None:
+    """
+    Stores a built model. The collection itself is not part of the snapshot, it is loaded from the document store.
+    :param model: Built retrieval model
+    :param fingerprint: Fingerprint of the index input (see compute_fingerprint())
+    :param snapshot_name: Name of the snapshot (default: class name of the model)
+    :param model_arguments: Keyword arguments the model was built with
+    """
+    if snapshot_name is None:
+        snapshot_name = type(model).__name__
+    if not os.path.isdir(SNAPSHOT_PATH):
+        os.makedirs(SNAPSHOT_PATH)
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'fingerprint': fingerprint,
+        'name': snapshot_name,
+        'model_arguments': model_arguments or {},
+        'model': model
+    }
+    file_path = get_snapshot_file_path(snapshot_name)
+    # Write to a temporary file first, so that an interrupted save never leaves a broken snapshot behind.
+    temporary_file_path = file_path + '.tmp'
+    with open(temporary_file_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_file_path, file_path)
+
+
+def read_snapshot(snapshot_name: str):
+    """
+    :param snapshot_name: Name of the snapshot (see get_snapshot_name())
+    :return: Snapshot dictionary of the current version or None if there is none
+    """
+    try:
+        with open(get_snapshot_file_path(snapshot_name), 'rb') as f:
+            snapshot = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot if snapshot.get('name') == snapshot_name else None
+
+
+def load_model_snapshot(snapshot_name: str, fingerprint: str):
+    """
+    Loads a snapshot if it exists and still matches the current index input.
+    :param snapshot_name: Name of the snapshot (see get_snapshot_name())
+    :param fingerprint: Fingerprint of the current index input (see compute_fingerprint())
+    :return: Model or None if there is no valid snapshot
+    """
+    snapshot = read_snapshot(snapshot_name)
+    if snapshot is None or snapshot.get('fingerprint') != fingerprint:
+        return None
+    return snapshot['model']
+
+
+def load_latest_snapshot() -> tuple:
+    """
+    Loads the most recently saved snapshot that is still valid. Used to restore the last selected model at startup.
+    Every snapshot is checked against the fingerprint of the arguments its model was built with.
+    :return: Tuple of the model and its model arguments, or (None, {}) if there is no valid snapshot
+    """
+    if not os.path.isdir(SNAPSHOT_PATH):
+        return None, {}
+    snapshot_files = [f for f in os.listdir(SNAPSHOT_PATH) if f.endswith('.pickle')]
+    snapshot_files = sorted(snapshot_files, key=lambda f: os.path.getmtime(os.path.join(SNAPSHOT_PATH, f)),
+                            reverse=True)
+    for file_name in snapshot_files:
+        snapshot = read_snapshot(file_name[:-len('.pickle')])
+        if snapshot is not None and snapshot.get('fingerprint') == compute_fingerprint(snapshot['model_arguments']):
+            return snapshot['model'], snapshot['model_arguments']
+    return None, {}
@@ -0,0 +1,71 @@
+# Contains the generation of result snippets with highlighted query terms.
+
+from document import Document
+import extraction
+
+SNIPPET_WINDOW = 20  # Number of terms shown per snippet.
+HIGHLIGHT_START, HIGHLIGHT_END = '[', ']'
+
+
+def find_best_window(match_positions: list[int], matched_terms: list[str], window_size: int) -> int:
+    """
+    Finds the window of window_size consecutive terms that contains the most distinct query terms, and among those
+    the most matches.
+    :param match_positions: Ascending term positions of all matches in the document
+    :param matched_terms: Query term (or its stem) matched at each position
+    :param window_size: Number of terms per window
+    :return: Position of the first term of the best window
+    """
+    best_start, best_score = 0, (0, 0)
+    term_counts = {}
+    left = 0
+    for right in range(len(match_positions)):
+        term_counts[matched_terms[right]] = term_counts.get(matched_terms[right], 0) + 1
+        while match_positions[right] - match_positions[left] >= window_size:
+            term_counts[matched_terms[left]] -= 1
+            if term_counts[matched_terms[left]] == 0:
+                del term_counts[matched_terms[left]]
+            left += 1
+        score = (len(term_counts), right - left + 1)
+        if score > best_score:
+            best_start, best_score = match_positions[left], score
+    return best_start
+
+
+def generate_snippet(document: Document, query_terms: list[str], window_size: int = SNIPPET_WINDOW) -> str:
+    """
+    Creates a snippet of a document around the query terms and highlights them. Terms match if their Porter stems are
+    equal. The matches are looked up by stem in the stem positions recorded at extraction, so the cost per document
+    depends on the number of matches and the window size, not on the length of the document.
+    :param document: Document to create the snippet for
+    :param query_terms: Terms of the query (stemmed or not)
+    :param window_size: Number of terms shown
+    :return: Snippet text
+    """
+    terms = document.terms
+    if not terms:
+        return ''
+    matches = sorted((position, stem) for stem in {extraction.get_stem(term) for term in query_terms if term}
+                     for position in document.stem_positions.get(stem, ()))
+    match_positions = [position for position, _ in matches]
+    matched_terms = [stem for _, stem in matches]
+
+    start = find_best_window(match_positions, matched_terms, window_size) if match_positions else 0
+    # Move the window back, so the matches are centered if the document ends before the window does.
+    start = max(0, min(start - window_size // 4, len(terms) - window_size))
+    end = min(len(terms), start + window_size)
+    highlighted_positions = set(match_positions)
+
+    parts = []
+    for position in range(start, end):
+        # The raw text is the terms joined by single spaces, so a term is its own text.
+        term_text = terms[position]
+        if position in highlighted_positions:
+            term_text = HIGHLIGHT_START + term_text + HIGHLIGHT_END
+        parts.append(term_text)
+    snippet = ' '.join(part for part in parts if part)
+    if start > 0:
+        snippet = '...' + snippet
+    if end < len(terms):
+        snippet += '...'
+    return snippet
@@ -0,0 +1,153 @@
+# Contains a batched scoring engine for the Vector Space Model based on a sparse term-document matrix, and the
+# per-document weight vectors used for relevance feedback.
+
+import numpy as np
+
+MAX_BATCH_CELLS = 1 << 24  # Upper bound for the number of score cells (queries x documents) computed at once.
+
+
+class SparseVectorSpaceScorer(object):
+    """
+    Holds the tf-idf weights of a Vector Space Model as a term-document matrix in CSR format (plain NumPy arrays):
+    The postings of term t are indices[indptr[t]:indptr[t+1]] (document IDs) with the weights
+    data[indptr[t]:indptr[t+1]]. A batch of queries is scored with one sparse matrix product, so the interpreter
+    overhead is paid per batch instead of per posting.
+    """
+
+    def __init__(self, inverted_list: dict, document_count: int):
+        """
+        :param inverted_list: Inverted list of a VectorSpaceModel, mapping each term to postings that start with the
+        document ID and the weight
+        :param document_count: Number of columns of the matrix (= highest document ID + 1)
+        """
+        self.document_count = document_count
+        self.term_ids = {}
+        self.indptr = np.zeros(len(inverted_list) + 1, dtype=np.int64)
+        for term_id, term in enumerate(inverted_list.keys()):
+            self.term_ids[term] = term_id
+            self.indptr[term_id + 1] = self.indptr[term_id] + len(inverted_list[term])
+        self.indices = np.empty(self.indptr[-1], dtype=np.int32)
+        self.data = np.empty(self.indptr[-1], dtype=np.float64)
+        for term, term_id in self.term_ids.items():
+            postings = inverted_list[term]
+            start = self.indptr[term_id]
+            self.indices[start:start + len(postings)] = [pair[0] for pair in postings]
+            self.data[start:start + len(postings)] = [pair[1] for pair in postings]
+
+    def score_batch(self, query_vectors: list[dict]) -> np.ndarray:
+        """
+        Computes the scores of all documents for a batch of queries as the product of the sparse query matrix and the
+        term-document matrix.
+        :param query_vectors: List of query vectors, each a dictionary that maps terms to query term weights
+        :return: Dense matrix of shape (number of queries, document_count)
+        """
+        query_rows, term_rows, query_weights = [], [], []
+        for query_index, query_vector in enumerate(query_vectors):
+            for term, weight in query_vector.items():
+                term_id = self.term_ids.get(term)
+                if term_id is not None and weight > 0:
+                    query_rows.append(query_index)
+                    term_rows.append(term_id)
+                    query_weights.append(weight)
+        query_rows = np.array(query_rows, dtype=np.int64)
+        term_rows = np.array(term_rows, dtype=np.int64)
+        query_weights = np.array(query_weights, dtype=np.float64)
+
+        # Expand every (query, term) entry into the positions of the term's postings.
+        starts = self.indptr[term_rows]
+        lengths = self.indptr[term_rows + 1] - starts
+        posting_positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        rows = np.repeat(query_rows, lengths)
+        values = np.repeat(query_weights, lengths) * self.data[posting_positions]
+        cells = rows * self.document_count + self.indices[posting_positions]
+        scores = np.bincount(cells, weights=values, minlength=len(query_vectors) * self.document_count)
+        return scores.reshape(len(query_vectors), self.document_count)
+
+    def top_k_batch(self, query_vectors: list[dict], k: int) -> list[list[tuple]]:
+        """
+        Scores a batch of queries and selects the k best documents of each query with argpartition. Large batches are
+        split so that at most MAX_BATCH_CELLS scores are held in memory at once.
+        :param query_vectors: List of query vectors, each a dictionary that maps terms to query term weights
+        :param k: Number of documents per query
+        :return: One list per query with up to k (document ID, score) pairs, sorted by descending score. Documents
+        without any matching term are not included.
+        """
+        results = []
+        batch_size = max(1, MAX_BATCH_CELLS // max(1, self.document_count))
+        for batch_start in range(0, len(query_vectors), batch_size):
+            scores = self.score_batch(query_vectors[batch_start:batch_start + batch_size])
+            k_effective = min(k, self.document_count)
+            if k_effective == 0:
+                results += [[] for _ in range(len(scores))]
+                continue
+            candidates = np.argpartition(-scores, k_effective - 1, axis=1)[:, :k_effective]
+            for row, row_candidates in enumerate(candidates):
+                row_scores = scores[row, row_candidates]
+                order = np.argsort(-row_scores, kind='stable')
+                results.append([(int(row_candidates[i]), float(row_scores[i])) for i in order if row_scores[i] > 0])
+        return results
+
+    def dot(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Multiplies the term-document matrix with a dense matrix.
+        :param matrix: Dense matrix of shape (document_count, r)
+        :return: Dense matrix of shape (number of terms, r)
+        """
+        result = np.zeros((len(self.indptr) - 1, matrix.shape[1]), dtype=np.float64)
+        posting_lengths = np.diff(self.indptr)
+        non_empty_rows = posting_lengths > 0
+        if non_empty_rows.any():
+            products = self.data[:, None] * matrix[self.indices]
+            result[non_empty_rows] = np.add.reduceat(products, self.indptr[:-1][non_empty_rows], axis=0)
+        return result
+
+    def transpose_dot(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Multiplies the transposed term-document matrix with a dense matrix.
+        :param matrix: Dense matrix of shape (number of terms, r)
+        :return: Dense matrix of shape (document_count, r)
+        """
+        rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        result = np.empty((self.document_count, matrix.shape[1]), dtype=np.float64)
+        for column in range(matrix.shape[1]):
+            result[:, column] = np.bincount(self.indices, weights=self.data * matrix[rows, column],
+                                            minlength=self.document_count)
+        return result
+
+
+class DocumentVectorStore(object):
+    """
+    Holds the tf-idf weights of a SparseVectorSpaceScorer grouped by document (CSC format): the terms of document d are
+    term_indices[indptr[d]:indptr[d+1]] with the weights data[indptr[d]:indptr[d+1]]. Relevance feedback reads the
+    vectors of a few documents from it instead of scanning the posting lists of the whole vocabulary.
+    """
+
+    def __init__(self, scorer: SparseVectorSpaceScorer):
+        """
+        :param scorer: Scorer whose term-document matrix is transposed
+        """
+        self.terms = list(scorer.term_ids.keys())  # Term of each term ID.
+        term_rows = np.repeat(np.arange(len(scorer.indptr) - 1, dtype=np.int32), np.diff(scorer.indptr))
+        order = np.argsort(scorer.indices, kind='stable')
+        self.term_indices = term_rows[order]
+        self.data = scorer.data[order]
+        self.indptr = np.zeros(scorer.document_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(scorer.indices, minlength=scorer.document_count), out=self.indptr[1:])
+
+    def get_centroid(self, document_ids: list[int]):
+        """
+        Computes the mean of the weight vectors of some documents.
+        :param document_ids: IDs of the documents
+        :return: Iterator of (term, mean weight) pairs of all terms of the documents, by descending weight
+        """
+        if not document_ids:
+            return
+        document_ids = np.asarray(document_ids, dtype=np.int64)
+        starts = self.indptr[document_ids]
+        lengths = self.indptr[document_ids + 1] - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        term_ids, inverse = np.unique(self.term_indices[positions], return_inverse=True)
+        weights = np.bincount(inverse, weights=self.data[positions]) / len(document_ids)
+        order = np.argsort(-weights, kind='stable')
+        for term_id, weight in zip(term_ids[order].tolist(), weights[order].tolist()):
+            yield self.terms[term_id], weight
@@ -0,0 +1,105 @@
+# Contains the spelling correction of query terms (symmetric delete algorithm, as used by SymSpell).
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7  # Only this many leading characters of a term are used for deletes, which bounds the index size.
+
+
+def get_edit_distance(first: str, second: str, max_distance: int) -> int:
+    """
+    Computes the optimal string alignment distance (Levenshtein distance plus transpositions of adjacent characters).
+    :param first: First string
+    :param second: Second string
+    :param max_distance: Distances above this value are not needed exactly
+    :return: Edit distance, or max_distance + 1 if it is larger than max_distance
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    previous_row = None
+    current_row = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        previous_previous_row, previous_row = previous_row, current_row
+        current_row = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current_row[j] = min(previous_row[j] + 1, current_row[j - 1] + 1, previous_row[j - 1] + cost)
+            if (i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]):
+                current_row[j] = min(current_row[j], previous_previous_row[j - 2] + 1)
+        if min(current_row) > max_distance:
+            return max_distance + 1
+    return min(current_row[-1], max_distance + 1)
+
+
+def get_deletes(term: str, max_distance: int) -> set[str]:
+    """
+    Returns all strings that result from deleting up to max_distance characters of a term (including the term).
+    :param term: Term
+    :param max_distance: Maximum number of deleted characters
+    :return: Set of delete variants
+    """
+    deletes = {term}
+    current_level = {term}
+    for _ in range(max_distance):
+        next_level = set()
+        for variant in current_level:
+            for i in range(len(variant)):
+                next_level.add(variant[:i] + variant[i + 1:])
+        deletes |= next_level
+        current_level = next_level
+    return deletes
+
+
+class SpellingCorrector(object):
+    """
+    Finds vocabulary terms within a small edit distance of a (misspelled) term. All delete variants of the vocabulary
+    are precomputed, so a lookup only generates the delete variants of the input term and looks them up in a
+    dictionary instead of comparing the input with every vocabulary term.
+    """
+
+    def __init__(self, term_frequencies: dict, max_edit_distance: int = MAX_EDIT_DISTANCE,
+                 prefix_length: int = PREFIX_LENGTH):
+        """
+        :param term_frequencies: Maps each vocabulary term to its frequency, used to rank equally distant candidates
+        :param max_edit_distance: Maximum edit distance of suggestions
+        :param prefix_length: Number of leading characters of a term used for the delete variants
+        """
+        self.term_frequencies = term_frequencies
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.deletes = {}  # Maps each delete variant to the vocabulary terms it was created from.
+        for term in term_frequencies.keys():
+            if not term:
+                continue
+            for variant in get_deletes(term[:prefix_length], max_edit_distance):
+                if variant not in self.deletes:
+                    self.deletes[variant] = [term]
+                else:
+                    self.deletes[variant].append(term)
+
+    def lookup(self, term: str, max_suggestions: int = 5) -> list[tuple]:
+        """
+        Finds the vocabulary terms closest to a term.
+        :param term: Possibly misspelled term
+        :param max_suggestions: Maximum number of suggestions
+        :return: List of (term, edit distance) pairs, sorted by distance and then by descending frequency
+        """
+        if term in self.term_frequencies:
+            return [(term, 0)]
+        candidates = set()
+        for variant in get_deletes(term[:self.prefix_length], self.max_edit_distance):
+            candidates.update(self.deletes.get(variant, []))
+        suggestions = []
+        for candidate in candidates:
+            distance = get_edit_distance(term, candidate, self.max_edit_distance)
+            if distance <= self.max_edit_distance:
+                suggestions.append((candidate, distance))
+        suggestions = sorted(suggestions, key=lambda pair: (pair[1], -self.term_frequencies[pair[0]], pair[0]))
+        return suggestions[:max_suggestions]
+
+    def correct(self, term: str) -> str:
+        """
+        Returns the best correction of a term.
+        :param term: Possibly misspelled term
+        :return: The term itself if it is known, its best suggestion, or None if there is no suggestion
+        """
+        suggestions = self.lookup(term, 1)
+        return suggestions[0][0] if suggestions else None
@@ -0,0 +1,260 @@
+# Contains the out-of-core index construction (single-pass in-memory indexing, SPIMI): documents are inverted in memory
+# until a memory budget is reached, each full dictionary is written to disk as a sorted run, and the runs are merged
+# into the final index with one k-way merge.
+#
+# Usage:
+#   python spimi.py --output data/index --memory-budget 64
+#
+# Index layout (index directory):
+#   metadata.json       {'document_count': ..., 'document_id_count': ..., 'document_ids': [...], 'runs': ...,
+#                        'term_count': ...}
+#   terms.postings      one JSON line [term, [document ID, term frequency, document ID, term frequency, ...]] per term,
+#                       sorted by term, with ascending document IDs
+# Only the surface forms are indexed; the models derive stemmed postings from the stem classes of the terms (see
+# stem_classes.py). Models that load the index keep only its dictionary in memory and read posting lists on demand
+# (see PostingsFile).
+
+import argparse
+from collections.abc import Mapping
+import heapq
+import json
+import os
+import sys
+from document import Document
+import docstore
+import extraction
+
+POSTINGS_FILE_NAME = 'terms.postings'
+METADATA_FILE_NAME = 'metadata.json'
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # Bytes.
+# Estimated memory of the in-memory dictionary: a new term (key, list object, hash table slot) and one posting
+# (document ID and term frequency as list elements).
+TERM_COST = 150
+POSTING_COST = 72
+
+
+def get_postings_path(index_directory: str) -> str:
+    return os.path.join(index_directory, POSTINGS_FILE_NAME)
+
+
+def write_postings(postings, file_path: str) -> int:
+    """
+    Writes (term, postings) pairs as a postings file.
+    :param postings: Iterable of (term, flat list of document IDs and term frequencies) pairs, sorted by term
+    :param file_path: Path of the postings file
+    :return: Number of terms
+    """
+    term_count = 0
+    temporary_file_path = file_path + '.tmp'
+    with open(temporary_file_path, 'w') as f:
+        for term, term_postings in postings:
+            f.write(json.dumps([term, term_postings], separators=(',', ':')))
+            f.write('\n')
+            term_count += 1
+    os.replace(temporary_file_path, file_path)
+    return term_count
+
+
+def read_postings(file_path: str):
+    """
+    Reads a postings file line by line, so only one posting list is held in memory at a time.
+    :param file_path: Path of the postings file
+    :return: Iterator of (term, flat list of document IDs and term frequencies) pairs, sorted by term
+    """
+    with open(file_path, 'r') as f:
+        for line in f:
+            term, term_postings = json.loads(line)
+            yield term, term_postings
+
+
+def merge_runs(run_paths: list[str], file_path: str) -> int:
+    """
+    Merges sorted runs into one postings file (k-way merge). Runs must be given in the order they were written, so the
+    posting lists of a term stay sorted by document ID when they are concatenated.
+    :param run_paths: Paths of the runs
+    :param file_path: Path of the merged postings file
+    :return: Number of terms
+    """
+    def merge_terms():
+        current_term, current_postings = None, None
+        # heapq.merge() is stable, so entries with the same term come in the order of the runs.
+        for term, term_postings in heapq.merge(*[read_postings(path) for path in run_paths], key=lambda entry: entry[0]):
+            if term == current_term:
+                current_postings += term_postings
+                continue
+            if current_postings is not None:
+                yield current_term, current_postings
+            current_term, current_postings = term, term_postings
+        if current_postings is not None:
+            yield current_term, current_postings
+
+    return write_postings(merge_terms(), file_path)
+
+
+class PostingsFile(Mapping):
+    """
+    Read-only mapping of the terms of a postings file to their posting lists. Only the dictionary (byte offset and
+    document frequency of every term) is held in memory; a posting list is read from disk whenever it is accessed, so
+    the posting lists of an index that is larger than memory can be looked up. Subclasses convert the flat posting
+    lists into the representation of a model by overriding convert_postings().
+    """
+
+    def __init__(self, file_path: str):
+        """
+        :param file_path: Path of the postings file, which is read once to build the dictionary
+        """
+        self.file_path = file_path
+        self.offsets = {}
+        self.document_frequencies = {}
+        with open(file_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                term, term_postings = json.loads(line)
+                self.offsets[term] = offset
+                self.document_frequencies[term] = len(term_postings) // 2
+                offset += len(line)
+
+    def __getitem__(self, term: str):
+        offset = self.offsets[term]
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            return self.convert_postings(term, json.loads(f.readline())[1])
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, term) -> bool:
+        return term in self.offsets
+
+    def items(self):
+        """
+        Reads all posting lists in one sequential pass over the file, e. g. to build an in-memory index variant.
+        :return: Iterator of (term, converted posting list) pairs, sorted by term
+        """
+        for term, term_postings in read_postings(self.file_path):
+            yield term, self.convert_postings(term, term_postings)
+
+    def convert_postings(self, term: str, term_postings: list[int]):
+        """
+        :param term: Term
+        :param term_postings: Flat list of document IDs and term frequencies
+        :return: Posting list in the representation of the model
+        """
+        return term_postings
+
+
+class SpimiIndexBuilder(object):
+    """
+    Builds the index of a document stream whose inverted lists do not fit into memory. When the estimated size of the
+    in-memory dictionary exceeds the memory budget, it is written to disk as a sorted run.
+    """
+
+    def __init__(self, index_directory: str, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        """
+        :param index_directory: Directory of the index (created if missing)
+        :param memory_budget: Maximum estimated size of the in-memory dictionary in bytes
+        """
+        self.index_directory = index_directory
+        self.memory_budget = memory_budget
+        os.makedirs(index_directory, exist_ok=True)
+        self.dictionary = {}  # Term -> [ID, tf, ID, tf, ...]
+        self.memory_used = 0
+        self.run_paths = []
+        self.document_ids = []
+
+    def add_document(self, document: Document) -> None:
+        """
+        Inverts one document. Documents must be added in ascending order of their IDs.
+        :param document: Document to add
+        """
+        self.document_ids.append(document.document_id)
+        term_frequencies = {}
+        for term in document.terms:
+            term_frequencies[term] = term_frequencies.get(term, 0) + 1
+        for term, frequency in term_frequencies.items():
+            if term not in self.dictionary:
+                self.dictionary[term] = []
+                self.memory_used += TERM_COST + len(term)
+            self.dictionary[term] += (document.document_id, frequency)
+            self.memory_used += POSTING_COST
+        if self.memory_used >= self.memory_budget:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the in-memory dictionary to disk as a sorted run and empties it.
+        """
+        if self.dictionary:
+            run_path = os.path.join(self.index_directory, f'terms.run{len(self.run_paths):05d}')
+            write_postings(((term, self.dictionary[term]) for term in sorted(self.dictionary.keys())), run_path)
+            self.run_paths.append(run_path)
+        self.dictionary = {}
+        self.memory_used = 0
+
+    def finish(self) -> dict:
+        """
+        Writes the last run, merges all runs into the postings file and removes the runs.
+        :return: Metadata of the index
+        """
+        self.flush()
+        metadata = {
+            'document_count': len(self.document_ids),
+            'document_id_count': max(self.document_ids, default=-1) + 1,
+            'document_ids': self.document_ids,
+            'runs': len(self.run_paths),
+            'term_count': merge_runs(self.run_paths, get_postings_path(self.index_directory))
+        }
+        for run_path in self.run_paths:
+            os.remove(run_path)
+        with open(os.path.join(self.index_directory, METADATA_FILE_NAME), 'w') as f:
+            json.dump(metadata, f)
+        return metadata
+
+
+def build_index(documents, index_directory: str, memory_budget: int = DEFAULT_MEMORY_BUDGET) -> dict:
+    """
+    Builds the index of a document stream.
+    :param documents: Iterable of Document objects in ascending order of their IDs
+    :param index_directory: Directory of the index
+    :param memory_budget: Maximum estimated size of the in-memory dictionary in bytes
+    :return: Metadata of the index
+    """
+    builder = SpimiIndexBuilder(index_directory, memory_budget)
+    for document in documents:
+        builder.add_document(document)
+    return builder.finish()
+
+
+def load_index_metadata(index_directory: str) -> dict:
+    """
+    :param index_directory: Directory of the index
+    :return: Metadata of the index
+    """
+    with open(os.path.join(index_directory, METADATA_FILE_NAME), 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the inverted index of the collection out of core.')
+    parser.add_argument('--output', default=os.path.join('data', 'index'), help='Directory of the index')
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help='Memory budget of the in-memory dictionary in MiB')
+    parser.add_argument('--store', default=os.path.join('data', 'my_collection.store'),
+                        help='Document store to index (my_collection.json next to it is used if it is missing)')
+    arguments = parser.parse_args()
+
+    if os.path.isfile(arguments.store):
+        documents = docstore.DocumentStore(arguments.store).iter_documents()
+    else:
+        documents = extraction.load_collection_from_json(os.path.join(os.path.dirname(arguments.store),
+                                                                      'my_collection.json'))
+    metadata = build_index(documents, arguments.output, arguments.memory_budget * 1024 * 1024)
+    print(f"Indexed {metadata['document_count']} documents into {arguments.output} "
+          f"({metadata['runs']} runs).", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Contains the stem classes (all surface forms that share a Porter stem), which let the retrieval models keep a single
+# index of surface forms and derive stemmed lookups from it.
+
+from collections.abc import Mapping
+import math
+
+import numpy as np
+
+import porter
+
+
+def get_stem_classes(terms) -> dict:
+    """
+    Groups surface forms by their stem.
+    :param terms: Iterable of distinct surface forms, e. g. the vocabulary of an inverted list
+    :return: Dictionary that maps each stem to the sorted list of its surface forms
+    """
+    stem_classes = {}
+    for term in terms:
+        stem_classes.setdefault(porter.stem_term(term), []).append(term)
+    for forms in stem_classes.values():
+        forms.sort()
+    return stem_classes
+
+
+class StemmedInvertedList(Mapping):
+    """
+    Read-only view of the stemmed inverted list of a Vector Space Model, computed from the surface form inverted list.
+    The term frequency of a stem in a document is the sum of the term frequencies of its surface forms, so the posting
+    list of a stem is the union of the posting lists of its class, weighted with the document frequency and the norms
+    of the stemmed documents. Only document frequencies and norms are stored; posting lists are built on lookup.
+    """
+
+    def __init__(self, inverted_list: dict, stem_classes: dict, document_count: int, document_id_count: int):
+        """
+        :param inverted_list: Surface form inverted list, mapping each term to (document ID, weight, term frequency)
+        triples
+        :param stem_classes: Stem classes of the surface forms, see get_stem_classes()
+        :param document_count: Number of documents in the collection (N)
+        :param document_id_count: Highest document ID + 1
+        """
+        self.inverted_list = inverted_list
+        self.stem_classes = stem_classes
+        self.document_count = document_count
+        self.n = {}
+        norms = np.zeros(document_id_count)
+        for stem in stem_classes:
+            term_frequencies = self.get_term_frequencies(stem)
+            self.n[stem] = len(term_frequencies)
+            idf = math.log(document_count / self.n[stem])
+            frequencies = np.fromiter(term_frequencies.values(), dtype=np.float64, count=len(term_frequencies))
+            np.add.at(norms, list(term_frequencies.keys()), (frequencies * idf) ** 2)
+        self.norms = np.sqrt(norms).tolist()
+
+    def get_term_frequencies(self, stem: str) -> dict:
+        """
+        :param stem: Stem to look up
+        :return: Dictionary that maps each document ID that contains the stem to its term frequency, by ascending ID
+        :raises KeyError: If the stem does not occur in the collection
+        """
+        term_frequencies = {}
+        for term in self.stem_classes[stem]:
+            for posting in self.inverted_list[term]:
+                term_frequencies[posting[0]] = term_frequencies.get(posting[0], 0) + posting[2]
+        return dict(sorted(term_frequencies.items()))
+
+    def __getitem__(self, stem: str) -> list[tuple]:
+        """
+        :param stem: Stem to look up
+        :return: (document ID, weight) pairs by descending weight
+        :raises KeyError: If the stem does not occur in the collection
+        """
+        idf = math.log(self.document_count / self.n[stem])
+        pairs = [(d, tf * idf / self.norms[d] if self.norms[d] > 0 else 0.0)
+                 for d, tf in self.get_term_frequencies(stem).items()]
+        return sorted(pairs, key=lambda pair: pair[1], reverse=True)
+
+    def __contains__(self, stem) -> bool:
+        return stem in self.stem_classes
+
+    def __iter__(self):
+        return iter(self.stem_classes)
+
+    def __len__(self) -> int:
+        return len(self.stem_classes)
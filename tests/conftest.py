@@ -0,0 +1,15 @@
+# Contains the shared configuration of the tests: the modules of the information retrieval system are imported from
+# the repository root, and the raw data is found relative to it.
+
+import os
+import sys
+
+import pytest
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+
+@pytest.fixture(scope='session')
+def raw_data_path() -> str:
+    return os.path.join(REPOSITORY_PATH, 'raw_data')
@@ -0,0 +1,31 @@
+# Contains the smoke test of the benchmark suite.
+
+import os
+
+import benchmark
+import cleanup
+import extraction
+
+
+def test_benchmark_runs_at_a_tiny_size(raw_data_path, tmp_path, monkeypatch):
+    source_collection = extraction.extract_collection(os.path.join(raw_data_path, 'aesopa10.txt'))
+    stop_words = cleanup.load_stop_word_list(os.path.join(raw_data_path, 'englishST.txt'))
+    generator = benchmark.CorpusGenerator(source_collection, stop_words)
+    monkeypatch.setattr(benchmark, 'BENCHMARK_DATA_PATH', str(tmp_path))
+
+    results = benchmark.run_benchmark(200, generator, stop_words, 12, list(benchmark.BENCHMARKED_MODELS))
+
+    for model_name, search_name in benchmark.BENCHMARKED_MODELS.items():
+        assert results[f'{model_name}.build_seconds'] >= 0
+        for _, _, mode in benchmark.MODES:
+            assert results[f'{search_name}.{mode}.p50_ms'] <= results[f'{search_name}.{mode}.p99_ms']
+    assert benchmark.check_thresholds({'200': results}, {'200.collection.generate_seconds': 0}) != []
+    assert benchmark.check_thresholds({'200': results}, {'200.collection.generate_seconds': 1e9}) == []
+
+
+def test_generated_queries_use_clean_terms(raw_data_path):
+    source_collection = extraction.extract_collection(os.path.join(raw_data_path, 'aesopa10.txt'))
+    generator = benchmark.CorpusGenerator(source_collection, [])
+    assert all(term.isascii() and term.isalpha() for term in generator.vocabulary)
+    queries = generator.generate_queries(30)
+    assert len(queries['boolean']) == len(queries['vector']) == 30
@@ -0,0 +1,53 @@
+# Contains the tests of the packed document bitmap, checked against Python sets.
+
+import random
+
+import pytest
+
+from bitmap import Bitmap
+
+SIZE = 200  # Not a multiple of the word size, so the last word is partly unused.
+
+
+@pytest.fixture
+def id_sets() -> tuple:
+    random_generator = random.Random(7)
+    return tuple(set(random_generator.sample(range(SIZE), 60)) for _ in range(2))
+
+
+def test_from_ids_round_trip(id_sets):
+    first, _ = id_sets
+    bitmap = Bitmap.from_ids(first, SIZE)
+    assert bitmap.to_ids() == sorted(first)
+    assert list(bitmap) == sorted(first)
+    assert len(bitmap) == len(first)
+    assert all((document_id in bitmap) == (document_id in first) for document_id in range(-1, SIZE + 1))
+
+
+def test_operators_match_set_operators(id_sets):
+    first, second = id_sets
+    first_bitmap, second_bitmap = Bitmap.from_ids(first, SIZE), Bitmap.from_ids(second, SIZE)
+    assert (first_bitmap & second_bitmap).to_ids() == sorted(first & second)
+    assert (first_bitmap | second_bitmap).to_ids() == sorted(first | second)
+    assert (first_bitmap - second_bitmap).to_ids() == sorted(first - second)
+    assert first_bitmap.difference(second_bitmap).to_ids() == sorted(first.difference(second))
+
+
+def test_negation_is_masked_by_the_universe():
+    universe = Bitmap.from_ids(range(0, SIZE, 2), SIZE)
+    negated = universe - Bitmap.from_ids([0, 2, 3], SIZE)
+    assert negated.to_ids() == list(range(4, SIZE, 2))
+
+
+def test_empty_bitmap():
+    bitmap = Bitmap(SIZE)
+    assert len(bitmap) == 0
+    assert bitmap.to_ids() == []
+    assert bitmap.select(0, 10) == []
+    assert len(Bitmap.from_ids([], 0)) == 0
+
+
+@pytest.mark.parametrize('start, count', [(0, 10), (5, 30), (50, 20), (59, 5), (60, 5), (0, 0)])
+def test_select_returns_pages_across_word_boundaries(id_sets, start, count):
+    first, _ = id_sets
+    assert Bitmap.from_ids(first, SIZE).select(start, count) == sorted(first)[start:start + count]
@@ -0,0 +1,71 @@
+# Contains the tests of the corpus statistics collector, in exact and in sketch mode.
+
+import random
+
+import pytest
+
+import corpus_statistics
+from corpus_statistics import CorpusStatistics
+
+TERM_LISTS = [['fox', 'wolf', 'fox'], ['wolf'], ['lion', 'fox'], []]
+
+
+@pytest.fixture(scope='module')
+def random_term_lists() -> list[list[str]]:
+    random_generator = random.Random(11)
+    return [[f'term{random_generator.randrange(300)}' for _ in range(random_generator.randrange(50))]
+            for _ in range(120)]
+
+
+def test_exact_frequencies():
+    statistics = CorpusStatistics().add_collection(TERM_LISTS)
+    assert statistics.document_count == 4
+    assert statistics.get_document_frequency('fox') == 2
+    assert statistics.get_collection_frequency('fox') == 3
+    assert statistics.get_document_frequency('wolf') == statistics.get_collection_frequency('wolf') == 2
+    assert statistics.get_document_frequency('unknown') == 0
+    assert sorted(statistics.get_vocabulary()) == ['fox', 'lion', 'wolf']
+
+
+def test_sketch_estimates_are_never_too_low(random_term_lists):
+    exact = CorpusStatistics().add_collection(random_term_lists)
+    sketch = CorpusStatistics(sketch_width=64, sketch_depth=10).add_collection(random_term_lists)
+    for term in exact.get_vocabulary():
+        assert sketch.get_document_frequency(term) >= exact.get_document_frequency(term)
+        assert sketch.get_collection_frequency(term) >= exact.get_collection_frequency(term)
+    with pytest.raises(ValueError):
+        sketch.get_vocabulary()
+
+
+def test_merged_partitions_equal_a_single_pass(random_term_lists):
+    for sketch_width in (None, 128):
+        single_pass = CorpusStatistics(sketch_width).add_collection(random_term_lists)
+        merged = CorpusStatistics(sketch_width)
+        for partition in corpus_statistics.get_partitions(random_term_lists, 25):
+            merged.merge(CorpusStatistics(sketch_width).add_collection(partition))
+        assert merged.document_count == single_pass.document_count
+        for term in ['term0', 'term17', 'term299', 'unknown']:
+            assert merged.get_document_frequency(term) == single_pass.get_document_frequency(term)
+            assert merged.get_collection_frequency(term) == single_pass.get_collection_frequency(term)
+
+
+def test_only_statistics_of_the_same_size_are_merged():
+    with pytest.raises(ValueError):
+        CorpusStatistics().merge(CorpusStatistics(sketch_width=16))
+    with pytest.raises(ValueError):
+        CorpusStatistics(sketch_width=0)
+
+
+def test_partitions_keep_all_documents_in_order(random_term_lists):
+    partitions = list(corpus_statistics.get_partitions(iter(random_term_lists), 50))
+    assert [len(partition) for partition in partitions] == [50, 50, 20]
+    assert [terms for partition in partitions for terms in partition] == random_term_lists
+
+
+def test_parallel_collection_equals_a_single_pass(random_term_lists):
+    single_pass = CorpusStatistics().add_collection(random_term_lists)
+    parallel = corpus_statistics.collect_corpus_statistics(corpus_statistics.get_partitions(random_term_lists, 30),
+                                                           processes=2)
+    assert parallel.document_count == single_pass.document_count
+    assert parallel.document_frequency == single_pass.document_frequency
+    assert parallel.collection_frequency == single_pass.collection_frequency
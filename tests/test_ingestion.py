@@ -0,0 +1,85 @@
+# Contains the tests of the parallel ingestion of collections.
+
+import json
+import os
+
+import pytest
+
+import ingestion
+
+RECORDS = [{'id': 1, 'title': 'One', 'text': 'The fox.'}, {'text': 'No ID here'}, {'id': [1, 2], 'text': 'List ID'},
+           {'id': 1, 'text': 'Duplicate of one'}, {'id': '1', 'text': 'String ID'}]
+SECOND_RECORD_OFFSET = str(len(json.dumps(RECORDS[0])) + 1)  # Title of the record without ID.
+
+
+@pytest.fixture
+def jsonl_path(tmp_path) -> str:
+    file_path = str(tmp_path / 'export.jsonl')
+    with open(file_path, 'w') as f:
+        f.write('\n'.join(json.dumps(record) for record in RECORDS) + '\n')
+    return file_path
+
+
+@pytest.fixture
+def text_directory(tmp_path) -> str:
+    directory = tmp_path / 'corpus'
+    (directory / 'b').mkdir(parents=True)
+    (directory / 'a.txt').write_text('A fox and a wolf')
+    (directory / 'b' / 'c.txt').write_text('The lion')
+    (directory / 'ignored.md').write_text('Not a text file')
+    return str(directory)
+
+
+def test_jsonl_keys_distinguish_offsets_and_ids_of_any_type(jsonl_path):
+    collection, document_ids = ingestion.ingest([ingestion.JsonlReader(jsonl_path)], processes=1)
+    assert [document.title for document in collection] == ['One', SECOND_RECORD_OFFSET, '[1, 2]', '1']
+    assert [document.raw_text for document in collection] == ['the fox', 'no id here', 'list id', 'string id']
+    assert [document.document_id for document in collection] == [0, 1, 2, 3]
+    assert len(document_ids) == 4
+
+
+def test_jsonl_records_without_text_are_rejected(tmp_path):
+    file_path = str(tmp_path / 'broken.jsonl')
+    with open(file_path, 'w') as f:
+        f.write(json.dumps({'id': 1, 'body': 'fox'}) + '\n')
+    with pytest.raises(ValueError):
+        ingestion.ingest([ingestion.JsonlReader(file_path)], processes=1)
+
+
+def test_text_directory_is_read_in_path_order(text_directory):
+    collection, _ = ingestion.ingest([ingestion.TextDirectoryReader(text_directory)], processes=1)
+    assert [(document.title, document.terms) for document in collection] == [
+        ('a', ['a', 'fox', 'and', 'a', 'wolf']), ('c', ['the', 'lion'])]
+
+
+def test_ids_do_not_depend_on_the_number_of_processes(raw_data_path, jsonl_path):
+    def ingest(processes: int) -> list[tuple]:
+        readers = [ingestion.JsonlReader(jsonl_path, part_size=40),
+                   ingestion.AesopReader(os.path.join(raw_data_path, 'aesopa10.txt'), part_size=20000)]
+        collection, _ = ingestion.ingest(readers, processes)
+        return [(document.document_id, document.title, document.terms) for document in collection]
+
+    assert ingest(2) == ingest(1)
+
+
+def test_documents_keep_their_ids_when_a_source_is_added(tmp_path, jsonl_path, text_directory):
+    _, document_ids = ingestion.ingest([ingestion.TextDirectoryReader(text_directory)], processes=1)
+    ids_path = str(tmp_path / 'my_collection.ids.json')
+    ingestion.save_document_ids(document_ids, ids_path)
+
+    readers = [ingestion.JsonlReader(jsonl_path), ingestion.TextDirectoryReader(text_directory)]
+    collection, document_ids = ingestion.ingest(readers, 1, ingestion.load_document_ids(ids_path))
+    assert [document.title for document in collection] == ['a', 'c', 'One', SECOND_RECORD_OFFSET, '[1, 2]', '1']
+    assert sorted(document_ids.values()) == list(range(6))
+
+
+def test_ids_stay_consecutive_when_documents_disappear(text_directory):
+    _, document_ids = ingestion.ingest([ingestion.TextDirectoryReader(text_directory)], processes=1)
+    os.remove(os.path.join(text_directory, 'a.txt'))
+    collection, document_ids = ingestion.ingest([ingestion.TextDirectoryReader(text_directory)], 1, document_ids)
+    assert [(document.document_id, document.title) for document in collection] == [(0, 'c')]
+    assert list(document_ids.values()) == [0]
+
+
+def test_missing_id_file_means_a_fresh_ingestion(tmp_path):
+    assert ingestion.load_document_ids(str(tmp_path / 'missing.json')) == {}
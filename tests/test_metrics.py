@@ -0,0 +1,76 @@
+# Contains the tests of the metrics registry and its export formats.
+
+import json
+
+import pytest
+
+import metrics
+
+
+def test_quantiles_are_interpolated_within_their_bucket():
+    histogram = metrics.Histogram((1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(6.5)
+    assert histogram.get_quantile(0.5) == pytest.approx(1.5)
+    assert histogram.get_quantile(0.0) == 0.5
+    assert histogram.get_quantile(1.0) == 3.0
+
+
+def test_quantiles_are_clipped_to_the_observed_values():
+    histogram = metrics.Histogram((10,))
+    assert histogram.get_quantile(0.5) == 0.0
+    histogram.observe(7.0)
+    assert histogram.get_quantile(0.99) == 7.0
+    histogram.observe(50.0)  # Above the last bound.
+    assert histogram.get_quantile(1.0) == 50.0
+
+
+def test_registry_keeps_one_histogram_per_label_set():
+    registry = metrics.MetricsRegistry()
+    registry.observe('search_latency_seconds', 0.01, model='VectorSpaceModel', mode='standard')
+    registry.observe('search_latency_seconds', 0.03, mode='standard', model='VectorSpaceModel')
+    registry.observe('search_latency_seconds', 0.02, model='LSIModel', mode='standard')
+    rows = registry.get_summary()
+    assert [(row['labels']['model'], row['count']) for row in rows] == [('LSIModel', 1), ('VectorSpaceModel', 2)]
+    assert rows[1]['p50'] <= rows[1]['p95'] <= rows[1]['p99']
+
+
+def test_prometheus_text_has_cumulative_buckets_and_gauges():
+    registry = metrics.MetricsRegistry()
+    registry.observe('search_results', 3, metrics.COUNT_BUCKETS, model='InvertedListBooleanModel')
+    registry.observe('search_results', 30, metrics.COUNT_BUCKETS, model='InvertedListBooleanModel')
+    registry.add_gauges(lambda: [('cache_hit_ratio', {'cache': 'parse'}, 0.25)])
+    lines = registry.to_prometheus_text().splitlines()
+    assert '# TYPE search_results histogram' in lines
+    assert 'search_results_bucket{model="InvertedListBooleanModel",le="5"} 1' in lines
+    assert 'search_results_bucket{model="InvertedListBooleanModel",le="+Inf"} 2' in lines
+    assert 'search_results_count{model="InvertedListBooleanModel"} 2' in lines
+    assert 'cache_hit_ratio{cache="parse"} 0.25' in lines
+
+
+def test_write_chooses_the_format_by_extension(tmp_path):
+    registry = metrics.MetricsRegistry()
+    registry.observe('index_build_seconds', 1.5, model='VectorSpaceModel', source='build')
+    registry.write(str(tmp_path / 'metrics.json'))
+    registry.write(str(tmp_path / 'metrics.prom'))
+    summary = json.loads((tmp_path / 'metrics.json').read_text())
+    assert summary['histograms'][0]['labels'] == {'model': 'VectorSpaceModel', 'source': 'build'}
+    assert (tmp_path / 'metrics.prom').read_text().startswith('# TYPE index_build_seconds histogram')
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['metrics.json', 'metrics.prom']
+
+
+def test_exporter_writes_the_metrics_when_stopped(tmp_path):
+    registry = metrics.MetricsRegistry()
+    exporter = metrics.MetricsExporter(registry, str(tmp_path / 'metrics.prom'), 3600)
+    exporter.start()
+    exporter.stop()
+    assert (tmp_path / 'metrics.prom').exists()
+
+
+def test_summary_table_shows_durations_in_milliseconds():
+    registry = metrics.MetricsRegistry()
+    assert metrics.format_summary(registry) == 'No metrics recorded yet.'
+    registry.observe('search_latency_seconds', 0.002)
+    assert 'ms' in metrics.format_summary(registry).splitlines()[1]
@@ -0,0 +1,56 @@
+# Contains the tests of the MinHash/LSH near-duplicate detection.
+
+import random
+
+import numpy as np
+
+import extraction
+import near_duplicates
+
+
+def create_collection(texts: list[str]) -> list:
+    return [extraction.create_document(document_id, f'Document {document_id}', text)
+            for document_id, text in enumerate(texts)]
+
+
+def random_text(random_generator: random.Random, length: int = 200) -> str:
+    return ' '.join(f'word{random_generator.randrange(5000)}' for _ in range(length))
+
+
+def test_shingle_hashes_are_distinct_and_cover_short_documents():
+    term_hashes = {}
+    assert len(near_duplicates.get_shingle_hashes(['a', 'b', 'c', 'a', 'b', 'c'], term_hashes)) == 3
+    assert len(near_duplicates.get_shingle_hashes(['a', 'b'], term_hashes)) == 1
+    assert len(near_duplicates.get_shingle_hashes(['', ''], term_hashes)) == 0
+
+
+def test_sketches_estimate_the_jaccard_similarity():
+    min_hasher = near_duplicates.MinHasher()
+    first = np.arange(0, 1000, dtype=np.uint64)
+    second = np.arange(500, 1500, dtype=np.uint64)  # Jaccard similarity 1/3.
+    similarity = (min_hasher.get_sketch(first) == min_hasher.get_sketch(second)).mean()
+    assert abs(similarity - 1 / 3) < 0.15
+    assert (min_hasher.get_sketch(first) == min_hasher.get_sketch(first.copy())).all()
+
+
+def test_finds_copies_with_small_edits_but_not_unrelated_documents():
+    random_generator = random.Random(3)
+    original = random_text(random_generator)
+    edited = original.replace(original.split(' ')[100], 'changed', 1)
+    texts = [original, random_text(random_generator), edited, random_text(random_generator), original, '']
+    assert near_duplicates.find_near_duplicates(create_collection(texts)) == [[0, 2, 4]]
+
+
+def test_empty_documents_are_never_duplicates():
+    assert near_duplicates.find_near_duplicates(create_collection(['', '', 'fox'])) == []
+
+
+def test_removal_keeps_the_first_document_and_renumbers_the_rest():
+    random_generator = random.Random(5)
+    first, second = random_text(random_generator), random_text(random_generator)
+    collection = create_collection([first, second, first, random_text(random_generator)])
+    reduced_collection, clusters, id_map = near_duplicates.remove_near_duplicates(collection)
+    assert clusters == [[0, 2]]
+    assert [document.document_id for document in reduced_collection] == [0, 1, 2]
+    assert [document.title for document in reduced_collection] == ['Document 0', 'Document 1', 'Document 3']
+    assert id_map == {0: 0, 1: 1, 2: 0, 3: 2}
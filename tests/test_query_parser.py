@@ -0,0 +1,101 @@
+# Contains the tests of the Boolean query parser, its evaluation and its caches.
+
+import pytest
+
+import query_parser
+from query_parser import AND, NOT, OR, TERM
+
+DOCUMENTS = {'fox': {1, 2, 3}, 'wolf': {2, 4}, 'lion': {3, 5}}
+ALL_DOCUMENTS = {1, 2, 3, 4, 5, 6}
+STOP_WORDS = {'the', 'a'}
+
+
+def get_term_documents(term):
+    if term in STOP_WORDS:
+        return None
+    return DOCUMENTS.get(term, set())
+
+
+def evaluate(query: str, cache: query_parser.SubexpressionCache = None) -> set:
+    return query_parser.evaluate_query(query_parser.parse_query(query), get_term_documents, ALL_DOCUMENTS, cache)
+
+
+def test_not_binds_tighter_than_and_and_and_tighter_than_or():
+    assert query_parser.parse_query('fox | wolf & -lion') == (
+        OR, (TERM, 'fox'), (AND, (TERM, 'wolf'), (NOT, (TERM, 'lion'))))
+    assert query_parser.parse_query('(fox | wolf) & lion') == (AND, (OR, (TERM, 'fox'), (TERM, 'wolf')), (TERM, 'lion'))
+    assert query_parser.parse_query('--fox') == (NOT, (NOT, (TERM, 'fox')))
+
+
+def test_chains_are_left_associative():
+    assert query_parser.parse_query('fox & wolf & lion') == (
+        AND, (AND, (TERM, 'fox'), (TERM, 'wolf')), (TERM, 'lion'))
+
+
+def test_punctuation_and_case_are_ignored():
+    assert query_parser.parse_query("Fox's. & wolf!") == query_parser.parse_query('foxs & wolf')
+    assert query_parser.parse_query('fox1') == (TERM, 'fox')
+
+
+@pytest.mark.parametrize('query', ['', '!!', 'fox &', '(fox | wolf', 'fox wolf', 'fox )', '& fox'])
+def test_invalid_queries_raise_parse_errors(query):
+    with pytest.raises(query_parser.QueryParseError):
+        query_parser.parse_query(query)
+
+
+def test_evaluation_follows_the_set_operators():
+    assert evaluate('fox & wolf') == {2}
+    assert evaluate('fox | wolf') == {1, 2, 3, 4}
+    assert evaluate('fox & -wolf') == {1, 3}
+    assert evaluate('-(fox | wolf | lion)') == {6}
+    assert evaluate('unknown') == set()
+
+
+def test_stop_words_drop_out_of_their_operation():
+    assert evaluate('the & fox') == evaluate('fox & the') == DOCUMENTS['fox']
+    assert evaluate('(the | a) & wolf') == DOCUMENTS['wolf']
+    assert evaluate('the') == set()
+    assert evaluate('-the') == set()
+
+
+def test_equivalent_queries_have_one_canonical_form():
+    canonical = query_parser.canonicalize_query(query_parser.parse_query('fox | wolf'))
+    assert canonical == (OR, (TERM, 'fox'), (TERM, 'wolf'))
+    for query in ['wolf | fox', 'wolf | (fox | wolf)', '(fox | fox) | wolf']:
+        assert query_parser.canonicalize_query(query_parser.parse_query(query)) == canonical
+    assert query_parser.canonicalize_query(query_parser.parse_query('fox & (wolf & lion)')) == (
+        AND, (TERM, 'fox'), (TERM, 'lion'), (TERM, 'wolf'))
+    assert query_parser.canonicalize_query(query_parser.parse_query('fox & fox')) == (TERM, 'fox')
+
+
+def test_normalized_queries_share_the_parse_cache():
+    query_parser.clear_parse_cache()
+    parsed_query = query_parser.parse_query('fox & wolf')
+    assert query_parser.parse_query('  FOX  &   wolf ') is parsed_query
+
+
+def test_cached_evaluation_returns_the_same_results():
+    cache = query_parser.SubexpressionCache()
+    for query in ['fox & -wolf', 'wolf | fox', 'fox | wolf', 'the & fox', '-(lion & fox)']:
+        assert evaluate(query, cache) == evaluate(query)
+    assert cache.hits > 0
+
+
+def test_subexpression_cache_evicts_the_least_recently_used_results():
+    cache = query_parser.SubexpressionCache(max_postings=4)
+    cache.put('first', {1, 2})
+    cache.put('second', {3, 4})
+    assert cache.get('first') == (True, {1, 2})
+    cache.put('third', {5})
+    assert cache.get('second') == (False, None)
+    assert cache.get('first') == (True, {1, 2})
+    assert cache.postings <= 4
+
+
+def test_subexpression_cache_skips_results_larger_than_its_bound():
+    cache = query_parser.SubexpressionCache(max_postings=2)
+    cache.put('large', {1, 2, 3})
+    cache.put('ignored', None)
+    assert cache.get('large') == (False, None)
+    assert cache.get('ignored') == (True, None)
+    assert cache.get_hit_rate() == 0.5
@@ -0,0 +1,39 @@
+# Contains the tests of the symmetric delete spelling correction.
+
+import spelling
+
+
+def test_edit_distance_counts_transpositions_as_one_edit():
+    assert spelling.get_edit_distance('fox', 'fox', 2) == 0
+    assert spelling.get_edit_distance('fox', 'fxo', 2) == 1
+    assert spelling.get_edit_distance('wolf', 'wolves', 3) == 3
+    assert spelling.get_edit_distance('kitten', 'sitting', 3) == 3
+
+
+def test_edit_distance_is_capped_above_the_maximum():
+    assert spelling.get_edit_distance('kitten', 'sitting', 2) == 3
+    assert spelling.get_edit_distance('a', 'abcd', 2) == 3
+
+
+def test_deletes_include_the_term_and_all_shorter_variants():
+    assert spelling.get_deletes('abc', 1) == {'abc', 'bc', 'ac', 'ab'}
+    assert spelling.get_deletes('ab', 2) == {'ab', 'a', 'b', ''}
+
+
+def test_lookup_ranks_by_distance_and_then_by_frequency():
+    corrector = spelling.SpellingCorrector({'fox': 10, 'box': 3, 'fix': 5, 'wolf': 4})
+    assert corrector.lookup('fox') == [('fox', 0)]
+    assert corrector.lookup('fxo') == [('fox', 1), ('fix', 2), ('box', 2)]
+    assert corrector.lookup('gox') == [('fox', 1), ('box', 1), ('fix', 2)]
+    assert corrector.lookup('gox', 1) == [('fox', 1)]
+
+
+def test_correct_returns_none_without_a_close_term():
+    corrector = spelling.SpellingCorrector({'fox': 10, 'wolf': 4})
+    assert corrector.correct('wolff') == 'wolf'
+    assert corrector.correct('elephant') is None
+
+
+def test_long_terms_are_found_through_their_prefix():
+    corrector = spelling.SpellingCorrector({'countryman': 2}, prefix_length=5)
+    assert corrector.correct('countrymen') == 'countryman'